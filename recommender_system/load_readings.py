@@ -0,0 +1,35 @@
+# load_readings.py
+# Readers for the sensor history exported by `manage.py export_parquet`:
+#   <root>/sensor_type=AQ/date=2025-06-01/part-0.parquet
+# Only the requested columns and days are read from disk.
+import os
+
+import pandas as pd
+
+EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exports')
+
+
+def load_readings(sensor_type, columns=None, start=None, end=None, root=EXPORT_DIR):
+    # Rows of one sensor type, oldest first; start/end are 'YYYY-MM-DD' days (end excluded)
+    filters = []
+    if start is not None:
+        filters.append(('date', '>=', str(start)))
+    if end is not None:
+        filters.append(('date', '<', str(end)))
+    if columns is not None and 'timestamp' not in columns:
+        columns = ['timestamp'] + list(columns)
+    df = pd.read_parquet(
+        os.path.join(root, f'sensor_type={sensor_type}'), engine='pyarrow',
+        columns=columns, filters=filters or None,
+    )
+    return df.drop(columns=['date'], errors='ignore').sort_values('timestamp', ignore_index=True)
+
+
+def read_readings(path, columns=None):
+    # A CSV dump or an export_parquet directory (e.g. exports/sensor_type=AQ)
+    if os.path.isdir(path):
+        root, partition = os.path.split(os.path.normpath(path))
+        return load_readings(partition.split('=', 1)[1], columns, root=root)
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path, engine='pyarrow', columns=columns)
+    return pd.read_csv(path, usecols=columns)
@@ -10,9 +10,14 @@ import os
 from datetime import datetime, timedelta
 import random
 
+from load_readings import EXPORT_DIR, read_readings
+
 FORECAST_TARGETS = ['co2', 'temp', 'total_act_power', 'total_entries', 'total_exits']
 FREQ = '1min'
 FORECAST_HORIZON = 60
+# Pollers with change-only storage skip readings that did not change, but
+# store one at least every heartbeat (5 min): hold each value that long
+STEP_FILL_LIMIT = 5
 
 # -------------------------------
 # Step 1: Preprocessing & Balancing with Synthetic Data
@@ -37,10 +42,19 @@ def generate_synthetic_rows(start_time, num_samples):
         ])
     return pd.DataFrame(rows)
 
+def step_fill(df):
+    # Rebuild the evenly spaced minute series of a polled channel: a missing
+    # minute means "unchanged" for up to STEP_FILL_LIMIT minutes, a gap after that
+    return (
+        df.set_index('timestamp').resample(FREQ).ffill(limit=STEP_FILL_LIMIT)
+        .dropna(how='all').reset_index()
+    )
+
 def preprocess_and_balance(aq_path, em_path, oc_path):
-    aq_df = pd.read_csv(aq_path)
-    em_df = pd.read_csv(em_path)
-    oc_df = pd.read_csv(oc_path)
+    # Each a CSV dump or an export_parquet directory; only these columns are read
+    aq_df = read_readings(aq_path, ['timestamp', 'co2', 'temp', 'pm2p5'])
+    em_df = read_readings(em_path, ['timestamp', 'total_act_power'])
+    oc_df = read_readings(oc_path, ['timestamp', 'total_entries', 'total_exits'])
 
     aq_df['timestamp'] = pd.to_datetime(aq_df['timestamp']).dt.tz_localize(None).dt.floor(FREQ)
     em_df['timestamp'] = pd.to_datetime(em_df['timestamp']).dt.tz_localize(None).dt.floor(FREQ)
@@ -50,6 +64,8 @@ def preprocess_and_balance(aq_path, em_path, oc_path):
     em = em_df[['timestamp', 'total_act_power']].groupby('timestamp').mean().reset_index()
     oc = oc_df[['timestamp', 'total_entries', 'total_exits']].groupby('timestamp').mean().reset_index()
 
+    aq, em = step_fill(aq), step_fill(em)
+
     df = aq.merge(em, on='timestamp', how='outer').merge(oc, on='timestamp', how='outer')
     df = df.sort_values('timestamp').ffill().dropna()
     df['action'] = 'NORMAL'
@@ -124,7 +140,10 @@ def run_all(aq_path, em_path, oc_path, model_dir='models'):
     print("\nAll models saved.")
 
 # Example usage:
-run_all("recommender_system/AQ_data.csv", "recommender_system/EM_data.csv", "recommender_system/OC_data.csv")  
+run_all(os.path.join(EXPORT_DIR, "sensor_type=AQ"), os.path.join(EXPORT_DIR, "sensor_type=EM"),
+        os.path.join(EXPORT_DIR, "sensor_type=OC"))
+
+# run_all("recommender_system/AQ_data.csv", "recommender_system/EM_data.csv", "recommender_system/OC_data.csv")
 
 # run_all(r"recommender_system\AQ_data.csv", r"recommender_system\EM_data.csv", r"recommender_system\OC_data.csv")
 
@@ -2,16 +2,19 @@ from sklearn.preprocessing import MultiLabelBinarizer
 from sklearn.impute import SimpleImputer
 from sklearn.preprocessing import StandardScaler
 
+import os
 import pandas as pd
 
-# Reload the three sensor data files
-aq_path = "recommender-system\AQ_data.csv"
-em_path = "recommender-system\EM_data.csv"
-oc_path = "recommender-system\OC_data.csv"
+from load_readings import EXPORT_DIR, read_readings
 
-aq_df = pd.read_csv(aq_path)
-em_df = pd.read_csv(em_path)
-oc_df = pd.read_csv(oc_path)
+# Reload the three sensor data files (export_parquet output; CSV dumps work too)
+aq_path = os.path.join(EXPORT_DIR, "sensor_type=AQ")
+em_path = os.path.join(EXPORT_DIR, "sensor_type=EM")
+oc_path = os.path.join(EXPORT_DIR, "sensor_type=OC")
+
+aq_df = read_readings(aq_path)
+em_df = read_readings(em_path)
+oc_df = read_readings(oc_path)
 
 # Add sensor_type column to each
 aq_df['sensor_type'] = 'AQ'
@@ -30,7 +33,7 @@ sensor_type = combined_df['sensor_type']
 non_feature_cols = ['id', 'created_at', 'version', 'firmware_version',
                     'mac', 'frame_version', 'peripheral_support', 'digital_signature',
                     'raw_data', 'salt', 'sensor_id', 'device', 'device_id',
-                    'action', 'sensor_type']
+                    'action', 'sensor_type', 'timestamp']
 feature_df = combined_df.drop(columns=[col for col in non_feature_cols if col in combined_df.columns])
 
 # Step 4: Convert everything to numeric where possible
@@ -165,4 +165,145 @@ WEATHER_DEFAULT_LOCATION = {
 }
 
 # Optional: tune how many “future hours” you want to consider for recommendations
-WEATHER_FUTURE_HOURS_FOR_RULES = 6
\ No newline at end of file
+WEATHER_FUTURE_HOURS_FOR_RULES = 6
+
+# Unified SensorData table projection.
+# "on_commit": mirrors are bulk-inserted right after the source rows commit.
+# "interval": mirrors are buffered and flushed by a background thread.
+SENSORDATA_PROJECTION_MODE = "on_commit"
+SENSORDATA_FLUSH_INTERVAL = 1.0  # seconds, "interval" mode only
+SENSORDATA_FLUSH_MAX_ROWS = 500  # flush early once this many rows are waiting
+
+# Asynchronous ingest: push views validate, queue the row and answer 202;
+# a writer thread per model bulk-inserts every INGEST_FLUSH_ROWS rows or
+# INGEST_FLUSH_INTERVAL_MS milliseconds. A full queue answers 429.
+INGEST_ASYNC = False
+INGEST_QUEUE_MAXSIZE = 10000
+INGEST_FLUSH_ROWS = 500
+INGEST_FLUSH_INTERVAL_MS = 200
+INGEST_RETRY_AFTER = 1  # seconds, sent in the Retry-After header of 429 responses
+INGEST_WRITE_RETRY_DELAY_MS = 500  # wait before retrying a failed flush (then row by row)
+
+# Seconds a worker keeps a cached Sensor row before re-reading it; bounds how
+# long other processes can serve a sensor that was edited or deleted elsewhere.
+SENSOR_REGISTRY_TTL = 300
+
+# Worker threads the async (ASGI) ingest views offload database work to
+ASYNC_INGEST_THREADS = 32
+
+# Raw gateway archive for data/oc: compressed, length-prefixed segment files
+# (see server_api/raw_archive.py). With the archive on and RAW_ARCHIVE_DB_ENABLED
+# off the RawSensorData table is no longer written and the archive is the only
+# copy; with the archive off the table is always written.
+RAW_ARCHIVE_ENABLED = False
+RAW_ARCHIVE_DB_ENABLED = True
+RAW_ARCHIVE_DIR = BASE_DIR / "raw_archive"
+RAW_ARCHIVE_SEGMENT_BYTES = 64 * 1024 * 1024  # roll to a new segment at this size...
+RAW_ARCHIVE_SEGMENT_SECONDS = 3600  # ...or after this many seconds
+RAW_ARCHIVE_INDEX_EVERY = 64  # index every Nth record (time -> byte offset)
+
+# Relayed BLE frames: the same Minew counter frame heard by several gateways
+# is stored once. Keys are (mac, serial_number, random_number, signature),
+# kept for OCCUPANCY_DEDUP_TTL seconds in an LRU of at most
+# OCCUPANCY_DEDUP_MAX_ENTRIES keys per worker. Set OCCUPANCY_DEDUP_CACHE to
+# a shared CACHES alias to also catch copies that reach different workers.
+OCCUPANCY_DEDUP_ENABLED = True
+OCCUPANCY_DEDUP_TTL = 120
+OCCUPANCY_DEDUP_MAX_ENTRIES = 100_000
+OCCUPANCY_DEDUP_CACHE = None
+
+# Idempotent TTN uplinks: retries of an uplink (same device id, f_cnt and
+# received_at) get the first response back. The last
+# UPLINK_IDEMPOTENCY_WINDOW uplinks are remembered in memory, all of them in
+# the UplinkReceipt table; prune_uplink_receipts drops receipts older than
+# UPLINK_RECEIPT_RETENTION_DAYS.
+UPLINK_IDEMPOTENCY_WINDOW = 10_000
+UPLINK_RECEIPT_RETENTION_DAYS = 7
+
+# EM fleet poller (poll_em_all): every active EM sensor with an address is
+# polled concurrently on a fixed EM_POLL_INTERVAL-second grid, with at most
+# EM_POLL_CONCURRENCY requests in flight and EM_POLL_TIMEOUT seconds each.
+# Requests are spread over the first EM_POLL_JITTER seconds after a tick and
+# cancelled EM_POLL_DEADLINE seconds after it.
+EM_POLL_INTERVAL = 10
+EM_POLL_TIMEOUT = 3
+EM_POLL_CONCURRENCY = 100
+EM_POLL_JITTER = 1.0
+EM_POLL_DEADLINE = 8
+
+# run_collectors: the pollers and the weather refresher as tasks of one
+# process (see server_api/collectors.py). Crashed collectors are restarted
+# after COLLECTOR_BACKOFF_INITIAL seconds, doubling up to
+# COLLECTOR_BACKOFF_MAX. With COLLECTOR_HEALTH_PORT set, per-collector health
+# is served at http://COLLECTOR_HEALTH_HOST:COLLECTOR_HEALTH_PORT/health.
+COLLECTORS_ENABLED = ("air_quality", "energy", "weather")
+AQ_POLL_URL = "https://sb5-244cabf81d20.local/data"
+AQ_POLL_INTERVAL = 10
+WEATHER_REFRESH_INTERVAL = 3600
+COLLECTOR_BACKOFF_INITIAL = 1
+COLLECTOR_BACKOFF_MAX = 300
+COLLECTOR_HEALTH_HOST = "127.0.0.1"
+COLLECTOR_HEALTH_PORT = None
+
+# Change-only storage for polled readings (poll_aq, poll_em, poll_em_all,
+# run_collectors; see server_api/deadband.py). A reading is stored only when
+# a field below moved by more than its deadband since the device's last
+# stored reading, its action changed, or POLL_HEARTBEAT_SECONDS went by.
+# Keep the heartbeat well under the 15-minute window the recommendation
+# views use to find the latest readings.
+POLL_COMPRESSION_ENABLED = False
+POLL_HEARTBEAT_SECONDS = 300
+POLL_DEADBANDS = {
+    "airqualitydata": {
+        "co2": 10, "temp": 0.2, "humidity": 1.0, "voc": 5,
+        "pm1": 1.0, "pm2p5": 1.0, "pm4": 1.0, "pm10": 1.0,
+    },
+    "energydata": {
+        "total_act_power": 25.0, "total_aprt_power": 25.0, "total_current": 0.1,
+        "a_act_power": 10.0, "b_act_power": 10.0, "c_act_power": 10.0,
+        "a_current": 0.05, "b_current": 0.05, "c_current": 0.05,
+        "a_voltage": 2.0, "b_voltage": 2.0, "c_voltage": 2.0,
+        "a_pf": 0.02, "b_pf": 0.02, "c_pf": 0.02,
+    },
+}
+
+# SensorRollup: 1m/15m/1h min/max/mean/count/last of co2, temp, pm2p5,
+# total_act_power, total_entries/exits and num_targets per sensor, updated
+# together with the SensorData mirrors (see server_api/rollups.py).
+# rebuild_rollups recomputes them from the raw tables.
+ROLLUPS_ENABLED = True
+
+# Monthly partitions of EnergyData and SensorData (PostgreSQL, see
+# server_api/partitions.py). manage_partitions, run daily, keeps the
+# partitions of the next PARTITION_MONTHS_AHEAD months created and drops
+# whole months older than PARTITION_RETENTION_MONTHS (None keeps them all).
+PARTITION_MONTHS_AHEAD = 3
+PARTITION_RETENTION_MONTHS = {
+    "energydata": None,
+    "sensordata": None,
+}
+
+# purge_raw_readings: raw AQ/EM/OC/radar readings older than
+# RAW_RETENTION_DAYS (None keeps them all) are summarised into the hourly
+# SensorRollup and deleted an hour at a time, RAW_PURGE_CHUNK_SIZE rows (and
+# then SensorData mirrors) per transaction (see server_api/retention.py). Older
+# ranges are then only available from the rollups (?resolution=1h).
+RAW_RETENTION_DAYS = None
+RAW_PURGE_CHUNK_SIZE = 5000
+
+# export_parquet: the reading tables as Parquet partitioned by sensor type
+# and day, for the recommender pipeline (see server_api/parquet_export.py).
+# Rows are fetched and written PARQUET_EXPORT_CHUNK_SIZE at a time. Each
+# run re-exports the PARQUET_EXPORT_REEXPORT_DAYS days before the last one
+# exported, to pick up readings that arrived late.
+PARQUET_EXPORT_DIR = BASE_DIR.parent / "recommender_system" / "exports"
+PARQUET_EXPORT_CHUNK_SIZE = 10000
+PARQUET_EXPORT_REEXPORT_DAYS = 2
+
+# Hot store: memory-mapped rings of the last HOT_STORE_CAPACITY readings of
+# the key channels of each sensor, shared by every process on the host
+# (see server_api/hot_store.py). Latest-value reads for the recommender come
+# from it. warm_hot_store fills the rings from the database.
+HOT_STORE_ENABLED = True
+HOT_STORE_DIR = BASE_DIR / "hot_store"
+HOT_STORE_CAPACITY = 4096
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
     Sensor, AirQualityData, EnergyData, OccupancyData, 
-    RadarData, SensorData, RawSensorData, TemperatureHumidityData, Lsg01AirQualityData,
+    RadarData, SensorData, SensorRollup, SensorLatest, RawSensorData, TemperatureHumidityData, Lsg01AirQualityData,
     WeatherLocation, WeatherHourly, WeatherDaily, WeatherCurrent
 )
 
@@ -20,9 +20,9 @@ class TemperatureHumidityDataAdmin(admin.ModelAdmin):
 
 @admin.register(Sensor)
 class SensorAdmin(admin.ModelAdmin):
-    list_display = ('sensor_id', 'sensor_type', 'floor', 'office', 'active')
+    list_display = ('sensor_id', 'sensor_type', 'floor', 'office', 'address', 'active')
     list_filter = ('sensor_type', 'floor', 'active')
-    search_fields = ('sensor_id', 'office', 'description')
+    search_fields = ('sensor_id', 'office', 'description', 'address')
 
 @admin.register(AirQualityData)
 class AirQualityDataAdmin(admin.ModelAdmin):
@@ -52,8 +52,10 @@ class RadarDataAdmin(admin.ModelAdmin):
 class RawSensorDataAdmin(admin.ModelAdmin):
     list_display = ('id', 'received_at', 'short_preview')
     readonly_fields = ('raw_data', 'received_at')
-    search_fields = ('raw_data',)
+    # No search_fields: a text search over raw_data scans the whole table.
+    # Use the raw archive (data/oc/raw?start=&end=) to look at old payloads.
     ordering = ('-received_at',)
+    show_full_result_count = False
 
     def short_preview(self, obj):
         return str(obj.raw_data)[:75] + "..." if len(str(obj.raw_data)) > 75 else str(obj.raw_data)
@@ -110,6 +112,18 @@ class SensorDataAdmin(admin.ModelAdmin):
             
         return fieldsets
 
+@admin.register(SensorRollup)
+class SensorRollupAdmin(admin.ModelAdmin):
+    list_display = ('sensor', 'channel', 'grain', 'bucket', 'count', 'min_value', 'max_value', 'last_value')
+    list_filter = ('grain', 'channel')
+    search_fields = ('sensor__sensor_id',)
+
+@admin.register(SensorLatest)
+class SensorLatestAdmin(admin.ModelAdmin):
+    list_display = ('sensor', 'source', 'timestamp', 'action', 'updated_at')
+    list_filter = ('source',)
+    search_fields = ('sensor__sensor_id',)
+
 
 
 @admin.register(WeatherLocation)
@@ -0,0 +1,84 @@
+# server_api/async_views.py
+"""
+Async (ASGI) versions of the hot ingest endpoints.
+
+Each view dispatches the request to its DRF counterpart in views.py on a
+worker thread, so a slow database commit ties up a pool thread rather than
+the connection. Going through DRF's dispatch keeps parsing, content
+negotiation and exception handling (400/415/... responses) the same as on
+the sync endpoints. One ASGI
+worker can then keep thousands of sensor connections open. Combine with
+INGEST_ASYNC so that the offloaded work is only validation and a queue put,
+and the bulk writer thread does the inserts.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from .views import (
+    AirQualitySensorPushView, Lsg01DataPush, OccupancyDataCreateView, RadarDataCreateView,
+    TemperatureHumidityCreateView,
+)
+
+logger = logging.getLogger(__name__)
+
+# Dedicated pool for the offloaded ingest work, so its size does not depend on
+# the event loop's default executor (which is tiny on small edge boxes)
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "ASYNC_INGEST_THREADS", 32), thread_name_prefix="async-ingest"
+)
+
+
+def _dispatch_in_thread(view, request):
+    # Pool threads keep their own DB connection; recycle it like a request would
+    close_old_connections()
+    try:
+        return view(request).render()
+    finally:
+        close_old_connections()
+
+
+async def _offload(view, request):
+    return await sync_to_async(_dispatch_in_thread, thread_sensitive=False, executor=_executor)(view, request)
+
+
+_occupancy_view = OccupancyDataCreateView.as_view()
+_aq_push_view = AirQualitySensorPushView.as_view()
+_lsg01_view = Lsg01DataPush.as_view()
+_radar_view = RadarDataCreateView.as_view()
+_temperature_view = TemperatureHumidityCreateView.as_view()
+
+
+@csrf_exempt
+@require_POST
+async def occupancy_parsed(request):
+    return await _offload(_occupancy_view, request)
+
+
+@csrf_exempt
+@require_POST
+async def aq_push(request):
+    return await _offload(_aq_push_view, request)
+
+
+@csrf_exempt
+@require_POST
+async def lsg01_push(request):
+    return await _offload(_lsg01_view, request)
+
+
+@csrf_exempt
+@require_POST
+async def radar(request):
+    return await _offload(_radar_view, request)
+
+
+@csrf_exempt
+@require_POST
+async def temperature(request):
+    return await _offload(_temperature_view, request)
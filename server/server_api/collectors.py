@@ -0,0 +1,297 @@
+# server_api/collectors.py
+"""
+Data collectors hosted together by the run_collectors command.
+
+Each collector is a coroutine that loops forever: the AQ poller, the EM
+fleet poller and the weather refresher. One CollectorSupervisor runs them
+all as tasks of a single asyncio loop in one process. They share one HTTP
+session, the process-wide sensor registry, one database connection (ORM work
+runs on asgiref's single sync thread) and the bulk writer of
+ingest_queue.py. A collector that crashes is restarted with exponential
+backoff, and each one keeps a CollectorHealth record the supervisor can
+serve over HTTP.
+"""
+import asyncio
+import datetime
+import logging
+import random
+import time
+
+import aiohttp
+import requests
+from aiohttp import web
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .deadband import deadband_filter
+from .em_poller import EMFleetPoller, polling_session, queue_readings
+from .ingest import air_quality_record
+from .ingest_queue import ingest_queues
+from .polling import FixedRateSchedule
+from .sensor_registry import sensor_registry
+from .weather_service import refresh_weather_for_default_location
+
+logger = logging.getLogger(__name__)
+
+
+def _call_with_fresh_connection(fn, *args):
+    # Collectors run for days: drop a connection the server has closed meanwhile
+    close_old_connections()
+    return fn(*args)
+
+
+# Run blocking ORM (or requests) work on the shared sync thread
+database = sync_to_async(_call_with_fresh_connection)
+
+
+def _iso(epoch):
+    return datetime.datetime.fromtimestamp(epoch).isoformat(timespec="seconds") if epoch else None
+
+
+class CollectorHealth:
+    """
+    Liveness of one collector. It is healthy while it is running and has
+    succeeded within the last three intervals (or started less than three
+    intervals ago).
+    """
+
+    def __init__(self, interval):
+        self.stale_after = 3 * interval
+        self.state = "starting"
+        self.started_at = None
+        self.restarts = 0
+        self.rounds = 0
+        self.failed_rounds = 0
+        self.consecutive_failures = 0
+        self.last_success = None
+        self.last_detail = None
+        self.last_error = None
+        self.last_error_at = None
+        self.retry_at = None
+
+    def running(self):
+        self.state = "running"
+        self.started_at = time.time()
+        self.retry_at = None
+
+    def succeeded(self, detail=None):
+        self.rounds += 1
+        self.consecutive_failures = 0
+        self.last_success = time.time()
+        self.last_detail = detail
+
+    def failed(self, error):
+        """A round failed (device unreachable, bad reply); the collector keeps going."""
+        self.rounds += 1
+        self.failed_rounds += 1
+        self.consecutive_failures += 1
+        self.last_error = str(error)
+        self.last_error_at = time.time()
+
+    def crashed(self, error, retry_in):
+        self.state = "backoff"
+        self.restarts += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        self.last_error_at = time.time()
+        self.retry_at = self.last_error_at + retry_in
+
+    def stopped(self):
+        self.state = "stopped"
+
+    @property
+    def healthy(self):
+        if self.state != "running":
+            return False
+        since = self.last_success or self.started_at
+        return time.time() - since <= self.stale_after
+
+    def as_dict(self):
+        return {
+            "healthy": self.healthy,
+            "state": self.state,
+            "started_at": _iso(self.started_at),
+            "restarts": self.restarts,
+            "rounds": self.rounds,
+            "failed_rounds": self.failed_rounds,
+            "consecutive_failures": self.consecutive_failures,
+            "last_success": _iso(self.last_success),
+            "last_detail": self.last_detail,
+            "last_error": self.last_error,
+            "last_error_at": _iso(self.last_error_at),
+            "retry_at": _iso(self.retry_at),
+        }
+
+
+class Collector:
+    """A named, never-ending coroutine run(session) that reports into self.health."""
+
+    name = None
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.health = CollectorHealth(interval)
+
+    async def run(self, session):
+        raise NotImplementedError
+
+
+class AirQualityCollector(Collector):
+    """What poll_aq does: read the AQ sensor's /data endpoint on the AQ_POLL_INTERVAL grid."""
+
+    name = "air_quality"
+
+    def __init__(self, url=None, interval=None):
+        super().__init__(interval or getattr(settings, "AQ_POLL_INTERVAL", 10))
+        self.url = url or settings.AQ_POLL_URL
+
+    async def run(self, session):
+        schedule = FixedRateSchedule(self.interval)
+        while True:
+            await schedule.wait_async()
+            try:
+                timeout = aiohttp.ClientTimeout(total=schedule.remaining())
+                async with session.get(self.url, timeout=timeout) as response:
+                    if response.status != 200:
+                        self.health.failed(f"HTTP {response.status}")
+                        continue
+                    data = await response.json(content_type=None)
+                sensor = await database(sensor_registry.get_or_create, data.get("device"), 'AQ')
+                record = air_quality_record(sensor, data, schedule.timestamp)
+                changed = deadband_filter.keep(record)
+            except asyncio.TimeoutError:
+                self.health.failed("timeout")
+                continue
+            except (aiohttp.ClientError, AttributeError, TypeError, ValueError) as e:
+                self.health.failed(str(e) or type(e).__name__)
+                continue
+            if not changed:
+                self.health.succeeded(f"co2={record.co2}, unchanged")
+                continue
+            if not ingest_queues.put(record):
+                self.health.failed("Ingest queue is full")
+                continue
+            self.health.succeeded(f"co2={record.co2}")
+
+
+class EnergyFleetCollector(Collector):
+    """What poll_em_all does, with the readings going to the shared bulk writer."""
+
+    name = "energy"
+
+    def __init__(self, interval=None):
+        super().__init__(interval or getattr(settings, "EM_POLL_INTERVAL", 10))
+        self.poller = EMFleetPoller(store=queue_readings)
+
+    async def run(self, session):
+        deadline = getattr(settings, "EM_POLL_DEADLINE", None) or self.interval
+        schedule = FixedRateSchedule(self.interval, deadline=min(deadline, self.interval))
+        while True:
+            await schedule.wait_async()
+            result = await self.poller.poll_round(session, schedule)
+            detail = (
+                f"{result['answered']}/{result['meters']} meters answered, {result['stored']} stored, "
+                f"{schedule.skipped} ticks skipped"
+            )
+            if result["meters"] and not result["answered"]:
+                self.health.failed(f"No meter answered ({detail})")
+            else:
+                self.health.succeeded(detail)
+
+
+class WeatherCollector(Collector):
+    """What fetch_weather does, every WEATHER_REFRESH_INTERVAL seconds (and once at start)."""
+
+    name = "weather"
+
+    def __init__(self, interval=None):
+        super().__init__(interval or getattr(settings, "WEATHER_REFRESH_INTERVAL", 3600))
+
+    async def run(self, session):
+        schedule = FixedRateSchedule(self.interval)
+        while True:
+            try:
+                location = await database(refresh_weather_for_default_location)
+            except requests.RequestException as e:
+                self.health.failed(e)
+            else:
+                self.health.succeeded(f"refreshed {location}")
+            await schedule.wait_async()
+
+
+COLLECTORS = {
+    collector.name: collector
+    for collector in (AirQualityCollector, EnergyFleetCollector, WeatherCollector)
+}
+
+
+class CollectorSupervisor:
+    """
+    Runs collectors as tasks on one loop and restarts any that crash, after
+    COLLECTOR_BACKOFF_INITIAL seconds, doubling up to COLLECTOR_BACKOFF_MAX.
+    A collector that ran longer than the maximum backoff before crashing
+    starts over from the initial delay.
+    """
+
+    def __init__(self, collectors, backoff_initial=None, backoff_max=None):
+        self.collectors = collectors
+        self.backoff_initial = backoff_initial or getattr(settings, "COLLECTOR_BACKOFF_INITIAL", 1)
+        self.backoff_max = backoff_max or getattr(settings, "COLLECTOR_BACKOFF_MAX", 300)
+
+    def health(self):
+        collectors = {collector.name: collector.health.as_dict() for collector in self.collectors}
+        return {"healthy": all(c["healthy"] for c in collectors.values()), "collectors": collectors}
+
+    async def run(self, health_port=None):
+        # One pool for every collector; the EM fleet is the largest user
+        limit = getattr(settings, "EM_POLL_CONCURRENCY", 100) + 10
+        async with polling_session(limit) as session:
+            runner = await self._serve_health(health_port) if health_port else None
+            tasks = [
+                asyncio.create_task(self._supervise(collector, session), name=collector.name)
+                for collector in self.collectors
+            ]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                if runner is not None:
+                    await runner.cleanup()
+
+    async def _supervise(self, collector, session):
+        loop = asyncio.get_running_loop()
+        failures = 0
+        while True:
+            collector.health.running()
+            started = loop.time()
+            try:
+                await collector.run(session)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Collector %s crashed", collector.name)
+                if loop.time() - started > self.backoff_max:
+                    failures = 0
+                failures += 1
+                delay = min(self.backoff_max, self.backoff_initial * 2 ** (failures - 1))
+                # Spread restarts a little so crashed collectors do not retry in lockstep
+                delay *= random.uniform(0.9, 1.1)
+                collector.health.crashed(e, delay)
+                await asyncio.sleep(delay)
+            else:
+                collector.health.stopped()
+                return
+
+    async def _serve_health(self, port):
+        async def health(request):
+            report = self.health()
+            return web.json_response(report, status=200 if report["healthy"] else 503)
+
+        app = web.Application()
+        app.router.add_get("/health", health)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, getattr(settings, "COLLECTOR_HEALTH_HOST", "127.0.0.1"), port).start()
+        return runner
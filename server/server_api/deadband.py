@@ -0,0 +1,177 @@
+# server_api/deadband.py
+"""
+Change-only storage for polled channels.
+
+A poller reads its devices every 10 s, but most readings repeat the last
+one within sensor noise. With POLL_COMPRESSION_ENABLED on, a polled reading
+is stored only when:
+
+- a field listed in POLL_DEADBANDS for its model moved by more than that
+  field's deadband since the last stored reading of the device, or
+- its action changed (a threshold was crossed), or
+- POLL_HEARTBEAT_SECONDS went by since the last stored reading.
+
+A reading only becomes its device's reference once its write has committed
+(the projector hands committed rows to stored()), so a reading whose write
+failed does not suppress the ones after it.
+
+Nothing that matters is lost: between two stored readings, every field
+stayed within its deadband of the earlier one. step_series() rebuilds the
+evenly spaced series by holding each stored value until the next one. The
+heartbeat tells "unchanged" apart from "device offline".
+"""
+import threading
+from bisect import bisect_right
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+
+
+def channel_key(record):
+    """The polled channel a reading belongs to: its model and device."""
+    return (
+        record._meta.model_name,
+        record.sensor_id,
+        getattr(record, "device", None),
+        getattr(record, "device_id", None),
+    )
+
+
+def _moved(new, old, band):
+    if new is None or old is None:
+        return new != old
+    return abs(new - old) > band
+
+
+class DeadbandFilter:
+    """Decides which polled readings to store; see the module docstring."""
+
+    def __init__(self, deadbands=None, heartbeat=None, enabled=None):
+        self._deadbands = deadbands
+        self._heartbeat = heartbeat
+        self._enabled = enabled
+        self._lock = threading.Lock()
+        self._last = {}
+        self._stored = Counter()
+        self._suppressed = Counter()
+
+    @property
+    def enabled(self):
+        if self._enabled is not None:
+            return self._enabled
+        return getattr(settings, "POLL_COMPRESSION_ENABLED", False)
+
+    @property
+    def deadbands(self):
+        if self._deadbands is not None:
+            return self._deadbands
+        return getattr(settings, "POLL_DEADBANDS", {})
+
+    @property
+    def heartbeat(self):
+        if self._heartbeat is not None:
+            return self._heartbeat
+        return getattr(settings, "POLL_HEARTBEAT_SECONDS", 300)
+
+    def _reference(self, record, bands):
+        return {
+            "timestamp": record.timestamp,
+            "action": record.action or record.determine_action(),
+            "values": {field: getattr(record, field) for field in bands},
+        }
+
+    def keep(self, record):
+        """True if `record` (unsaved, with its timestamp set) should be stored."""
+        model_name = record._meta.model_name
+        bands = self.deadbands.get(model_name)
+        if not self.enabled or bands is None:
+            return True
+        # Compare actions the way save() would fill them
+        if not record.action:
+            record.action = record.determine_action()
+        new = self._reference(record, bands)
+
+        with self._lock:
+            last = self._last.get(channel_key(record))
+            store = (
+                last is None
+                or (new["timestamp"] - last["timestamp"]).total_seconds() >= self.heartbeat
+                or new["action"] != last["action"]
+                or any(_moved(new["values"][field], last["values"][field], band) for field, band in bands.items())
+            )
+            if store:
+                self._stored[model_name] += 1
+            else:
+                self._suppressed[model_name] += 1
+        return store
+
+    def stored(self, records):
+        """Make committed readings the reference of their devices (the newest one of each wins)."""
+        if not self.enabled:
+            return
+        for record in records:
+            bands = self.deadbands.get(record._meta.model_name)
+            if bands is None or record.timestamp is None:
+                continue
+            reference = self._reference(record, bands)
+            key = channel_key(record)
+            with self._lock:
+                last = self._last.get(key)
+                if last is None or reference["timestamp"] >= last["timestamp"]:
+                    self._last[key] = reference
+
+    def stored_on_commit(self, records):
+        if self.enabled:
+            transaction.on_commit(lambda: self.stored(records))
+
+    def filter(self, records):
+        return [record for record in records if self.keep(record)]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "heartbeat": self.heartbeat,
+                "channels": len(self._last),
+                "stored": dict(self._stored),
+                "suppressed": dict(self._suppressed),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._last.clear()
+            self._stored.clear()
+            self._suppressed.clear()
+
+
+deadband_filter = DeadbandFilter()
+
+
+def step_series(readings, start, end, step, fields, max_age=None):
+    """
+    Rebuild an evenly spaced series from change-only readings of one device.
+
+    `readings` are dicts with a "timestamp" and the `fields`, sorted by
+    timestamp; they should include the last reading before `start`. Returns
+    one dict per `step` (a timedelta) from `start` to `end`, where each field
+    holds the last stored value at or before that instant. Values older than
+    `max_age` seconds (by default two heartbeats) count as a gap and are None.
+    """
+    if max_age is None:
+        max_age = 2 * getattr(settings, "POLL_HEARTBEAT_SECONDS", 300)
+    max_age = timedelta(seconds=max_age)
+    times = [reading["timestamp"] for reading in readings]
+
+    series = []
+    instant = start
+    while instant <= end:
+        index = bisect_right(times, instant) - 1
+        reading = readings[index] if index >= 0 and instant - times[index] <= max_age else None
+        sample = {"timestamp": instant}
+        for field in fields:
+            sample[field] = reading.get(field) if reading is not None else None
+        series.append(sample)
+        instant += step
+    return series
@@ -0,0 +1,129 @@
+# server_api/dedup.py
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def frame_key(mac, parsed_dict):
+    """Identity of one counter frame: the same frame relayed by several gateways has the same key."""
+    return (
+        mac,
+        parsed_dict.get("serial_number"),
+        parsed_dict.get("random_number"),
+        parsed_dict.get("digital_signature"),
+    )
+
+
+def _cache_key(key):
+    return "oc-frame:" + ":".join(map(str, key))
+
+
+class FrameDedup:
+    """
+    Bounded TTL + LRU set of recently seen occupancy frames.
+
+    Several Minew gateways hear the same BLE advertisement and all forward
+    it; only the first copy inside OCCUPANCY_DEDUP_TTL seconds is kept. The
+    set holds at most OCCUPANCY_DEDUP_MAX_ENTRIES keys, evicting the least
+    recently seen. It lives in this process; with OCCUPANCY_DEDUP_CACHE set to
+    a shared Django cache alias (Redis, Memcached) first sightings are also
+    claimed there with cache.add(), so copies that land on different workers
+    are caught too.
+
+    A frame is claimed when it is first checked, so copies arriving while it
+    is being written are still dropped; a writer that fails hands its claims
+    back with release().
+    """
+
+    def __init__(self, ttl=None, max_entries=None, cache_alias=None):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._cache_alias = cache_alias
+        self._lock = threading.Lock()
+        self._seen = OrderedDict()
+        self._checked = 0
+        self._suppressed = Counter()
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else getattr(settings, "OCCUPANCY_DEDUP_TTL", 120)
+
+    @property
+    def max_entries(self):
+        if self._max_entries is not None:
+            return self._max_entries
+        return getattr(settings, "OCCUPANCY_DEDUP_MAX_ENTRIES", 100_000)
+
+    @property
+    def cache_alias(self):
+        # "" disables the shared cache for this instance
+        if self._cache_alias is not None:
+            return self._cache_alias
+        return getattr(settings, "OCCUPANCY_DEDUP_CACHE", None)
+
+    def is_duplicate(self, key, gateway=None, now=None):
+        """
+        Record a sighting of `key` and return True if it was already seen
+        within the TTL. `now` (epoch seconds) lets replays use the original
+        receive time instead of the wall clock.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._checked += 1
+            expires_at = self._seen.get(key)
+            if expires_at is not None and expires_at > now:
+                self._seen.move_to_end(key)
+                self._suppressed[gateway or "unknown"] += 1
+                return True
+            self._seen[key] = now + self.ttl
+            self._seen.move_to_end(key)
+            while len(self._seen) > self.max_entries:
+                self._seen.popitem(last=False)
+
+        if self.cache_alias and not caches[self.cache_alias].add(_cache_key(key), 1, timeout=self.ttl):
+            with self._lock:
+                self._suppressed[gateway or "unknown"] += 1
+            return True
+        return False
+
+    def filter(self, frames, gateway=None, now=None):
+        """Drop duplicate (mac, rssi, raw, parsed_dict) frames; returns the frames to keep."""
+        return [
+            frame for frame in frames
+            if not self.is_duplicate(frame_key(frame[0], frame[3]), gateway, now)
+        ]
+
+    def release(self, keys):
+        """
+        Forget the sightings of `keys` (frames kept by filter() whose write
+        failed), here and in the shared cache, so the sender's retry is kept.
+        """
+        with self._lock:
+            for key in keys:
+                self._seen.pop(key, None)
+        if self.cache_alias:
+            caches[self.cache_alias].delete_many([_cache_key(key) for key in keys])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._seen),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "shared_cache": self.cache_alias,
+                "checked": self._checked,
+                "suppressed": sum(self._suppressed.values()),
+                "suppressed_by_gateway": dict(self._suppressed),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._seen.clear()
+            self._checked = 0
+            self._suppressed.clear()
+
+
+frame_dedup = FrameDedup()
@@ -0,0 +1,194 @@
+# server_api/em_poller.py
+"""
+Concurrent polling of the Shelly energy meter fleet.
+
+Every active EM sensor with an address is asked for EM.GetStatus once per
+round. All requests of a round run concurrently on one asyncio loop over a
+shared aiohttp session (pooled keep-alive connections), each with its own
+timeout, so one slow or dead meter delays nobody else. Rounds follow a
+FixedRateSchedule (see polling.py): each meter is asked at its own small,
+stable offset after the tick, requests still running at the round deadline
+are cancelled, and the readings of a round are stored with one bulk insert,
+stamped with the tick.
+"""
+import asyncio
+import logging
+import time
+
+import aiohttp
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .deadband import deadband_filter
+from .models import EnergyData, Sensor
+from .ingest_queue import ingest_queues
+from .polling import FixedRateSchedule, device_jitter, gather_until
+from .projector import projector
+
+logger = logging.getLogger(__name__)
+
+EM_STATUS_PATH = "/rpc/EM.GetStatus?id=0"
+
+# EnergyData columns filled from the EM.GetStatus reply
+EM_FIELDS = (
+    "a_current", "a_voltage", "a_act_power", "a_aprt_power", "a_pf", "a_freq",
+    "b_current", "b_voltage", "b_act_power", "b_aprt_power", "b_pf", "b_freq",
+    "c_current", "c_voltage", "c_act_power", "c_aprt_power", "c_pf", "c_freq",
+    "total_current", "total_act_power", "total_aprt_power",
+)
+
+
+def em_status_url(address):
+    """EM.GetStatus URL of a meter whose Sensor.address is host[:port] or a base URL."""
+    base = address if "://" in address else f"http://{address}"
+    return base.rstrip("/") + EM_STATUS_PATH
+
+
+def em_device_id(sensor, data):
+    # EnergyData.device_id is an integer: meters registered under a numeric
+    # sensor_id keep it, others fall back to the EM component id
+    try:
+        return int(sensor.sensor_id)
+    except ValueError:
+        return int(data.get("id") or 0)
+
+
+def energy_record(sensor, data, timestamp):
+    """Unsaved EnergyData row from an EM.GetStatus reply; ValueError if a reading is missing."""
+    missing = [field for field in EM_FIELDS if data.get(field) is None]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+    record = EnergyData(
+        sensor=sensor,
+        device_id=em_device_id(sensor, data),
+        timestamp=timestamp,
+        **{field: data[field] for field in EM_FIELDS},
+    )
+    # bulk_create skips save(), so fill the action the same way save() would
+    record.action = record.determine_action()
+    return record
+
+
+def load_em_sensors():
+    # Pollers run for days: drop a connection the server has closed meanwhile
+    close_old_connections()
+    return list(Sensor.objects.filter(sensor_type="EM", active=True).exclude(address="").order_by("pk"))
+
+
+def store_readings(records):
+    if records:
+        with transaction.atomic():
+            EnergyData.objects.bulk_create(records)
+            projector.add(records)
+    return len(records)
+
+
+def queue_readings(records):
+    """Hand readings to the shared bulk writer instead; returns how many it accepted."""
+    return sum(ingest_queues.put(record) for record in records)
+
+
+def polling_session(limit, interval=10):
+    """aiohttp session for devices polled every `interval` seconds, at most `limit` connections."""
+    connector = aiohttp.TCPConnector(
+        limit=limit,
+        ttl_dns_cache=300,
+        # Keep idle connections across rounds so every round reuses them
+        keepalive_timeout=max(15, 2 * interval),
+        # Devices serve HTTPS with self-signed certificates, as before
+        ssl=False,
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+
+class EMFleetPoller:
+    """
+    Polls every active EM sensor concurrently. At most `concurrency` requests
+    (EM_POLL_CONCURRENCY) are in flight at once and each gets `timeout`
+    seconds (EM_POLL_TIMEOUT) in total. Meter requests are spread over the
+    first `jitter` seconds (EM_POLL_JITTER) after each tick. Readings are
+    written by `store` (a sync callable taking the round's EnergyData rows),
+    one bulk insert per round by default.
+    """
+
+    def __init__(self, timeout=None, concurrency=None, jitter=None, store=store_readings):
+        self.timeout = timeout if timeout is not None else getattr(settings, "EM_POLL_TIMEOUT", 3)
+        self.concurrency = concurrency or getattr(settings, "EM_POLL_CONCURRENCY", 100)
+        self.jitter = jitter if jitter is not None else getattr(settings, "EM_POLL_JITTER", 1.0)
+        self.store = store
+
+    def session(self, interval=10):
+        return polling_session(self.concurrency, interval)
+
+    async def fetch(self, session, sensor):
+        """(sensor, reply or None, error or None) for one meter; never raises."""
+        await asyncio.sleep(device_jitter(sensor.sensor_id, self.jitter))
+        try:
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            async with session.get(em_status_url(sensor.address), timeout=timeout) as response:
+                if response.status != 200:
+                    return sensor, None, f"HTTP {response.status}"
+                return sensor, await response.json(content_type=None), None
+        except asyncio.TimeoutError:
+            return sensor, None, "timeout"
+        except (aiohttp.ClientError, ValueError) as e:
+            return sensor, None, str(e) or type(e).__name__
+
+    async def poll_round(self, session, schedule):
+        """
+        Poll every meter once and store the readings (only the changed ones
+        when POLL_COMPRESSION_ENABLED is on). Returns a summary dict: meters
+        polled, meters that answered, rows stored, {sensor_id: error} of the
+        failures, seconds.
+        """
+        started = time.perf_counter()
+        sensors = await sync_to_async(load_em_sensors)()
+        replies = await gather_until(
+            [self.fetch(session, sensor) for sensor in sensors], schedule.remaining()
+        )
+
+        records = []
+        failed = {}
+        # One timestamp per round: the tick, so the fleet's readings line up
+        timestamp = schedule.timestamp
+        for sensor, reply in zip(sensors, replies):
+            data, error = reply[1:] if reply is not None else (None, "deadline")
+            if error is None:
+                try:
+                    records.append(energy_record(sensor, data, timestamp))
+                except (AttributeError, TypeError, ValueError) as e:
+                    error = str(e)
+            if error is not None:
+                failed[sensor.sensor_id] = error
+
+        stored = await sync_to_async(self.store)(deadband_filter.filter(records))
+        return {
+            "meters": len(sensors),
+            "answered": len(records),
+            "stored": stored,
+            "failed": failed,
+            "elapsed": time.perf_counter() - started,
+        }
+
+    async def run(self, interval=10, rounds=None, report=None, deadline=None):
+        """
+        Poll on a fixed `interval` grid, `rounds` times (forever by default).
+        Each round must finish within `deadline` seconds (EM_POLL_DEADLINE) of
+        its tick.
+        """
+        if deadline is None:
+            deadline = getattr(settings, "EM_POLL_DEADLINE", None)
+        schedule = FixedRateSchedule(interval, deadline=min(deadline or interval, interval))
+        async with self.session(interval) as session:
+            while rounds is None or schedule.ticks < rounds:
+                await schedule.wait_async()
+                try:
+                    result = await self.poll_round(session, schedule)
+                except Exception:
+                    # A database hiccup must not end the poller; the next round retries
+                    logger.exception("EM poll round failed")
+                    continue
+                result["skipped_ticks"] = schedule.skipped
+                if report is not None:
+                    report(result)
@@ -0,0 +1,266 @@
+# server_api/hot_store.py
+"""
+Memory-mapped ring buffers of the most recent readings of each sensor.
+
+Every sensor of AirQualityData, EnergyData, OccupancyData and RadarData has
+a file <HOT_STORE_DIR>/<table>/<sensor pk>.ring holding its last
+HOT_STORE_CAPACITY readings of the key channels (the ROLLUP_CHANNELS), and
+<table>/table.ring holds the newest readings of the table as a whole. Each
+file is a small header followed by a NumPy structured array used as a
+ring. It is mapped into every process that touches it, so all web workers
+and collectors share one copy through the page cache. Reading the latest
+value or the last few minutes never reaches the database. The files
+outlive the processes, so a restarted worker finds them as they were.
+
+The projector records readings once their transaction commits. A reading
+older than the newest one already in its ring is left out (replays and
+backfills), which keeps every ring in time order. Writers to the same
+ring are serialised with an flock where the platform has one. Readers
+take no lock: each slot carries the sequence number it was written
+with, and slots overwritten while being read are dropped.
+A ring is read from its newest slot, so the latest value is a single slot
+copy. warm_hot_store fills empty rings from the database.
+"""
+import logging
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import SensorLatest
+from .rollups import ROLLUP_CHANNELS
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev servers only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+HOT_MODELS = tuple(ROLLUP_CHANNELS)
+
+# Header words: magic, capacity, readings written so far
+MAGIC = 0x52494E4731  # "RING1"
+HEADER_WORDS = 8
+HEADER_BYTES = HEADER_WORDS * 8
+
+TABLE_RING = "table"
+
+
+def hot_store_enabled():
+    return getattr(settings, "HOT_STORE_ENABLED", True)
+
+
+def record_dtype(model):
+    return np.dtype(
+        [("seq", "<u8"), ("timestamp", "<M8[us]"), ("sensor_pk", "<i8")]
+        + [(channel, "<f8") for channel in ROLLUP_CHANNELS[model]]
+    )
+
+
+class Ring:
+    """The ring of one sensor, mapped from its file (created if missing)."""
+
+    def __init__(self, path, dtype, capacity):
+        self.path = path
+        self.dtype = dtype
+        if not os.path.exists(path):
+            self._create(path, capacity)
+        self.header = np.memmap(path, dtype="<u8", mode="r+", shape=(HEADER_WORDS,))
+        if self.header[0] != MAGIC:
+            raise ValueError(f"{path} is not a hot store ring")
+        # The file keeps the capacity it was created with
+        self.capacity = int(self.header[1])
+        self.slots = np.memmap(path, dtype=dtype, mode="r+", offset=HEADER_BYTES, shape=(self.capacity,))
+
+    def _create(self, path, capacity):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        header = np.zeros(HEADER_WORDS, dtype="<u8")
+        header[0], header[1] = MAGIC, capacity
+        # Written aside and linked into place, so nobody maps a half-written
+        # file; unlike a rename, the link fails if another worker got there
+        # first, and its ring (maybe already written to) is the one kept
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as handle:
+            handle.write(header.tobytes())
+            handle.truncate(HEADER_BYTES + capacity * self.dtype.itemsize)
+        try:
+            os.link(temporary, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(temporary)
+
+    @property
+    def written(self):
+        return int(self.header[2])
+
+    def _locked(self):
+        handle = open(self.path, "rb")
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    def clear(self):
+        with self._locked():
+            self.header[2] = 0
+
+    def append(self, readings):
+        """Append (timestamp, values) pairs; ones older than the newest reading are skipped."""
+        with self._locked():
+            written = self.written
+            newest = self.slots[(written - 1) % self.capacity]["timestamp"] if written else None
+            for timestamp, values in sorted(readings, key=lambda reading: reading[0]):
+                if newest is not None and timestamp < newest:
+                    continue
+                slot = self.slots[written % self.capacity]
+                slot["seq"] = 0  # invalid while half written
+                slot["timestamp"] = timestamp
+                for channel, value in values.items():
+                    slot[channel] = np.nan if value is None else value
+                written += 1
+                slot["seq"] = written
+                self.header[2] = written
+                newest = timestamp
+
+    def newest(self):
+        """Copy of the newest reading, or None."""
+        for _ in range(3):
+            written = self.written
+            if not written:
+                return None
+            reading = self.slots[(written - 1) % self.capacity].copy()
+            if reading["seq"] == written:
+                return reading
+        return None  # Overwritten under us every time
+
+    def last(self, count):
+        """Copy of the newest `count` readings (fewer if not written yet), oldest first."""
+        written = self.written
+        count = min(count, written, self.capacity)
+        if count <= 0:
+            return np.empty(0, dtype=self.dtype)
+        sequence = np.arange(written - count, written, dtype="<u8")
+        readings = self.slots[sequence % self.capacity].copy()
+        # Slots overwritten meanwhile carry a later sequence number
+        return readings[readings["seq"] == sequence + 1]
+
+    def since(self, moment):
+        """Copy of the readings stamped at or after `moment`, oldest first."""
+        readings = self.last(self.capacity)
+        start = np.searchsorted(readings["timestamp"], np.datetime64(moment, "us"), side="left")
+        return readings[start:]
+
+
+class HotStore:
+    """Opens rings on first use and keeps them mapped for the life of the process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rings = {}
+
+    @property
+    def root(self):
+        return str(getattr(settings, "HOT_STORE_DIR", "hot_store"))
+
+    def _path(self, model, sensor_pk):
+        name = TABLE_RING if sensor_pk is None else sensor_pk
+        return os.path.join(self.root, model._meta.model_name, f"{name}.ring")
+
+    def ring(self, model, sensor_pk, create=False):
+        """The ring of one sensor of `model` (of the whole table for sensor_pk=None)."""
+        key = (model, sensor_pk)
+        ring = self._rings.get(key)
+        if ring is None:
+            path = self._path(model, sensor_pk)
+            if not create and not os.path.exists(path):
+                return None
+            with self._lock:
+                ring = self._rings.get(key)
+                if ring is None:
+                    capacity = getattr(settings, "HOT_STORE_CAPACITY", 4096)
+                    ring = self._rings[key] = Ring(path, record_dtype(model), capacity)
+        return ring
+
+    def sensors(self, model):
+        """Primary keys of the sensors of `model` that have a ring."""
+        try:
+            names = os.listdir(os.path.join(self.root, model._meta.model_name))
+        except FileNotFoundError:
+            return []
+        return [int(name[:-5]) for name in names if name.endswith(".ring") and name[:-5].isdigit()]
+
+    def record(self, instances):
+        """Append saved readings to the rings of their sensors."""
+        by_ring = {}
+        for instance in instances:
+            channels = ROLLUP_CHANNELS.get(type(instance))
+            if channels is None or instance.sensor_id is None or instance.timestamp is None:
+                continue
+            timestamp = np.datetime64(instance.timestamp.replace(tzinfo=None), "us")
+            values = {channel: getattr(instance, channel) for channel in channels}
+            values["sensor_pk"] = instance.sensor_id
+            by_ring.setdefault((type(instance), instance.sensor_id), []).append((timestamp, values))
+            by_ring.setdefault((type(instance), None), []).append((timestamp, values))
+        for (model, sensor_pk), readings in by_ring.items():
+            try:
+                self.ring(model, sensor_pk, create=True).append(readings)
+            except (OSError, ValueError):
+                # The database has the readings; readers fall back to it
+                logger.exception("Failed to record %d readings in the hot store", len(readings))
+
+    def record_on_commit(self, instances):
+        if hot_store_enabled():
+            transaction.on_commit(lambda: self.record(instances))
+
+    def latest(self, model, sensor_pk=None):
+        """
+        The newest reading of one sensor of `model`, or of any of them, as a
+        dict of sensor_pk, timestamp and the channels. None if there is none.
+        """
+        ring = self.ring(model, sensor_pk)
+        reading = ring.newest() if ring is not None else None
+        return None if reading is None else as_dict(reading)
+
+    def window(self, model, sensor_pk, since):
+        """The readings of one sensor stamped at or after `since`, as a structured array."""
+        ring = self.ring(model, sensor_pk)
+        if ring is None:
+            return np.empty(0, dtype=record_dtype(model))
+        return ring.since(since)
+
+
+def as_dict(reading):
+    """A ring slot as sensor_pk, timestamp and channel values (NaN back to None)."""
+    values = {"sensor_pk": int(reading["sensor_pk"]), "timestamp": reading["timestamp"].astype(datetime)}
+    for channel in reading.dtype.names[3:]:
+        value = float(reading[channel])
+        values[channel] = None if np.isnan(value) else value
+    return values
+
+
+def latest_reading(model, since=None):
+    """
+    The newest reading of any sensor of `model` (stamped at or after
+    `since`), from the hot store, or from SensorLatest while the store has
+    no ring for the table.
+    """
+    if hot_store_enabled() and hot_store.ring(model, None) is not None:
+        reading = hot_store.latest(model)
+        if reading is None or (since is not None and reading["timestamp"] < since):
+            return None
+        return reading
+    rows = SensorLatest.objects.filter(source=model._meta.model_name)
+    if since is not None:
+        rows = rows.filter(timestamp__gte=since)
+    latest = rows.order_by("-timestamp").first()
+    if latest is None:
+        return None
+    values = {channel: latest.values.get(channel) for channel in ROLLUP_CHANNELS[model]}
+    return {"sensor_pk": latest.sensor_id, "timestamp": latest.timestamp, **values}
+
+
+hot_store = HotStore()
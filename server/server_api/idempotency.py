@@ -0,0 +1,207 @@
+# server_api/idempotency.py
+"""
+Idempotent ingestion of TTN (LoRaWAN) uplinks.
+
+TTN retries a webhook until it gets a response in time, so the same uplink
+can arrive several times. An uplink is identified by its device id, frame
+counter (f_cnt) and TTN receive time. The first delivery is processed and its
+response stored in UplinkReceipt (whose unique constraint settles concurrent
+retries); every retry gets that stored response back without decoding,
+validating or inserting anything. Recent receipts are also kept in a small
+in-process LRU window, so most retries do not even touch the database.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework.response import Response
+
+from .models import UplinkReceipt
+
+
+# LoRaWAN frame counters are 32 bits
+MAX_F_CNT = 2**32 - 1
+
+
+def uplink_key(uplink):
+    """
+    (device_id, f_cnt, received_at) of a TTN uplink message, or None if any is
+    missing or unusable (such uplinks are processed without idempotency).
+    """
+    if not isinstance(uplink, dict):
+        return None
+    device_ids = uplink.get("end_device_ids")
+    uplink_message = uplink.get("uplink_message")
+    device_id = device_ids.get("device_id") if isinstance(device_ids, dict) else None
+    if not isinstance(uplink_message, dict):
+        uplink_message = {}
+    received_at = uplink.get("received_at") or uplink_message.get("received_at")
+    try:
+        f_cnt = int(uplink_message.get("f_cnt"))
+    except (TypeError, ValueError):
+        return None
+    if device_id is None or not received_at or not 0 <= f_cnt <= MAX_F_CNT:
+        return None
+    key = str(device_id), f_cnt, str(received_at)
+    # Too long for UplinkReceipt: not a real TTN uplink
+    if len(key[0]) > UplinkReceipt._meta.get_field("device_id").max_length:
+        return None
+    if len(key[2]) > UplinkReceipt._meta.get_field("received_at").max_length:
+        return None
+    return key
+
+
+class UplinkWindow:
+    """Bounded LRU of uplink key -> (status_code, response data) for recently processed uplinks."""
+
+    def __init__(self, max_entries=None):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @property
+    def max_entries(self):
+        if self._max_entries is not None:
+            return self._max_entries
+        return getattr(settings, "UPLINK_IDEMPOTENCY_WINDOW", 10_000)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+uplink_window = UplinkWindow()
+
+
+def _stored(key):
+    device_id, f_cnt, received_at = key
+    return (
+        UplinkReceipt.objects
+        .filter(device_id=device_id, f_cnt=f_cnt, received_at=received_at)
+        .values_list("status_code", "response")
+        .first()
+    )
+
+
+def _replay(entry):
+    status_code, data = entry
+    response = Response(data, status=status_code)
+    response["Idempotent-Replay"] = "true"
+    return response
+
+
+def idempotent_uplink(uplink, handler):
+    """
+    Run handler() (which returns a DRF Response) once per uplink. Retries get
+    the stored response back. Error responses (4xx/5xx) are not stored, so a
+    retry after the problem is fixed is processed normally. Uplinks without
+    an f_cnt/received_at are always processed.
+    """
+    key = uplink_key(uplink)
+    if key is None:
+        return handler()
+
+    entry = uplink_window.get(key) or _stored(key)
+    if entry is not None:
+        uplink_window.put(key, entry)
+        return _replay(entry)
+
+    device_id, f_cnt, received_at = key
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                # Claim the uplink first: a concurrent retry blocks on the unique
+                # index until this transaction ends, then fails here
+                receipt = UplinkReceipt.objects.create(device_id=device_id, f_cnt=f_cnt, received_at=received_at)
+        except IntegrityError:
+            entry = _stored(key)
+            if entry is None:
+                return handler()
+            uplink_window.put(key, entry)
+            return _replay(entry)
+
+        response = handler()
+        if response.status_code >= 400:
+            transaction.set_rollback(True)
+            return response
+
+        receipt.status_code = response.status_code
+        receipt.response = response.data
+        receipt.save(update_fields=["status_code", "response"])
+
+    uplink_window.put(key, (response.status_code, response.data))
+    return response
+
+
+def filter_seen_uplinks(uplinks):
+    """
+    For a batch of uplinks, return {index: (status_code, response data)} of
+    the ones already processed (window first, then one receipt query), and of
+    repeats of an earlier uplink in the same batch.
+    """
+    seen = {}
+    keys = {}
+    for index, uplink in enumerate(uplinks):
+        key = uplink_key(uplink)
+        if key is None:
+            continue
+        entry = uplink_window.get(key)
+        if entry is not None:
+            seen[index] = entry
+        elif key in keys:
+            # Repeated inside this batch: the first copy is the one processed
+            seen[index] = (None, {"duplicate_of_index": keys[key]})
+        else:
+            keys[key] = index
+    if keys:
+        rows = UplinkReceipt.objects.filter(
+            device_id__in={key[0] for key in keys}, f_cnt__in={key[1] for key in keys}
+        ).values_list("device_id", "f_cnt", "received_at", "status_code", "response")
+        for device_id, f_cnt, received_at, status_code, data in rows:
+            index = keys.get((device_id, f_cnt, received_at))
+            if index is not None:
+                seen[index] = (status_code, data)
+                uplink_window.put((device_id, f_cnt, received_at), seen[index])
+    return seen
+
+
+def record_uplinks(uplinks, results):
+    """
+    Store receipts for the batch uplinks whose result went through (created
+    or queued). Call it in the transaction that stored them; the window only
+    learns of them once it commits.
+    """
+    receipts = []
+    entries = {}
+    for uplink, result in zip(uplinks, results):
+        key = uplink_key(uplink)
+        if key is None or result["status"] not in ("created", "queued"):
+            continue
+        status_code = 201 if result["status"] == "created" else 202
+        receipts.append(UplinkReceipt(
+            device_id=key[0], f_cnt=key[1], received_at=key[2], status_code=status_code, response=result,
+        ))
+        entries[key] = (status_code, result)
+    # A concurrent retry of the same batch may have recorded some already
+    UplinkReceipt.objects.bulk_create(receipts, ignore_conflicts=True)
+
+    def remember():
+        for key, entry in entries.items():
+            uplink_window.put(key, entry)
+
+    transaction.on_commit(remember)
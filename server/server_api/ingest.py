@@ -0,0 +1,277 @@
+# server_api/ingest.py
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .ingest_queue import async_ingest_enabled, ingest_queues
+from .models import AirQualityData, OccupancyData, Sensor
+from .projector import projector
+from .sensor_registry import sensor_registry
+from .decoders import decode_batch
+from .dedup import frame_dedup, frame_key
+
+
+def last_occupancy_totals(sensors, before=None):
+    """
+    Fetch the most recent OccupancyData row of every given sensor in one query
+    (optionally only among rows with a timestamp before `before`).
+    The query is driven from the sensors: each one costs a single probe of
+    the (sensor, timestamp) index, however many rows it has.
+    Returns a dict of sensor pk -> {"entries", "exits", "s_no"}.
+    """
+    latest = OccupancyData.objects.filter(sensor=OuterRef("pk"))
+    if before is not None:
+        latest = latest.filter(timestamp__lt=before)
+    latest_pk = latest.order_by("-timestamp", "-pk").values("pk")[:1]
+    latest_pks = (
+        Sensor.objects.filter(pk__in=[sensor.pk for sensor in sensors])
+        .annotate(last_pk=Subquery(latest_pk))
+        .values("last_pk")
+    )
+    rows = (
+        OccupancyData.objects
+        .filter(pk__in=latest_pks)
+        .values_list("sensor_id", "total_entries", "total_exits", "serial_number")
+    )
+    return {
+        sensor_pk: {"entries": entries, "exits": exits, "s_no": s_no}
+        for sensor_pk, entries, exits, s_no in rows
+    }
+
+
+def decode_minew_items(sensor_data_list, keys=None):
+    """
+    Decode the counter frames of a Minew gateway batch without touching the
+    database. All frames are decoded together by the "minew_v3" decoder; gateway
+    heartbeats and device information frames (frame_version "00") are skipped.
+    `keys`, if given, runs parallel to sensor_data_list and each frame tuple is
+    prefixed with the key of its item.
+    Returns ([(mac, rssi, raw, parsed_dict), ...], errors).
+    """
+    errors = []
+    frames = []
+
+    indexes = [
+        i for i, item in enumerate(sensor_data_list)
+        if "gateway" not in item and "raw" in item
+    ]
+    decoded = decode_batch("minew_v3", [sensor_data_list[i]["raw"] for i in indexes])
+
+    for n, i in enumerate(indexes):
+        item = sensor_data_list[i]
+        parsed_dict = decoded[n]
+
+        # Skip device information frame (frame_version == "00")
+        if parsed_dict.get("frame_version") == "00":
+            continue
+
+        if parsed_dict.get("error"):
+            errors.append(f"Error parsing raw data for item {item}: {parsed_dict.get('error')}")
+            continue
+
+        mac = item.get("mac", parsed_dict.get("mac", "unknown-mac"))
+        frame = (mac, item.get("rssi", -99), item["raw"], parsed_dict)
+        frames.append(frame if keys is None else (keys[i], *frame))
+
+    return frames, errors
+
+
+def occupancy_record(sensor, mac, rssi, raw, parsed_dict, totals, timestamp):
+    """
+    Build the (unsaved) OccupancyData row of one decoded frame and advance the
+    MAC's running `totals` in place. A frame only adds to the totals when its
+    serial_number differs from the previous one of that MAC.
+    """
+    serial_no = int(parsed_dict.get("serial_number", 0))
+    if serial_no != totals["s_no"]:
+        totals["entries"] += int(parsed_dict.get("entries", 0))
+        totals["exits"] += int(parsed_dict.get("exits", 0))
+        totals["s_no"] = serial_no
+
+    record = OccupancyData(
+        sensor=sensor,
+        mac=parsed_dict.get("mac", mac),
+        frame_version=parsed_dict.get("frame_version"),
+        battery=parsed_dict.get("battery"),
+        firmware_version=parsed_dict.get("firmware_version"),
+        peripheral_support=parsed_dict.get("peripheral_support"),
+        salt=parsed_dict.get("salt"),
+        digital_signature=parsed_dict.get("digital_signature"),
+        usage=parsed_dict.get("usage"),
+        serial_number=parsed_dict.get("serial_number"),
+        entries=parsed_dict.get("entries"),
+        exits=parsed_dict.get("exits"),
+        random_number=parsed_dict.get("random_number"),
+        raw_data=raw,
+        rssi=rssi,
+        timestamp=timestamp,
+        total_entries=totals["entries"],
+        total_exits=totals["exits"],
+    )
+    # bulk_create skips save(), so fill the action the same way save() would
+    record.action = record.determine_action()
+    return record
+
+
+def air_quality_record(sensor, data, timestamp):
+    """Build the (unsaved) AirQualityData row of one reply of the AQ sensor's /data endpoint."""
+    return AirQualityData(
+        sensor=sensor,
+        device=data.get("device"),
+        quality=data.get("quality"),
+        co2=data.get("co2"),
+        temp=(data.get("temp")/1000),
+        humidity=(data.get("humidity")/1000),
+        voc=data.get("voc"),
+        pm2p5=data.get("pm2p5"),
+        pm10=data.get("pm10"),
+        pm1=data.get("pm1"),
+        pm4=data.get("pm4"),
+        timestamp=timestamp,
+        version=data.get("version")
+    )
+
+
+def gateway_of(sensor_data_list):
+    """MAC of the gateway that forwarded a Minew batch (its heartbeat item), or None."""
+    for item in sensor_data_list:
+        if "gateway" in item:
+            return item.get("mac") or str(item["gateway"])
+    return None
+
+
+def bulk_ingest_occupancy(sensor_data_list, gateway=None):
+    """
+    Parse a Minew gateway batch and store every counter frame with bulk inserts.
+
+    The whole array is decoded first and frames another gateway already
+    relayed are dropped (see dedup.FrameDedup) before any database work. Then
+    sensors and last totals are looked up with one query each, and all
+    OccupancyData rows are written in a single transaction. Their SensorData
+    mirrors are handed to the unified-table projector. Running totals follow
+    the same serial_number rule as the per-frame path (see occupancy_record).
+    If the write fails, the kept frames are released from the duplicate
+    filter so the gateway's retry is stored.
+
+    `gateway` names the sender in the suppression counters when the batch
+    carries no gateway item.
+    Returns (created_count, errors, duplicate_count).
+    """
+    frames, errors = decode_minew_items(sensor_data_list)
+    decoded_count = len(frames)
+    dedup = getattr(settings, "OCCUPANCY_DEDUP_ENABLED", True)
+    if frames and dedup:
+        frames = frame_dedup.filter(frames, gateway_of(sensor_data_list) or gateway)
+    duplicates = decoded_count - len(frames)
+    if not frames:
+        return 0, errors, duplicates
+
+    try:
+        created = _write_occupancy_frames(frames)
+    except Exception:
+        # Nothing was stored: let the gateway's retry of these frames through
+        if dedup:
+            frame_dedup.release([frame_key(mac, parsed_dict) for mac, _, _, parsed_dict in frames])
+        raise
+    return created, errors, duplicates
+
+
+def _write_occupancy_frames(frames):
+    # Resolved outside the transaction so a rollback cannot leave uncommitted
+    # sensors in the registry
+    sensors = sensor_registry.get_many({mac for mac, _, _, _ in frames}, 'OC')
+
+    with transaction.atomic():
+        last_totals = last_occupancy_totals(sensors.values())
+
+        totals_by_sensor = defaultdict(lambda: {"entries": 0, "exits": 0, "s_no": -1})
+        for mac, sensor in sensors.items():
+            if sensor.pk in last_totals:
+                totals_by_sensor[mac] = last_totals[sensor.pk]
+
+        records = [
+            occupancy_record(sensors[mac], mac, rssi, raw, parsed_dict, totals_by_sensor[mac], timezone.now())
+            for mac, rssi, raw, parsed_dict in frames
+        ]
+        OccupancyData.objects.bulk_create(records)
+
+        # bulk_create skips post_save too, so hand the rows to the projector here
+        projector.add(records)
+
+    return len(records)
+
+
+def bulk_ingest_validated(serializer_class, records):
+    """
+    Validate a batch of readings one by one and store the valid ones together.
+
+    `records` is a list of (data, error) pairs: `data` is serializer input, or
+    None when the item already failed before validation with `error`. Valid
+    rows are written with one bulk_create in a single transaction (or queued
+    for the bulk writer when INGEST_ASYNC is on).
+
+    Returns one result dict per record, in order.
+    """
+    results = []
+    instances = []
+    model = serializer_class.Meta.model
+
+    for index, (data, error) in enumerate(records):
+        if data is None:
+            results.append({"index": index, "status": "failed", "errors": error})
+            continue
+        serializer = serializer_class(data=data)
+        if not serializer.is_valid():
+            results.append({"index": index, "status": "failed", "errors": serializer.errors})
+            continue
+        instance = model(**serializer.validated_data)
+        results.append({"index": index, "status": "created"})
+        instances.append((results[-1], instance))
+
+    if async_ingest_enabled():
+        for result, instance in instances:
+            if ingest_queues.put(instance):
+                result["status"] = "queued"
+            else:
+                result.update(status="failed", errors="Ingest queue is full, retry later.")
+        return results
+
+    if instances:
+        rows = [instance for _, instance in instances]
+        for row in rows:
+            # bulk_create skips save(), so fill the action the same way save() would
+            if hasattr(row, "determine_action") and not row.action:
+                row.action = row.determine_action()
+        with transaction.atomic():
+            model.objects.bulk_create(rows)
+            projector.add(rows)
+        for result, instance in instances:
+            result["id"] = instance.pk
+
+    return results
+
+
+def batch_response(results):
+    """
+    Summarise per-item batch results: 201/202 when everything went through
+    (items already ingested earlier count as "duplicate"), 207 otherwise.
+    """
+    failed = sum(1 for result in results if result["status"] == "failed")
+    created = sum(1 for result in results if result["status"] == "created")
+    queued = sum(1 for result in results if result["status"] == "queued")
+    duplicates = sum(1 for result in results if result["status"] == "duplicate")
+    if failed:
+        code = status.HTTP_207_MULTI_STATUS
+    elif queued:
+        code = status.HTTP_202_ACCEPTED
+    else:
+        code = status.HTTP_201_CREATED
+    return Response(
+        {"created": created, "queued": queued, "failed": failed, "duplicates": duplicates, "results": results},
+        status=code,
+    )
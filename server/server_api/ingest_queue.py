@@ -0,0 +1,279 @@
+# server_api/ingest_queue.py
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .projector import projector
+
+logger = logging.getLogger(__name__)
+
+
+def async_ingest_enabled():
+    return getattr(settings, "INGEST_ASYNC", False)
+
+
+def stamp_received(instance, now=None):
+    """
+    Fill the instance's unset auto_now_add fields (timestamp, created_at)
+    with the current time, so a queued row carries the time it was
+    accepted rather than the time the writer got to it.
+    """
+    now = now or timezone.now()
+    for field in instance._meta.concrete_fields:
+        if getattr(field, "auto_now_add", False) and getattr(instance, field.attname) is None:
+            setattr(instance, field.attname, now)
+    return instance
+
+
+def insert_stamped(model, rows, batch_size=1000):
+    """
+    bulk_create that keeps the timestamps already set on the rows.
+
+    bulk_create runs pre_save(add=True), which overwrites every
+    auto_now_add field with the time of the insert; a raw insert takes the
+    values as they are. Unset auto_now_add fields are stamped first, and
+    the primary keys are set on the rows as bulk_create would.
+    """
+    now = timezone.now()
+    for row in rows:
+        stamp_received(row, now)
+    manager = model._base_manager
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    returning_fields = model._meta.db_returning_fields
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        returned = manager._insert(batch, fields=fields, returning_fields=returning_fields, raw=True)
+        for row, values in zip(batch, returned):
+            for field, value in zip(returning_fields, values):
+                setattr(row, field.attname, value)
+            row._state.adding = False
+            row._state.db = manager.db
+    return rows
+
+
+class IngestQueue:
+    """
+    Bounded queue of unsaved model instances for one model, drained by a
+    writer thread that inserts them with insert_stamped every
+    INGEST_FLUSH_ROWS rows or every INGEST_FLUSH_INTERVAL_MS milliseconds,
+    whichever comes first.
+
+    The rows were already acknowledged with 202, so a failed batch is not
+    dropped: it is retried once after INGEST_WRITE_RETRY_DELAY_MS, then
+    written row by row so only the rows the database rejects are lost
+    (logged and counted in failed_rows).
+    """
+
+    def __init__(self, model, maxsize, flush_rows, flush_interval_ms, retry_delay_ms=500):
+        self.model = model
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.retry_delay = retry_delay_ms / 1000.0
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self.accepted = 0
+        self.rejected = 0
+        self.flushed_rows = 0
+        self.failed_rows = 0
+        self.flushes = 0
+        self.last_flush_ms = None
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def put(self, instance):
+        """Queue an instance; returns False when the queue is full."""
+        self._ensure_thread()
+        stamp_received(instance)
+        try:
+            self._queue.put_nowait(instance)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.accepted += 1
+        return True
+
+    def drain(self):
+        """Write everything currently queued and wait for the writer's in-flight batch."""
+        while not self._queue.empty():
+            self._flush(self._take_batch(block=False))
+        self._queue.join()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "depth": self._queue.qsize(),
+                "maxsize": self._queue.maxsize,
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "flushed_rows": self.flushed_rows,
+                "failed_rows": self.failed_rows,
+                "flushes": self.flushes,
+                "last_flush_ms": self.last_flush_ms,
+                "max_flush_ms": round(self.max_flush_ms, 3),
+                "avg_flush_ms": round(self.total_flush_ms / self.flushes, 3) if self.flushes else None,
+            }
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=f"ingest-{self.model._meta.model_name}", daemon=True
+                )
+                self._thread.start()
+
+    def _take_batch(self, block=True):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.flush_rows:
+            timeout = deadline - time.monotonic()
+            try:
+                if block and timeout > 0:
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        try:
+            self._write(batch)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _insert(self, rows):
+        for obj in rows:
+            # bulk_create skips save(), so fill the action the same way save() would
+            if hasattr(obj, "determine_action") and not obj.action:
+                obj.action = obj.determine_action()
+        with transaction.atomic():
+            # Keep the timestamps stamped when the rows were accepted
+            insert_stamped(self.model, rows)
+            projector.add(rows)
+
+    def _insert_rows(self, batch):
+        """Insert the rows one at a time; returns how many went in."""
+        written = 0
+        for obj in batch:
+            try:
+                self._insert([obj])
+            except Exception:
+                logger.exception("Dropped a %s row the database rejected: %r", self.model.__name__, obj.__dict__)
+                connection.close()
+            else:
+                written += 1
+        return written
+
+    def _write(self, batch):
+        started = time.perf_counter()
+        written = len(batch)
+        try:
+            self._insert(batch)
+        except Exception:
+            logger.warning("Failed to flush %d %s rows, retrying", len(batch), self.model.__name__, exc_info=True)
+            # Drop a possibly broken connection so the retry reconnects
+            connection.close()
+            time.sleep(self.retry_delay)
+            try:
+                self._insert(batch)
+            except Exception:
+                logger.exception("Retry of %d %s rows failed, writing them one by one", len(batch), self.model.__name__)
+                connection.close()
+                written = self._insert_rows(batch)
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+
+        with self._lock:
+            self.flushes += 1
+            self.flushed_rows += written
+            self.failed_rows += len(batch) - written
+            self.last_flush_ms = round(elapsed_ms, 3)
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
+
+
+class IngestQueues:
+    """One IngestQueue per model, created on first use."""
+
+    def __init__(self):
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def get(self, model):
+        with self._lock:
+            if model not in self._queues:
+                self._queues[model] = IngestQueue(
+                    model,
+                    maxsize=getattr(settings, "INGEST_QUEUE_MAXSIZE", 10000),
+                    flush_rows=getattr(settings, "INGEST_FLUSH_ROWS", 500),
+                    flush_interval_ms=getattr(settings, "INGEST_FLUSH_INTERVAL_MS", 200),
+                    retry_delay_ms=getattr(settings, "INGEST_WRITE_RETRY_DELAY_MS", 500),
+                )
+            return self._queues[model]
+
+    def put(self, instance):
+        return self.get(type(instance)).put(instance)
+
+    def drain(self):
+        for ingest_queue in list(self._queues.values()):
+            ingest_queue.drain()
+
+    def stats(self):
+        return {model._meta.model_name: q.stats() for model, q in list(self._queues.items())}
+
+
+ingest_queues = IngestQueues()
+
+
+def drain_on_exit():
+    """Write the queued rows, then the projections still buffered for them."""
+    ingest_queues.drain()
+    projector.flush()
+
+
+atexit.register(drain_on_exit)
+
+
+def queue_or_reject(instance):
+    """Queue an unsaved instance and answer 202, or 429 with Retry-After when its queue is full."""
+    if ingest_queues.put(instance):
+        return Response({"status": "queued"}, status=status.HTTP_202_ACCEPTED)
+    retry_after = getattr(settings, "INGEST_RETRY_AFTER", 1)
+    return Response(
+        {"error": "Ingest queue is full, retry later."},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+def save_or_queue(serializer):
+    """
+    Persist a validated serializer and answer 201, or, when INGEST_ASYNC is on,
+    hand its unsaved instance to the bulk writer and answer 202/429.
+    """
+    if async_ingest_enabled():
+        return queue_or_reject(serializer.Meta.model(**serializer.validated_data))
+    serializer.save()
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
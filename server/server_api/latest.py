@@ -0,0 +1,108 @@
+# server_api/latest.py
+"""
+Latest-state projection (SensorLatest): the newest reading of every sensor.
+
+Each batch of readings that reaches the projector is reduced to its newest
+reading per sensor. These are upserted into SensorLatest with one INSERT
+... ON CONFLICT per batch. A stored row is only replaced by a reading at
+least as new, so replays and late batches cannot move it backwards.
+"Current state" reads (the fleet overview, the recommender inputs, the
+latest EM reading) are then an indexed read of one small table.
+rebuild_latest() recomputes the rows from the raw tables.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+
+from .models import SensorLatest
+from .rollups import ROLLUP_CHANNELS
+
+LATEST_MODELS = tuple(ROLLUP_CHANNELS)
+
+# Columns left out of SensorLatest.values: kept elsewhere in the row, or whole payloads
+EXCLUDED_COLUMNS = ("id", "sensor_id", "timestamp", "action", "created_at", "raw_data", "raw_payload")
+
+
+def reading_values(instance):
+    """The field values of a reading, by column, as stored in SensorLatest.values."""
+    return {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+        if field.attname not in EXCLUDED_COLUMNS
+    }
+
+
+def latest_partials(instances):
+    """
+    The newest of `instances` per sensor, as {sensor_pk: [timestamp, source,
+    source_id, action, values]}. Readings without a sensor are left out.
+    """
+    partials = {}
+    for instance in instances:
+        if type(instance) not in ROLLUP_CHANNELS or instance.sensor_id is None or instance.timestamp is None:
+            continue
+        partial = partials.get(instance.sensor_id)
+        if partial is None or instance.timestamp >= partial[0]:
+            partials[instance.sensor_id] = [
+                instance.timestamp, instance._meta.model_name, instance.pk,
+                getattr(instance, "action", None), reading_values(instance),
+            ]
+    return partials
+
+
+def merge_latest(into, partials):
+    """Fold `partials` into `into` (both as returned by latest_partials)."""
+    for sensor_pk, partial in partials.items():
+        if sensor_pk not in into or partial[0] >= into[sensor_pk][0]:
+            into[sensor_pk] = partial
+    return into
+
+
+def _upsert_sql():
+    table = connection.ops.quote_name(SensorLatest._meta.db_table)
+    return (
+        'ON CONFLICT (sensor_id) DO UPDATE SET '
+        'source = EXCLUDED.source, source_id = EXCLUDED.source_id, "timestamp" = EXCLUDED."timestamp", '
+        'action = EXCLUDED.action, "values" = EXCLUDED."values", updated_at = EXCLUDED.updated_at '
+        f'WHERE EXCLUDED."timestamp" >= {table}."timestamp"'
+    )
+
+
+def write_latest(partials, batch_size=500):
+    """Upsert the newest readings into SensorLatest."""
+    if not partials:
+        return
+    table = connection.ops.quote_name(SensorLatest._meta.db_table)
+    columns = '(sensor_id, source, source_id, "timestamp", action, "values", updated_at)'
+    # A fixed key order keeps concurrent writers from deadlocking on each other's rows
+    rows = [
+        (sensor_pk, source, source_id, timestamp, action, json.dumps(values, cls=DjangoJSONEncoder))
+        for sensor_pk, (timestamp, source, source_id, action, values) in sorted(partials.items())
+    ]
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            values = ", ".join(["(%s, %s, %s, %s, %s, %s, now())"] * len(batch))
+            cursor.execute(
+                f"INSERT INTO {table} {columns} VALUES {values} {_upsert_sql()}",
+                [value for row in batch for value in row],
+            )
+
+
+def rebuild_latest(model):
+    """
+    Recompute SensorLatest from the raw rows of `model`: the newest row of
+    each of its sensors replaces the stored one unless that is newer.
+    Returns the number of rows written.
+    """
+    table = connection.ops.quote_name(SensorLatest._meta.db_table)
+    source = connection.ops.quote_name(model._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (sensor_id, source, source_id, "timestamp", action, "values", updated_at) '
+            f'SELECT DISTINCT ON (sensor_id) sensor_id, %s, id, "timestamp", action, to_jsonb(t) - %s::text[], now() '
+            f'FROM {source} t WHERE sensor_id IS NOT NULL ORDER BY sensor_id, "timestamp" DESC {_upsert_sql()}',
+            [model._meta.model_name, list(EXCLUDED_COLUMNS)],
+        )
+        return cursor.rowcount
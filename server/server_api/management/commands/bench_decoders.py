@@ -0,0 +1,295 @@
+import base64
+import gc
+import json
+import logging
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from server_api.decoders import DECODERS, LSG01_TAG_MAP, Lsg01Decoder
+
+CORPORA_DIR = Path(__file__).resolve().parents[2] / "corpora"
+
+
+def load_corpus(name):
+    """Read a JSONL corpus of {"raw": ..., "expected": {...}} records."""
+    with open(CORPORA_DIR / name) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# Hex/int.from_bytes decoders as they were before the struct-based rewrite,
+# kept only as the "before" baseline of this benchmark.
+
+def legacy_parse_minew_data(raw_hex):
+    raw_hex = raw_hex.lower()
+    header = "0201061bff3906"
+    if not raw_hex.startswith(header):
+        return {"error": "Invalid header"}
+    remainder = raw_hex[len(header):]
+    if not remainder.startswith("ca"):
+        return {"error": "Missing protocol indicator"}
+    remainder = remainder[2:]
+    if len(remainder) < 2:
+        return {"error": "Incomplete packet"}
+    frame_version = remainder[:2]
+    remainder = remainder[2:]
+    parsed = {"frame_version": frame_version}
+    if frame_version == "00":
+        if len(remainder) < 12:
+            return {"error": "Incomplete device info frame"}
+        mac_hex = remainder[:12]
+        parsed["mac"] = ":".join(mac_hex[i:i+2] for i in range(0, 12, 2))
+        remainder = remainder[12:]
+        if len(remainder) < 2:
+            return parsed
+        parsed["battery"] = int(remainder[:2], 16)
+        remainder = remainder[2:]
+        if len(remainder) < 4:
+            return parsed
+        parsed["firmware_version"] = str(int(remainder[:4], 16))
+        remainder = remainder[4:]
+        if len(remainder) < 16:
+            return parsed
+        parsed["peripheral_support"] = remainder[:16]
+        remainder = remainder[16:]
+        if len(remainder) < 2:
+            return parsed
+        remainder = remainder[2:]
+        if len(remainder) < 4:
+            return parsed
+        parsed["salt"] = remainder[:4]
+        remainder = remainder[4:]
+        if len(remainder) < 4:
+            return parsed
+        parsed["digital_signature"] = remainder[:4]
+    elif frame_version == "18":
+        if len(remainder) < 2:
+            return {"error": "Incomplete monitoring frame"}
+        parsed["usage"] = remainder[:2]
+        remainder = remainder[2:]
+        if len(remainder) < 2:
+            return parsed
+        parsed["serial_number"] = int(remainder[:2], 16)
+        remainder = remainder[2:]
+        if len(remainder) < 4:
+            return parsed
+        entries_hex = remainder[:4]
+        parsed["entries"] = int(entries_hex[2:] + entries_hex[:2], 16)
+        remainder = remainder[4:]
+        if len(remainder) < 4:
+            return parsed
+        exits_hex = remainder[:4]
+        parsed["exits"] = int(exits_hex[2:] + exits_hex[:2], 16)
+        remainder = remainder[4:]
+        if len(remainder) < 24:
+            return parsed
+        remainder = remainder[24:]
+        if len(remainder) < 4:
+            return parsed
+        parsed["random_number"] = remainder[:4]
+        remainder = remainder[4:]
+        if len(remainder) < 4:
+            return parsed
+        parsed["digital_signature"] = remainder[:4]
+    else:
+        parsed["error"] = "Unknown frame version"
+    return parsed
+
+
+def legacy_parse_mst01_ht_payload(b64_payload):
+    try:
+        decoded = base64.b64decode(b64_payload)
+        if len(decoded) < 30:
+            return {"error": "Frame too short"}
+        if decoded[7] != 0xCA or decoded[8] != 0x05:
+            return {"error": "Not an HT frame"}
+        temp_raw = int.from_bytes(decoded[12:14], byteorder="big")
+        hum_raw = int.from_bytes(decoded[14:16], byteorder="big")
+        return {"temperature": round(temp_raw / 256.0, 1), "humidity": round(hum_raw / 256.0, 1)}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def legacy_parse_lsg01_payload_dynamically(payload_base64):
+    try:
+        payload_bytes = base64.b64decode(payload_base64)
+        index = 0
+        data = {}
+        if payload_bytes[:3] == b'\x00\x01\x4B':
+            index = 3
+        while index < len(payload_bytes):
+            tag = payload_bytes[index]
+            index += 1
+            if tag not in LSG01_TAG_MAP:
+                break
+            label, num_bytes, is_signed, scale = LSG01_TAG_MAP[tag]
+            if index + num_bytes > len(payload_bytes):
+                break
+            value = int.from_bytes(payload_bytes[index:index + num_bytes], byteorder='big', signed=is_signed)
+            index += num_bytes
+            data[label] = round(value / scale, 2)
+        return data
+    except Exception as e:
+        return {"error": str(e)}
+
+
+_lsg01_walker = Lsg01Decoder()
+
+
+def lsg01_walk_only(payload_base64):
+    # The plan engine with its cache bypassed: every payload is walked tag by tag
+    try:
+        payload_bytes = base64.b64decode(payload_base64)
+    except ValueError as e:
+        return {"error": str(e)}
+    return _lsg01_walker.walk(payload_bytes)[0] if payload_bytes else {}
+
+
+def _safe(decoder):
+    # The legacy parser raised on non-hex digits in the fields it read, and
+    # ignored them elsewhere; the corpus records "Invalid hex" for both
+    def decode(raw):
+        try:
+            return decoder(raw)
+        except ValueError:
+            return {"error": "Invalid hex"}
+    return decode
+
+
+# Extra implementations timed next to a registered decoder with --baselines
+BASELINES = {
+    "minew_v3": [("legacy hex", _safe(legacy_parse_minew_data))],
+    "mst01_ht": [("legacy int.from_bytes", legacy_parse_mst01_ht_payload)],
+    "lsg01": [
+        ("legacy dynamic", legacy_parse_lsg01_payload_dynamically),
+        ("tag walker", lsg01_walk_only),
+    ],
+}
+
+
+def _ns_per_frame(decode_all, frames, repeat):
+    """Best-of-`repeat` wall time of decode_all(frames), per frame."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        decode_all(frames)
+        best = min(best, time.perf_counter_ns() - started)
+    return best / len(frames)
+
+
+def _allocations(decode_all, frames):
+    """
+    Memory blocks still allocated per frame when the results are kept, and
+    peak traced bytes per frame during the decode.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        results = decode_all(frames)
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    del results
+    return blocks / len(frames), peak / len(frames)
+
+
+class Command(BaseCommand):
+    help = (
+        "Check every registered frame decoder (server_api.decoders.DECODERS) against its golden "
+        "corpus and report ns/frame, single and batch, plus allocations per frame. "
+        "--save/--compare record a baseline and fail on speed regressions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("families", nargs="*", help="Device families to run (default: all registered).")
+        parser.add_argument("--repeat", type=int, default=20, help="Timing runs per decoder (best is reported).")
+        parser.add_argument("--scale", type=int, default=10, help="Repeat the corpus this many times per run.")
+        parser.add_argument("--baselines", action="store_true", help="Also time the legacy implementations.")
+        parser.add_argument("--save", help="Write the results to this JSON file.")
+        parser.add_argument("--compare", help="Compare against results saved earlier with --save.")
+        parser.add_argument(
+            "--tolerance", type=float, default=0.20,
+            help="Allowed slowdown against --compare before the run fails (0.20 = 20%%).",
+        )
+
+    def handle(self, *args, **options):
+        families = options["families"] or sorted(DECODERS)
+        unknown = [family for family in families if family not in DECODERS]
+        if unknown:
+            raise CommandError(f"No decoder registered for: {', '.join(unknown)}")
+
+        # Malformed corpus frames make the decoders log; keep that out of the timings
+        logging.disable(logging.CRITICAL)
+        try:
+            results, mismatches = self._run(families, options)
+        finally:
+            logging.disable(logging.NOTSET)
+
+        if options["save"]:
+            with open(options["save"], "w") as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Saved results to {options['save']}")
+
+        regressions = self._compare(results, options) if options["compare"] else []
+        if mismatches:
+            raise CommandError(f"{mismatches} frames decode differently from the golden corpora")
+        if regressions:
+            raise CommandError("Slower than the saved baseline: " + "; ".join(regressions))
+
+    def _run(self, families, options):
+        results = {}
+        mismatches = 0
+        for family in families:
+            decoder = DECODERS[family]
+            if not decoder.corpus:
+                self.stdout.write(f"{family}: no corpus, skipped")
+                continue
+            corpus = load_corpus(decoder.corpus)
+            raws = [record["raw"] for record in corpus]
+            frames = raws * options["scale"]
+            self.stdout.write(f"{family} ({decoder.description}): {len(corpus)} frames")
+
+            runs = [
+                ("decode", lambda batch, d=decoder: [d.decode(raw) for raw in batch], True),
+                ("decode_batch", decoder.decode_batch, True),
+            ]
+            if options["baselines"]:
+                runs += [
+                    (label, lambda batch, f=fn: [f(raw) for raw in batch], False)
+                    for label, fn in BASELINES.get(family, [])
+                ]
+
+            for label, decode_all, checked in runs:
+                bad = sum(got != record["expected"] for got, record in zip(decode_all(raws), corpus))
+                ns = _ns_per_frame(decode_all, frames, options["repeat"])
+                blocks, peak = _allocations(decode_all, raws)
+                if checked:
+                    mismatches += bad
+                    status = "ok" if not bad else f"{bad} MISMATCHES"
+                    results[f"{family}.{label}"] = {"ns_per_frame": ns, "blocks_per_frame": blocks}
+                else:
+                    # Baselines are timed only; their known differences do not fail the run
+                    status = "baseline" if not bad else f"baseline, {bad} differ"
+                self.stdout.write(
+                    f"  {label:<22} {ns:>8.0f} ns/frame  {blocks:>6.1f} blocks/frame  "
+                    f"{peak:>7.0f} peak B/frame   {status}"
+                )
+        return results, mismatches
+
+    def _compare(self, results, options):
+        with open(options["compare"]) as f:
+            saved = json.load(f)
+        regressions = []
+        for key, result in results.items():
+            if key not in saved:
+                continue
+            before, now = saved[key]["ns_per_frame"], result["ns_per_frame"]
+            change = now / before - 1
+            self.stdout.write(f"  {key:<30} {before:>8.0f} -> {now:>8.0f} ns/frame ({change:+.0%})")
+            if change > options["tolerance"]:
+                regressions.append(f"{key} {change:+.0%}")
+        return regressions
@@ -0,0 +1,109 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from server_api.ingest_queue import ingest_queues
+from server_api.models import Sensor
+
+# Minew Connect V3 human-flow frame: serial 1, 2 entries, 1 exit
+MINEW_FRAME = "0201061bff3906ca18000102000100000000000000000000000000abcd1234"
+
+
+def _payload(endpoint, i):
+    device = f"bench-{endpoint}-{i % 20}"
+    if endpoint == "aq":
+        return {"msg": {"device_id": device, "co2": 400 + i % 600, "temperature": 21, "humidity": 40}}
+    if endpoint == "radar":
+        return {"mac": device, "sn": i, "radar": {"num": i % 5, "coord": {}}}
+    return [{"mac": device, "rssi": -60, "raw": MINEW_FRAME}]
+
+
+PATHS = {
+    "aq": "data/aq/push",
+    "radar": "data/radar",
+    "oc": "data/oc/parsed",
+}
+
+
+def _summary(label, latencies, elapsed, statuses):
+    latencies = sorted(latencies)
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000.0
+    return (
+        f"{label:<5} {len(latencies) / elapsed:>9.1f} req/s   "
+        f"p50 {pct(0.50):>7.1f} ms   p95 {pct(0.95):>7.1f} ms   p99 {pct(0.99):>7.1f} ms   "
+        f"mean {statistics.mean(latencies) * 1000.0:>7.1f} ms   statuses {sorted(set(statuses))}"
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the WSGI ingest views against their ASGI versions under concurrency. "
+        "Requests run in-process: WSGI through a thread pool of test clients, ASGI through "
+        "one event loop. Writes real rows for bench-* sensors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--endpoint", choices=sorted(PATHS), default="aq")
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--keep", action="store_true", help="Keep the bench-* sensors and their rows.")
+        parser.add_argument(
+            "--async-ingest", action="store_true",
+            help="Run both paths with INGEST_ASYNC on (queue + bulk writer) instead of inline commits.",
+        )
+
+    def handle(self, *args, **options):
+        endpoint = options["endpoint"]
+        n = options["requests"]
+        concurrency = options["concurrency"]
+        path = PATHS[endpoint]
+
+        self.stdout.write(f"{n} POSTs to {path}, concurrency {concurrency}")
+        with override_settings(INGEST_ASYNC=options["async_ingest"]):
+            self.stdout.write(self._bench_wsgi(f"/api/{path}", endpoint, n, concurrency))
+            self.stdout.write(self._bench_asgi(f"/api/async/{path}", endpoint, n, concurrency))
+            ingest_queues.drain()
+
+        if not options["keep"]:
+            Sensor.objects.filter(sensor_id__startswith="bench-").delete()
+
+    def _bench_wsgi(self, url, endpoint, n, concurrency):
+        local = threading.local()
+
+        def post(i):
+            if not hasattr(local, "client"):
+                local.client = Client()
+            client = local.client
+            started = time.perf_counter()
+            response = client.post(url, _payload(endpoint, i), content_type="application/json")
+            return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(post, range(n)))
+        elapsed = time.perf_counter() - started
+        connections.close_all()
+        return _summary("wsgi", [r[0] for r in results], elapsed, [r[1] for r in results])
+
+    def _bench_asgi(self, url, endpoint, n, concurrency):
+        async def run():
+            client = AsyncClient()
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def post(i):
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.post(url, _payload(endpoint, i), content_type="application/json")
+                    return time.perf_counter() - started, response.status_code
+
+            return await asyncio.gather(*(post(i) for i in range(n)))
+
+        started = time.perf_counter()
+        results = asyncio.run(run())
+        elapsed = time.perf_counter() - started
+        return _summary("asgi", [r[0] for r in results], elapsed, [r[1] for r in results])
@@ -0,0 +1,154 @@
+import json
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from server_api.models import (
+    AirQualityData, EnergyData, Lsg01AirQualityData, OccupancyData, RadarData, SensorData, TemperatureHumidityData,
+)
+
+TIME_SERIES_MODELS = (
+    AirQualityData, EnergyData, OccupancyData, RadarData, Lsg01AirQualityData, TemperatureHumidityData, SensorData,
+)
+
+# Shape of the --synthetic data: readings spread evenly over the last
+# SYNTHETIC_DAYS across SYNTHETIC_SENSORS sensors, 1 in 100 an alert
+SYNTHETIC_DAYS = 30
+SYNTHETIC_SENSORS = 20
+
+NOT_NULL_FILLERS = {
+    "BooleanField": "false",
+    "CharField": "''",
+    "TextField": "''",
+    "JSONField": "'{}'::jsonb",
+}
+
+
+def _index_named(model, suffix):
+    return next(index.name for index in model._meta.indexes if index.name.endswith(suffix))
+
+
+def plan_indexes(plan):
+    """Names of the indexes used anywhere in an EXPLAIN (FORMAT JSON) plan node."""
+    names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        names |= plan_indexes(child)
+    return names
+
+
+def root_indexes(names):
+    """Map indexes of partitions to the partitioned index they belong to."""
+    roots = set()
+    with connection.cursor() as cursor:
+        for name in names:
+            cursor.execute("SELECT COALESCE(pg_partition_root(%s::regclass), %s::regclass)::text", [name, name])
+            roots.add(cursor.fetchone()[0])
+    return roots
+
+
+def insert_synthetic(model, rows, end):
+    """
+    Append `rows` readings to `model`'s table in timestamp order, the way
+    ingest fills it, with one INSERT ... SELECT. Sensor ids need not exist:
+    the foreign keys are only checked at commit, and the caller rolls back.
+    """
+    start = end - timedelta(days=SYNTHETIC_DAYS)
+    step = SYNTHETIC_DAYS * 86400 / rows
+    columns, values, params = [], [], []
+    for field in model._meta.concrete_fields:
+        if field.primary_key:
+            continue
+        if field.name == "timestamp":
+            value = "%s + i * %s * interval '1 second'"
+            params += [start, step]
+        elif field.name == "sensor":
+            value = f"i %% {SYNTHETIC_SENSORS} + 1"
+        elif field.name == "action":
+            value = "CASE WHEN i %% 100 = 0 THEN 'HIGH_POWER_USAGE' ELSE 'NORMAL_EM' END"
+        elif field.null:
+            continue
+        elif field.get_internal_type() == "DateTimeField":
+            value = "%s"
+            params.append(start)
+        else:
+            value = NOT_NULL_FILLERS.get(field.get_internal_type(), "0")
+        columns.append(connection.ops.quote_name(field.column))
+        values.append(value)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {connection.ops.quote_name(model._meta.db_table)} ({', '.join(columns)}) "
+            f"SELECT {', '.join(values)} FROM generate_series(1, %s) AS i",
+            [*params, rows],
+        )
+        cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+
+
+def index_checks(end, sensor_id=None):
+    """
+    (description, queryset, index it should use) for the hot read paths of
+    the time-series tables. Per-sensor queries ask for `sensor_id`, by
+    default the sensor of each table's first row.
+    """
+    start = end - timedelta(hours=24)
+    checks = []
+    for model in TIME_SERIES_MODELS:
+        name = model._meta.model_name
+        sensor = sensor_id if sensor_id is not None else model.objects.values_list("sensor_id", flat=True).first() or 1
+        checks.append((
+            f"{name}: latest readings of a sensor",
+            model.objects.filter(sensor_id=sensor).order_by("-timestamp")[:100],
+            _index_named(model, "_sensor_ts"),
+        ))
+        checks.append((
+            f"{name}: readings in a time range",
+            model.objects.filter(timestamp__gte=start, timestamp__lt=end),
+            _index_named(model, "_ts_brin"),
+        ))
+    checks.append((
+        "sensordata: latest alerts of an action",
+        SensorData.objects.filter(action="HIGH_POWER_USAGE").order_by("-timestamp")[:100],
+        "sensordata_alert_action",
+    ))
+    return checks
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the hot read queries of the time-series tables and check each uses its index. "
+        "Exits with an error if any does not."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--synthetic", type=int, default=0, metavar="ROWS",
+            help="First append ROWS synthetic readings to every table, in a transaction that is rolled back "
+                 "afterwards. On small tables the planner rightly prefers sequential scans, so use this on "
+                 "development databases.",
+        )
+        parser.add_argument("--show-plans", action="store_true", help="Print the full plan of every query.")
+
+    def handle(self, *args, **options):
+        end = datetime.now()
+        failed = []
+        with transaction.atomic():
+            if options["synthetic"]:
+                for model in TIME_SERIES_MODELS:
+                    insert_synthetic(model, options["synthetic"], end)
+            # Synthetic readings belong to sensors 1 .. SYNTHETIC_SENSORS
+            sensor_id = 1 if options["synthetic"] else None
+            for description, queryset, expected in index_checks(end, sensor_id):
+                plan = json.loads(queryset.explain(format="json"))[0]["Plan"]
+                used = root_indexes(plan_indexes(plan))
+                if expected in used:
+                    self.stdout.write(self.style.SUCCESS(f"ok    {description}: {expected}"))
+                else:
+                    failed.append(description)
+                    self.stdout.write(self.style.ERROR(
+                        f"MISS  {description}: expected {expected}, used {', '.join(sorted(used)) or 'no index'}"
+                    ))
+                if options["show_plans"]:
+                    self.stdout.write(queryset.explain())
+            transaction.set_rollback(True)
+
+        if failed:
+            raise CommandError(f"{len(failed)} queries do not use their index")
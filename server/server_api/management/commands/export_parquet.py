@@ -0,0 +1,62 @@
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from server_api.parquet_export import EXPORT_MODELS, export_readings
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the reading tables to Parquet, partitioned by sensor type and day, for the recommender "
+        "pipeline. Each run adds the whole days since the previous one (see server_api/parquet_export.py)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "sensor_types", nargs="*", help=f"Sensor types (default: all). Available: {', '.join(EXPORT_MODELS)}."
+        )
+        parser.add_argument(
+            "--out", default=str(getattr(settings, "PARQUET_EXPORT_DIR", "exports")),
+            help="Export root (default: PARQUET_EXPORT_DIR).",
+        )
+        parser.add_argument("--since", help="Re-export from this day (YYYY-MM-DD) instead of the watermark.")
+        parser.add_argument("--until", help="Export the days before this one (default: today).")
+        parser.add_argument(
+            "--reexport-days", type=int, default=getattr(settings, "PARQUET_EXPORT_REEXPORT_DAYS", 2),
+            help="Also re-export this many days before the watermark, for late readings "
+                 "(default: PARQUET_EXPORT_REEXPORT_DAYS).",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=getattr(settings, "PARQUET_EXPORT_CHUNK_SIZE", 10000),
+            help="Rows fetched per round trip and written per row group.",
+        )
+
+    def handle(self, *args, **options):
+        unknown = [sensor_type for sensor_type in options["sensor_types"] if sensor_type not in EXPORT_MODELS]
+        if unknown:
+            raise CommandError(f"Unknown sensor types: {', '.join(unknown)}")
+        since = self._parse_day(options["since"], "since")
+        until = self._parse_day(options["until"], "until") or date.today()
+
+        for sensor_type in options["sensor_types"] or EXPORT_MODELS:
+            started = time.perf_counter()
+            days = rows = 0
+            for day, written in export_readings(
+                options["out"], sensor_type, until, since, options["chunk_size"], options["reexport_days"]
+            ):
+                days += 1
+                rows += written
+                self.stdout.write(f"{sensor_type}: {day:%Y-%m-%d} {written} rows")
+            self.stdout.write(self.style.SUCCESS(
+                f"{sensor_type}: exported {rows} rows in {days} days in {time.perf_counter() - started:.1f}s"
+            ))
+
+    def _parse_day(self, value, name):
+        if not value:
+            return None
+        parsed = parse_date(value)
+        if parsed is None:
+            raise CommandError(f"Invalid --{name} day: {value}")
+        return parsed
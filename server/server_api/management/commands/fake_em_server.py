@@ -0,0 +1,89 @@
+import asyncio
+import random
+import zlib
+
+from aiohttp import web
+from django.core.management.base import BaseCommand
+from server_api.models import Sensor
+
+
+def fake_status(base_power):
+    """An EM.GetStatus reply of a Shelly Pro 3EM, with some noise."""
+    reply = {"id": 0}
+    total_current = total_act = total_aprt = 0.0
+    for phase in "abc":
+        voltage = random.uniform(228, 242)
+        act_power = base_power * random.uniform(0.8, 1.2)
+        pf = random.uniform(0.85, 1.0)
+        aprt_power = act_power / pf
+        current = aprt_power / voltage
+        reply.update({
+            f"{phase}_current": round(current, 3),
+            f"{phase}_voltage": round(voltage, 1),
+            f"{phase}_act_power": round(act_power, 1),
+            f"{phase}_aprt_power": round(aprt_power, 1),
+            f"{phase}_pf": round(pf, 2),
+            f"{phase}_freq": 50.0,
+        })
+        total_current += current
+        total_act += act_power
+        total_aprt += aprt_power
+    reply.update({
+        "n_current": None,
+        "total_current": round(total_current, 3),
+        "total_act_power": round(total_act, 1),
+        "total_aprt_power": round(total_aprt, 1),
+        "user_calibrated_phase": [],
+    })
+    return reply
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve fake Shelly EM.GetStatus replies for testing poll_em_all. Every meter is a path prefix "
+        "(/<name>/rpc/EM.GetStatus); --register N points N EM sensors at this server."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8081)
+        parser.add_argument("--latency", type=float, default=0.05, help="Mean reply delay in seconds.")
+        parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with HTTP 500.")
+        parser.add_argument("--hang-rate", type=float, default=0.0, help="Share of requests never answered in time.")
+        parser.add_argument("--register", type=int, default=0, help="Create/update N sensors fake-em-<i> pointing here.")
+
+    def handle(self, *args, **options):
+        if options["register"]:
+            self.register(options["register"], options["host"], options["port"])
+        app = web.Application()
+        app["options"] = options
+        app.router.add_get("/rpc/EM.GetStatus", self.status)
+        app.router.add_get("/{meter}/rpc/EM.GetStatus", self.status)
+        self.stdout.write(f"Fake EM meters on http://{options['host']}:{options['port']}/<meter>/rpc/EM.GetStatus")
+        web.run_app(app, host=options["host"], port=options["port"], print=None)
+
+    def register(self, count, host, port):
+        for index in range(count):
+            sensor_id = f"fake-em-{index}"
+            Sensor.objects.update_or_create(
+                sensor_id=sensor_id,
+                defaults={
+                    "sensor_type": "EM",
+                    "description": "Fake EM meter",
+                    "address": f"{host}:{port}/{sensor_id}",
+                    "active": True,
+                },
+            )
+        self.stdout.write(f"Registered {count} fake EM sensors")
+
+    async def status(self, request):
+        options = request.app["options"]
+        roll = random.random()
+        if roll < options["hang_rate"]:
+            await asyncio.sleep(3600)
+        await asyncio.sleep(random.expovariate(1 / options["latency"]) if options["latency"] > 0 else 0)
+        if roll < options["hang_rate"] + options["fail_rate"]:
+            return web.json_response({"code": -105, "message": "Internal error"}, status=500)
+        meter = request.match_info.get("meter", "")
+        # A stable load per meter so the readings look like the same building each round
+        return web.json_response(fake_status(base_power=200 + zlib.crc32(meter.encode()) % 2000))
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from server_api.partitions import (
+    PARTITIONED_MODELS, default_rows, drop_partition, ensure_partitions, expired_partitions, is_partitioned,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the monthly partitions of EnergyData and SensorData for the months ahead, and drop whole "
+        "months past their retention (PARTITION_RETENTION_MONTHS). Run it daily, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ahead", type=int, default=getattr(settings, "PARTITION_MONTHS_AHEAD", 3),
+            help="Months after the current one to create partitions for.",
+        )
+        parser.add_argument("--no-retention", action="store_true", help="Only create partitions; drop nothing.")
+        parser.add_argument("--dry-run", action="store_true", help="Report what would be created and dropped.")
+
+    def handle(self, *args, **options):
+        retention = getattr(settings, "PARTITION_RETENTION_MONTHS", {})
+        dry_run = options["dry_run"]
+        verb = "would " if dry_run else ""
+
+        for model in PARTITIONED_MODELS:
+            name = model._meta.model_name
+            if not is_partitioned(model):
+                raise CommandError(f"{model._meta.db_table} is not partitioned; run migrate first")
+
+            for partition in ensure_partitions(model, options["ahead"], dry_run=dry_run):
+                self.stdout.write(f"{name}: {verb}create {partition}")
+
+            months = retention.get(name)
+            if months is not None and not options["no_retention"]:
+                for partition in expired_partitions(model, months):
+                    if not dry_run:
+                        drop_partition(partition)
+                    self.stdout.write(f"{name}: {verb}drop {partition} (older than {months} months)")
+
+            stray = default_rows(model)
+            if stray:
+                self.stdout.write(self.style.WARNING(
+                    f"{name}: {stray} rows in the default partition, outside every monthly partition"
+                ))
+        self.stdout.write(self.style.SUCCESS("Partitions up to date."))
@@ -1,69 +1,49 @@
-import time
-import datetime
-
 import requests
+from django.conf import settings
 from django.core.management.base import BaseCommand
-from server_api.models import AirQualityData, Sensor
-
-def get_or_create_sensor(sensor_id, sensor_type):
-    try:
-        sensor = Sensor.objects.get(sensor_id=sensor_id)
-        return sensor
-    except Sensor.DoesNotExist:
-        sensor = Sensor.objects.create(
-            sensor_id=sensor_id,
-            sensor_type=sensor_type,
-            description=f"Auto-created {sensor_type} sensor"
-        )
-        return sensor
+from server_api.deadband import deadband_filter
+from server_api.ingest import air_quality_record
+from server_api.polling import FixedRateSchedule
+from server_api.sensor_registry import sensor_registry
 
 class Command(BaseCommand):
     help = "Poll sensor data every 10 seconds and store it in the database."
 
     def handle(self, *args, **options):
-        url = "https://sb5-244cabf81d20.local/data"  # Using HTTPS here
+        url = settings.AQ_POLL_URL  # Using HTTPS here
         self.stdout.write("Starting sensor polling... (Press CTRL+C to stop)")
         
         # Optionally, disable warnings about insecure requests:
         import urllib3
         urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
         
+        # Rounds start on the :00/:10/:20... grid however long a round takes
+        schedule = FixedRateSchedule(10)
         while True:
+            schedule.wait()
             try:
-                # Pass verify=False to bypass SSL certificate verification
-                response = requests.get(url, verify=False)
+                # Pass verify=False to bypass SSL certificate verification;
+                # a reply that would miss the round deadline is given up on
+                response = requests.get(url, verify=False, timeout=schedule.remaining())
                 if response.status_code == 200:
                     data = response.json()
                     self.stdout.write(f"Received data: {data}")
                     
                     # Get or create sensor
                     device_id = data.get("device")
-                    sensor = get_or_create_sensor(device_id, 'AQ')
+                    sensor = sensor_registry.get_or_create(device_id, 'AQ')
                     
-                    sensor_record = AirQualityData(
-                        sensor=sensor,
-                        device=device_id,
-                        quality=data.get("quality"),
-                        co2=data.get("co2"),
-                        temp=(data.get("temp")/1000),
-                        humidity=(data.get("humidity")/1000),
-                        voc=data.get("voc"),
-                        pm2p5=data.get("pm2p5"),
-                        pm10=data.get("pm10"),
-                        pm1=data.get("pm1"),
-                        pm4=data.get("pm4"),
-                        timestamp=datetime.datetime.now(),
-                        version=data.get("version")
-                    )
-                    sensor_record.save()
-                    self.stdout.write("Data saved successfully.")
+                    sensor_record = air_quality_record(sensor, data, schedule.timestamp)
+                    if deadband_filter.keep(sensor_record):
+                        sensor_record.save()
+                        self.stdout.write("Data saved successfully.")
+                    else:
+                        self.stdout.write("Unchanged within deadband, not stored.")
                 else:
                     self.stdout.write(f"Failed to retrieve data. Status code: {response.status_code}")
             except Exception as e:
                 self.stdout.write(f"Error occurred: {e}")
 
-            time.sleep(10)
-
 
 # class Command(BaseCommand):
 #     help = "Poll sensor data every 10 seconds and store it in the database."
@@ -1,8 +1,8 @@
-import datetime
-import time
 import requests
 from django.core.management.base import BaseCommand
+from server_api.deadband import deadband_filter
 from server_api.models import EnergyData, Sensor
+from server_api.polling import FixedRateSchedule
 
 class Command(BaseCommand):
     help = "Poll sensor data every 10 seconds and store it in the database."
@@ -15,10 +15,14 @@ class Command(BaseCommand):
         import urllib3
         urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
         
+        # Rounds start on the :00/:10/:20... grid however long a round takes
+        schedule = FixedRateSchedule(10)
         while True:
+            schedule.wait()
             try:
-                # Pass verify=False to bypass SSL certificate verification
-                response = requests.get(url, verify=False) 
+                # Pass verify=False to bypass SSL certificate verification;
+                # a reply that would miss the round deadline is given up on
+                response = requests.get(url, verify=False, timeout=schedule.remaining())
                 if response.status_code == 200:
                     data = response.json()
                     self.stdout.write(f"Received data: {data}")
@@ -48,13 +52,14 @@ class Command(BaseCommand):
                         total_act_power=data.get("total_act_power"),
                         total_aprt_power=data.get("total_aprt_power"),
                         # user_calibrated_phase=data.get("user_calibrated_phase"),
-                        timestamp=datetime.datetime.now()  # Use the current time
+                        timestamp=schedule.timestamp  # The tick, so samples are evenly spaced
                     )
-                    em_record.save()
-                    self.stdout.write("Data saved successfully.")
+                    if deadband_filter.keep(em_record):
+                        em_record.save()
+                        self.stdout.write("Data saved successfully.")
+                    else:
+                        self.stdout.write("Unchanged within deadband, not stored.")
                 else:
                     self.stdout.write(f"Failed to retrieve data. Status code: {response.status_code}")
             except Exception as e:
                 self.stdout.write(f"Error occurred: {e}")
-
-            time.sleep(10)
@@ -0,0 +1,45 @@
+import logging
+from django.core.management.base import BaseCommand
+from server_api.models import ProjectionWatermark
+from server_api.projector import UNIFIED_BUILDERS, build_unified, write_unified
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = "Project source rows the SensorData mirror missed, resuming from each table's id watermark."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Source rows read per batch.")
+        parser.add_argument(
+            "--from-id", type=int, default=None,
+            help="Ignore the stored watermarks and start after this id in every source table.",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+
+        for model in UNIFIED_BUILDERS:
+            source = model._meta.model_name
+            watermark, _ = ProjectionWatermark.objects.get_or_create(source=source)
+            last_id = options["from_id"] if options["from_id"] is not None else watermark.last_id
+            processed = 0
+
+            while True:
+                chunk = list(
+                    model.objects.select_related("sensor")
+                    .filter(pk__gt=last_id)
+                    .order_by("pk")[:chunk_size]
+                )
+                if not chunk:
+                    break
+
+                rows = [row for row in map(build_unified, chunk) if row is not None]
+                # Rows the live projector already wrote are skipped by the unique (source, source_id) constraint
+                write_unified(rows)
+                processed += len(rows)
+
+                last_id = chunk[-1].pk
+                watermark.last_id = last_id
+                watermark.save(update_fields=["last_id", "updated_at"])
+
+            self.stdout.write(self.style.SUCCESS(f"{source}: processed {processed} rows, watermark at {last_id}"))
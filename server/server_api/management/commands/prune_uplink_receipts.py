@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from server_api.models import UplinkReceipt
+
+
+class Command(BaseCommand):
+    help = "Delete TTN uplink receipts older than the retention period; TTN only retries for minutes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=getattr(settings, "UPLINK_RECEIPT_RETENTION_DAYS", 7),
+            help="Keep receipts from the last N days.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        deleted, _ = UplinkReceipt.objects.filter(created_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} uplink receipts older than {cutoff:%Y-%m-%d %H:%M}"))
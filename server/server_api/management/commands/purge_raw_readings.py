@@ -0,0 +1,55 @@
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from server_api.retention import PURGED_MODELS, downsample_and_purge
+
+SOURCES = {model._meta.model_name: model for model in PURGED_MODELS}
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete raw readings older than the retention an hour per transaction, summarising them into hourly "
+        "SensorRollup rows as they go, then their SensorData mirrors in small committed chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("sources", nargs="*", help=f"Source tables (default: all). Available: {', '.join(SOURCES)}.")
+        parser.add_argument(
+            "--days", type=float, default=getattr(settings, "RAW_RETENTION_DAYS", None),
+            help="Keep raw readings this many days (default: RAW_RETENTION_DAYS).",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=getattr(settings, "RAW_PURGE_CHUNK_SIZE", 5000),
+            help="Mirrors (and late raw rows) deleted per transaction.",
+        )
+        parser.add_argument("--window-hours", type=int, default=24, help="Hours purged per step.")
+        parser.add_argument("--max-windows", type=int, help="Stop after this many windows per table (for pacing).")
+
+    def handle(self, *args, **options):
+        if options["days"] is None:
+            raise CommandError("No retention: set RAW_RETENTION_DAYS or pass --days.")
+        unknown = [name for name in options["sources"] if name not in SOURCES]
+        if unknown:
+            raise CommandError(f"Unknown sources: {', '.join(unknown)}")
+        cutoff = datetime.now() - timedelta(days=options["days"])
+        window = timedelta(hours=options["window_hours"])
+
+        for name in options["sources"] or SOURCES:
+            started = time.perf_counter()
+            windows = rows = mirrors = 0
+            for step in downsample_and_purge(SOURCES[name], cutoff, options["chunk_size"], window):
+                windows += 1
+                rows += step["rows"]
+                mirrors += step["mirrors"]
+                self.stdout.write(
+                    f"{name}: {step['start']:%Y-%m-%d %H:%M} - {step['end']:%Y-%m-%d %H:%M} "
+                    f"summarised, {step['rows']} rows and {step['mirrors']} mirrors deleted"
+                )
+                if options["max_windows"] and windows >= options["max_windows"]:
+                    break
+            self.stdout.write(self.style.SUCCESS(
+                f"{name}: {windows} windows, purged {rows} rows and {mirrors} mirrors "
+                f"in {time.perf_counter() - started:.1f}s"
+            ))
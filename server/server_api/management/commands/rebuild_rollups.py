@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from server_api.rollups import GRAINS, ROLLUP_CHANNELS, rebuild_rollups
+
+SOURCES = {model._meta.model_name: model for model in ROLLUP_CHANNELS}
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute SensorRollup rows from the raw tables, for every bucket overlapping --start/--end "
+        "(everything by default). Use it to backfill, or after raw rows were replayed. Buckets before "
+        "the raw horizon are skipped: their raw rows were purged by purge_raw_readings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("sources", nargs="*", help=f"Source tables (default: all). Available: {', '.join(SOURCES)}.")
+        parser.add_argument("--start", help="Rebuild buckets from the one containing this ISO datetime.")
+        parser.add_argument("--end", help="Rebuild buckets up to the one containing this ISO datetime.")
+        parser.add_argument("--grain", action="append", choices=list(GRAINS), help="Only this grain (repeatable).")
+
+    def handle(self, *args, **options):
+        unknown = [name for name in options["sources"] if name not in SOURCES]
+        if unknown:
+            raise CommandError(f"Unknown sources: {', '.join(unknown)}")
+        start = self._parse_bound(options["start"], "start")
+        end = self._parse_bound(options["end"], "end")
+
+        for name in options["sources"] or SOURCES:
+            started = time.perf_counter()
+            written = rebuild_rollups(SOURCES[name], start, end, options["grain"])
+            self.stdout.write(self.style.SUCCESS(
+                f"{name}: wrote {written} rollup rows in {time.perf_counter() - started:.1f}s"
+            ))
+
+    def _parse_bound(self, value, name):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise CommandError(f"Invalid --{name} datetime: {value}")
+        return parsed
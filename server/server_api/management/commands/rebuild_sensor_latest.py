@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from server_api.latest import LATEST_MODELS, rebuild_latest
+
+SOURCES = {model._meta.model_name: model for model in LATEST_MODELS}
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute SensorLatest, the newest reading of every sensor, from the raw tables. "
+        "Use it after a failed projector write or after restoring raw rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("sources", nargs="*", help=f"Source tables (default: all). Available: {', '.join(SOURCES)}.")
+
+    def handle(self, *args, **options):
+        unknown = [name for name in options["sources"] if name not in SOURCES]
+        if unknown:
+            raise CommandError(f"Unknown sources: {', '.join(unknown)}")
+
+        for name in options["sources"] or SOURCES:
+            started = time.perf_counter()
+            written = rebuild_latest(SOURCES[name])
+            self.stdout.write(self.style.SUCCESS(
+                f"{name}: updated {written} sensors in {time.perf_counter() - started:.1f}s"
+            ))
@@ -0,0 +1,206 @@
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils.dateparse import parse_datetime
+from server_api.dedup import FrameDedup, frame_key
+from server_api.ingest import decode_minew_items, last_occupancy_totals, occupancy_record
+from server_api.ingest_queue import insert_stamped
+from server_api.models import OccupancyData, RawSensorData, SensorData
+from server_api.projector import projector
+from server_api.raw_archive import iter_range
+from server_api.rollups import rebuild_rollups
+from server_api.sensor_registry import sensor_registry
+
+logger = logging.getLogger(__name__)
+
+
+def decode_chunk(chunk):
+    """
+    Worker: decode a chunk of (received_at, raw_data) payloads.
+    Returns ([(received_at, mac, rssi, raw, parsed_dict), ...], error_count).
+    """
+    items = []
+    received = []
+    for received_at, raw_data in chunk:
+        # Gateways post a JSON array; tolerate single objects stored by older clients
+        for item in raw_data if isinstance(raw_data, list) else [raw_data]:
+            if isinstance(item, dict):
+                items.append(item)
+                received.append(received_at)
+    # One batch decode for the whole chunk
+    frames, errors = decode_minew_items(items, keys=received)
+    return frames, len(errors)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-derive OccupancyData from stored raw gateway payloads (RawSensorData or the raw archive). "
+        "Payloads are decoded across a process pool and running totals are recomputed per MAC "
+        "with the same serial_number rule as live ingest."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", choices=["db", "archive"], default="db")
+        parser.add_argument("--start", help="Only payloads received at or after this ISO datetime.")
+        parser.add_argument("--end", help="Only payloads received at or before this ISO datetime.")
+        parser.add_argument("--chunk-size", type=int, default=500, help="Raw payloads per decode task.")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument(
+            "--replace", action="store_true",
+            help="Delete existing OccupancyData (and their SensorData mirrors) in the range first; "
+                 "needs --start and/or --end.",
+        )
+        parser.add_argument("--no-project", action="store_true", help="Do not write SensorData mirrors.")
+        parser.add_argument(
+            "--keep-duplicates", action="store_true",
+            help="Keep copies of a frame relayed by several gateways (dropped by default, like live ingest).",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Decode and count only; write nothing.")
+
+    def handle(self, *args, **options):
+        start = self._parse_bound(options["start"], "start")
+        end = self._parse_bound(options["end"], "end")
+        self.dry_run = options["dry_run"]
+        self.project = not options["no_project"]
+        # Private to the replay, keyed on the original receive time, and never
+        # touching the live shared cache
+        self.dedup = None if options["keep_duplicates"] else FrameDedup(cache_alias="")
+        self.duplicates = 0
+
+        if options["replace"] and start is None and end is None:
+            # Without a bound the delete would take every OccupancyData row
+            raise CommandError("--replace needs --start and/or --end.")
+        if options["replace"] and not self.dry_run:
+            self._delete_range(start, end)
+
+        # Running totals continue from the last row before the range
+        self.start = start
+        self.totals_by_mac = {}
+        self.sensors = {}
+
+        chunks = _chunks(self._payloads(options["source"], start, end, options["chunk_size"]), options["chunk_size"])
+        frames = written = errors = 0
+        started = last_report = time.perf_counter()
+
+        # Workers only decode; fork them before any cursor is open so no child
+        # inherits (and on exit tears down) a live database connection
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            pool.submit(decode_chunk, []).result()
+            # Keep a bounded number of chunks in flight so memory stays flat
+            # however large the source is; results are consumed in submission order
+            pending = deque()
+            max_pending = options["workers"] * 2
+            for chunk in chunks:
+                pending.append(pool.submit(decode_chunk, chunk))
+                if len(pending) >= max_pending:
+                    decoded, error_count = pending.popleft().result()
+                    frames += len(decoded)
+                    errors += error_count
+                    written += self._write(decoded)
+                now = time.perf_counter()
+                if now - last_report >= 10:
+                    self.stdout.write(f"{frames} frames, {frames / (now - started):.0f} frames/s")
+                    last_report = now
+            while pending:
+                decoded, error_count = pending.popleft().result()
+                frames += len(decoded)
+                errors += error_count
+                written += self._write(decoded)
+
+        projector.flush()
+        if options["replace"] and not self.dry_run:
+            # The deleted rows were still counted in the rollups of the range
+            rebuild_rollups(OccupancyData, start, end)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Replayed {frames} frames ({errors} undecodable, {self.duplicates} relayed duplicates) in {elapsed:.1f}s, "
+            f"{frames / elapsed if elapsed else 0:.0f} frames/s; "
+            f"{'would write' if self.dry_run else 'wrote'} {written} OccupancyData rows"
+        ))
+
+    def _parse_bound(self, value, name):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise CommandError(f"Invalid --{name} datetime: {value}")
+        return parsed
+
+    def _payloads(self, source, start, end, chunk_size):
+        if source == "archive":
+            yield from iter_range(start, end)
+            return
+        queryset = RawSensorData.objects.order_by("received_at", "pk")
+        if start is not None:
+            queryset = queryset.filter(received_at__gte=start)
+        if end is not None:
+            queryset = queryset.filter(received_at__lte=end)
+        # Server-side cursor: rows are streamed, not loaded all at once
+        yield from queryset.values_list("received_at", "raw_data").iterator(chunk_size=chunk_size)
+
+    def _delete_range(self, start, end):
+        bounds = {}
+        if start is not None:
+            bounds["timestamp__gte"] = start
+        if end is not None:
+            bounds["timestamp__lte"] = end
+        with transaction.atomic():
+            SensorData.objects.filter(source=OccupancyData._meta.model_name, **bounds).delete()
+            deleted, _ = OccupancyData.objects.filter(**bounds).delete()
+        self.stdout.write(f"Deleted {deleted} existing OccupancyData rows in range")
+
+    def _totals_for(self, macs):
+        """Resolve sensors and starting totals for MACs seen for the first time."""
+        new_macs = {mac for mac in macs if mac not in self.totals_by_mac}
+        if not new_macs:
+            return
+        sensors = sensor_registry.get_many(new_macs, 'OC', create=not self.dry_run)
+        last_totals = last_occupancy_totals(sensors.values(), before=self.start) if self.start else {}
+        for mac in new_macs:
+            sensor = sensors.get(mac)
+            self.sensors[mac] = sensor
+            start_totals = last_totals.get(sensor.pk) if sensor is not None else None
+            self.totals_by_mac[mac] = dict(start_totals or {"entries": 0, "exits": 0, "s_no": -1})
+
+    def _write(self, decoded):
+        if self.dedup is not None:
+            count = len(decoded)
+            decoded = [
+                frame for frame in decoded
+                if not self.dedup.is_duplicate(frame_key(frame[1], frame[4]), "replay", frame[0].timestamp())
+            ]
+            self.duplicates += count - len(decoded)
+        if not decoded:
+            return 0
+        self._totals_for({mac for _, mac, _, _, _ in decoded})
+
+        records = []
+        for received_at, mac, rssi, raw, parsed_dict in decoded:
+            record = occupancy_record(
+                self.sensors[mac], mac, rssi, raw, parsed_dict, self.totals_by_mac[mac], received_at
+            )
+            record.created_at = received_at
+            records.append(record)
+        if self.dry_run:
+            return len(records)
+
+        with transaction.atomic():
+            # timestamp and created_at are auto_now_add, which bulk_create would
+            # overwrite with the current time; keep the original receive time
+            insert_stamped(OccupancyData, records)
+            if self.project:
+                projector.add(records)
+        return len(records)
@@ -0,0 +1,66 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from server_api.collectors import COLLECTORS, CollectorSupervisor
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the data collectors (AQ poller, EM fleet poller, weather refresher) as tasks of one "
+        "process, restarting crashed ones with backoff. Replaces running poll_aq, poll_em_all and "
+        "fetch_weather separately."
+    )
+    # The system checks import the URLconf and with it the views, pandas and
+    # the ML models, none of which a collector needs
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "collectors", nargs="*",
+            help=f"Collectors to run (default: COLLECTORS_ENABLED). Available: {', '.join(COLLECTORS)}.",
+        )
+        parser.add_argument(
+            "--health-port", type=int, default=getattr(settings, "COLLECTOR_HEALTH_PORT", None),
+            help="Serve per-collector health as JSON at /health on this port.",
+        )
+        parser.add_argument(
+            "--status-every", type=float, default=60,
+            help="Print every collector's health this often, in seconds (0 disables).",
+        )
+
+    def handle(self, *args, **options):
+        names = options["collectors"] or list(getattr(settings, "COLLECTORS_ENABLED", COLLECTORS))
+        unknown = [name for name in names if name not in COLLECTORS]
+        if unknown:
+            raise CommandError(f"Unknown collectors: {', '.join(unknown)}")
+
+        supervisor = CollectorSupervisor([COLLECTORS[name]() for name in names])
+        self.stdout.write(f"Starting collectors: {', '.join(names)} (Press CTRL+C to stop)")
+        try:
+            asyncio.run(self.run(supervisor, options))
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
+
+    async def run(self, supervisor, options):
+        reporter = None
+        if options["status_every"]:
+            reporter = asyncio.create_task(self.report(supervisor, options["status_every"]))
+        try:
+            await supervisor.run(options["health_port"])
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+
+    async def report(self, supervisor, every):
+        while True:
+            await asyncio.sleep(every)
+            for name, health in supervisor.health()["collectors"].items():
+                summary = {key: health[key] for key in ("state", "rounds", "failed_rounds", "restarts")}
+                line = f"{name}: {'healthy' if health['healthy'] else 'UNHEALTHY'} {json.dumps(summary)}"
+                if health["last_detail"]:
+                    line += f" last: {health['last_detail']}"
+                if health["last_error"]:
+                    line += f" error: {health['last_error']}"
+                self.stdout.write(line)
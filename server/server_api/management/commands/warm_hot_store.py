@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from server_api.hot_store import HOT_MODELS, hot_store
+from server_api.rollups import ROLLUP_CHANNELS
+
+SOURCES = {model._meta.model_name: model for model in HOT_MODELS}
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the hot store rings of every sensor with its latest readings from the database. Run it once "
+        "after enabling the hot store or moving HOT_STORE_DIR; rings that already hold readings are kept."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("sources", nargs="*", help=f"Source tables (default: all). Available: {', '.join(SOURCES)}.")
+        parser.add_argument("--reset", action="store_true", help="Rebuild rings that already hold readings too.")
+
+    def handle(self, *args, **options):
+        unknown = [name for name in options["sources"] if name not in SOURCES]
+        if unknown:
+            raise CommandError(f"Unknown sources: {', '.join(unknown)}")
+
+        for name in options["sources"] or SOURCES:
+            model = SOURCES[name]
+            started = time.perf_counter()
+            sensors = readings = 0
+            table = hot_store.ring(model, None)
+            if table is not None and options["reset"]:
+                table.clear()
+            sensor_pks = model.objects.exclude(sensor=None).values_list("sensor_id", flat=True).distinct()
+            for sensor_pk in sensor_pks:
+                ring = hot_store.ring(model, sensor_pk)
+                if ring is not None and ring.written:
+                    if not options["reset"]:
+                        continue
+                    # Emptied in place: other processes have the file mapped
+                    ring.clear()
+                ring = hot_store.ring(model, sensor_pk, create=True)
+                rows = list(
+                    model.objects.filter(sensor_id=sensor_pk)
+                    .only("sensor_id", "timestamp", *ROLLUP_CHANNELS[model])
+                    .order_by("-timestamp")[:ring.capacity]
+                )
+                hot_store.record(rows)
+                sensors += 1
+                readings += len(rows)
+            self.stdout.write(self.style.SUCCESS(
+                f"{name}: {readings} readings into {sensors} rings in {time.perf_counter() - started:.1f}s"
+            ))
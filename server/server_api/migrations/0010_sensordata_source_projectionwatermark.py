@@ -0,0 +1,51 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:07
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+MIRRORED_SOURCES = ('airqualitydata', 'energydata', 'occupancydata', 'radardata')
+
+
+def seed_watermarks(apps, schema_editor):
+    # Rows that exist now were already mirrored by the old post_save signals,
+    # so catch-up projection starts after them.
+    ProjectionWatermark = apps.get_model('server_api', 'ProjectionWatermark')
+    for model_name in MIRRORED_SOURCES:
+        model = apps.get_model('server_api', model_name)
+        last_id = model.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        ProjectionWatermark.objects.update_or_create(source=model_name, defaults={'last_id': last_id})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('server_api', '0009_weatherlocation_weatherhourly_weatherdaily_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectionWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='sensordata',
+            name='source',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AddField(
+            model_name='sensordata',
+            name='source_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='sensordata',
+            constraint=models.UniqueConstraint(fields=('source', 'source_id'), name='unique_sensordata_source'),
+        ),
+        migrations.RunPython(seed_watermarks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:26
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('server_api', '0010_sensordata_source_projectionwatermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UplinkReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device_id', models.CharField(max_length=100)),
+                ('f_cnt', models.BigIntegerField()),
+                ('received_at', models.CharField(max_length=40)),
+                ('status_code', models.PositiveSmallIntegerField(default=0)),
+                ('response', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('device_id', 'f_cnt', 'received_at'), name='unique_uplink_receipt')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:28
+
+from django.db import migrations, models
+
+
+# The two meters poll_em_all used to poll at hardcoded addresses
+LEGACY_EM_ADDRESSES = {'0': '192.168.68.51', '1': '192.168.68.50'}
+
+
+def seed_em_addresses(apps, schema_editor):
+    Sensor = apps.get_model('server_api', 'Sensor')
+    for sensor_id, address in LEGACY_EM_ADDRESSES.items():
+        sensor, created = Sensor.objects.get_or_create(
+            sensor_id=sensor_id,
+            defaults={'sensor_type': 'EM', 'description': 'Auto-created EM sensor', 'address': address},
+        )
+        if not created and sensor.sensor_type == 'EM' and not sensor.address:
+            sensor.address = address
+            sensor.save(update_fields=['address'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('server_api', '0011_uplinkreceipt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sensor',
+            name='address',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.RunPython(seed_em_addresses, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('server_api', '0012_sensor_address'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(max_length=32)),
+                ('grain', models.CharField(choices=[('1m', '1 minute'), ('15m', '15 minutes'), ('1h', '1 hour')], max_length=3)),
+                ('bucket', models.DateTimeField()),
+                ('count', models.IntegerField()),
+                ('sum_value', models.FloatField()),
+                ('min_value', models.FloatField()),
+                ('max_value', models.FloatField()),
+                ('last_value', models.FloatField()),
+                ('last_at', models.DateTimeField()),
+                ('sensor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='server_api.sensor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['grain', 'bucket'], name='sensor_rollup_grain_bucket')],
+                'constraints': [models.UniqueConstraint(fields=('sensor', 'channel', 'grain', 'bucket'), name='unique_sensor_rollup')],
+            },
+        ),
+    ]
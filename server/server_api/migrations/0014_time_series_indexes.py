@@ -0,0 +1,149 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:42
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+SENSOR_FK_MODELS = (
+    'airqualitydata', 'energydata', 'lsg01airqualitydata', 'occupancydata', 'radardata', 'sensordata',
+    'temperaturehumiditydata',
+)
+
+
+def _sensor_fk_indexes(apps, schema_editor):
+    for model_name in SENSOR_FK_MODELS:
+        table = apps.get_model('server_api', model_name)._meta.db_table
+        # The name Django gave the index of the foreign key column
+        yield table, schema_editor.quote_name(schema_editor._create_index_name(table, ['sensor_id']))
+
+
+def drop_sensor_fk_indexes(apps, schema_editor):
+    for _, index in _sensor_fk_indexes(apps, schema_editor):
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {index}')
+
+
+def create_sensor_fk_indexes(apps, schema_editor):
+    for table, index in _sensor_fk_indexes(apps, schema_editor):
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {index} ON {schema_editor.quote_name(table)} ("sensor_id")'
+        )
+
+
+class Migration(migrations.Migration):
+    # The reading tables are large and written to constantly; build the
+    # indexes without locking out inserts
+    atomic = False
+
+    dependencies = [
+        ('server_api', '0013_sensorrollup'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='airqualitydata',
+            index=models.Index(fields=['sensor', '-timestamp'], name='aq_sensor_ts'),
+        ),
+        AddIndexConcurrently(
+            model_name='airqualitydata',
+            index=django.contrib.postgres.indexes.BrinIndex(autosummarize=True, fields=['timestamp'], name='aq_ts_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='energydata',
+            index=models.Index(fields=['sensor', '-timestamp'], name='em_sensor_ts'),
+        ),
+        AddIndexConcurrently(
+            model_name='energydata',
+            index=django.contrib.postgres.indexes.BrinIndex(autosummarize=True, fields=['timestamp'], name='em_ts_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='lsg01airqualitydata',
+            index=models.Index(fields=['sensor', '-timestamp'], name='lsg01_sensor_ts'),
+        ),
+        AddIndexConcurrently(
+            model_name='lsg01airqualitydata',
+            index=django.contrib.postgres.indexes.BrinIndex(autosummarize=True, fields=['timestamp'], name='lsg01_ts_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='occupancydata',
+            index=models.Index(fields=['sensor', '-timestamp'], name='oc_sensor_ts'),
+        ),
+        AddIndexConcurrently(
+            model_name='occupancydata',
+            index=django.contrib.postgres.indexes.BrinIndex(autosummarize=True, fields=['timestamp'], name='oc_ts_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='radardata',
+            index=models.Index(fields=['sensor', '-timestamp'], name='radar_sensor_ts'),
+        ),
+        AddIndexConcurrently(
+            model_name='radardata',
+            index=django.contrib.postgres.indexes.BrinIndex(autosummarize=True, fields=['timestamp'], name='radar_ts_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='sensordata',
+            index=models.Index(fields=['sensor', '-timestamp'], name='sensordata_sensor_ts'),
+        ),
+        AddIndexConcurrently(
+            model_name='sensordata',
+            index=django.contrib.postgres.indexes.BrinIndex(autosummarize=True, fields=['timestamp'], name='sensordata_ts_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='sensordata',
+            index=models.Index(condition=models.Q(('action__in', ('NORMAL_AQ', 'NORMAL_EM', 'NO_MOVEMENT')), _negated=True), fields=['action', '-timestamp'], name='sensordata_alert_action'),
+        ),
+        AddIndexConcurrently(
+            model_name='temperaturehumiditydata',
+            index=models.Index(fields=['sensor', '-timestamp'], name='temphum_sensor_ts'),
+        ),
+        AddIndexConcurrently(
+            model_name='temperaturehumiditydata',
+            index=django.contrib.postgres.indexes.BrinIndex(autosummarize=True, fields=['timestamp'], name='temphum_ts_brin'),
+        ),
+        # The sensor foreign keys are covered by the (sensor, timestamp)
+        # indexes above. Only their indexes go: altering the fields would drop
+        # and re-validate the constraints too.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='airqualitydata',
+                    name='sensor',
+                    field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='aq_data', to='server_api.sensor'),
+                ),
+                migrations.AlterField(
+                    model_name='energydata',
+                    name='sensor',
+                    field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='em_data', to='server_api.sensor'),
+                ),
+                migrations.AlterField(
+                    model_name='lsg01airqualitydata',
+                    name='sensor',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='server_api.sensor'),
+                ),
+                migrations.AlterField(
+                    model_name='occupancydata',
+                    name='sensor',
+                    field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='oc_data', to='server_api.sensor'),
+                ),
+                migrations.AlterField(
+                    model_name='radardata',
+                    name='sensor',
+                    field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='radar_data', to='server_api.sensor'),
+                ),
+                migrations.AlterField(
+                    model_name='sensordata',
+                    name='sensor',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='all_data', to='server_api.sensor'),
+                ),
+                migrations.AlterField(
+                    model_name='temperaturehumiditydata',
+                    name='sensor',
+                    field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='temp_humidity_data', to='server_api.sensor'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(drop_sensor_fk_indexes, create_sensor_fk_indexes),
+            ],
+        ),
+    ]
@@ -0,0 +1,255 @@
+from datetime import datetime
+
+from django.db import migrations, models
+
+PARTITIONED_MODELS = ('energydata', 'sensordata')
+MONTHS_AHEAD = 3
+
+
+def _month(year, month):
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    return datetime(year, month, 1)
+
+
+def _shape(cursor, table):
+    """What has to be recreated on a new table: plain indexes, unique constraints and foreign keys."""
+    cursor.execute(
+        "SELECT pg_get_indexdef(indexrelid) FROM pg_index "
+        "WHERE indrelid = %s::regclass AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conindid = indexrelid)",
+        [table],
+    )
+    indexes = [row[0] for row in cursor.fetchall()]
+    cursor.execute(
+        "SELECT c.conname, array_agg(a.attname ORDER BY k.n) FROM pg_constraint c "
+        "CROSS JOIN unnest(c.conkey) WITH ORDINALITY AS k(attnum, n) "
+        "JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum "
+        "WHERE c.conrelid = %s::regclass AND c.contype = 'u' GROUP BY c.conname",
+        [table],
+    )
+    uniques = cursor.fetchall()
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+        [table],
+    )
+    return indexes, uniques, cursor.fetchall()
+
+
+def _set_aside(schema_editor, cursor, table, suffix):
+    """Rename `table` and its indexes out of the way of a new table of the same name."""
+    q = schema_editor.quote_name
+    schema_editor.execute(f'ALTER TABLE {q(table)} RENAME TO {q(table + suffix)}')
+    cursor.execute("SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = %s::regclass", [table + suffix])
+    for (index,) in cursor.fetchall():
+        index = index.strip('"')
+        schema_editor.execute(f'ALTER INDEX {q(index)} RENAME TO {q(index[:63 - len(suffix)] + suffix)}')
+
+
+def _recreate(schema_editor, table, indexes, uniques, foreign_keys, unique_columns=list):
+    q = schema_editor.quote_name
+    for name, columns in uniques:
+        columns = unique_columns(list(columns))
+        schema_editor.execute(f'ALTER TABLE {q(table)} ADD CONSTRAINT {q(name)} UNIQUE ({", ".join(map(q, columns))})')
+    for name, definition in foreign_keys:
+        schema_editor.execute(f'ALTER TABLE {q(table)} ADD CONSTRAINT {q(name)} {definition}')
+    for definition in indexes:
+        schema_editor.execute(definition)
+
+
+def _first_month():
+    """Start of next month: the upper bound of the legacy partition."""
+    now = datetime.now()
+    return _month(now.year, now.month + 1)
+
+
+def _unique_keys(cursor, table):
+    """[(constraint, columns)] of the primary key and unique constraints of `table`."""
+    cursor.execute(
+        "SELECT c.conname, array_agg(a.attname ORDER BY k.n) FROM pg_constraint c "
+        "CROSS JOIN unnest(c.conkey) WITH ORDINALITY AS k(attnum, n) "
+        "JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum "
+        "WHERE c.conrelid = %s::regclass AND c.contype IN ('p', 'u') GROUP BY c.conname",
+        [table],
+    )
+    return cursor.fetchall()
+
+
+def _keyed_index(constraint):
+    return f'{constraint[:60]}_ts'
+
+
+def bound_legacy_rows(apps, schema_editor):
+    """
+    Step 1 of 3: set aside the rows stamped from next month on (device
+    clocks) into T_future, and add the legacy partition's bound as a CHECK
+    constraint, NOT VALID so existing rows are not scanned under the lock.
+    Until step 3, readings stamped after next month starts are rejected.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    q = schema_editor.quote_name
+    first = _first_month()
+    with schema_editor.connection.cursor() as cursor:
+        for model_name in PARTITIONED_MODELS:
+            table = apps.get_model('server_api', model_name)._meta.db_table
+            schema_editor.execute(f'CREATE TABLE {q(table + "_future")} (LIKE {q(table)})')
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM {q(table)} WHERE "timestamp" >= %s RETURNING *) '
+                f'INSERT INTO {q(table + "_future")} SELECT * FROM moved',
+                [first],
+            )
+            schema_editor.execute(
+                f'ALTER TABLE {q(table)} ADD CONSTRAINT {q(table + "_legacy_bound")} '
+                f'CHECK ("timestamp" < %s) NOT VALID' % schema_editor.quote_value(first)
+            )
+
+
+def prepare_legacy_rows(apps, schema_editor):
+    """
+    Step 2 of 3, outside a transaction: validate the bound and build the
+    indexes of the partitioned keys, (id, timestamp) and each unique key
+    plus timestamp. Both scan the whole table, but VALIDATE CONSTRAINT and
+    CREATE INDEX CONCURRENTLY let reads and inserts carry on meanwhile.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    q = schema_editor.quote_name
+    with schema_editor.connection.cursor() as cursor:
+        for model_name in PARTITIONED_MODELS:
+            table = apps.get_model('server_api', model_name)._meta.db_table
+            schema_editor.execute(f'ALTER TABLE {q(table)} VALIDATE CONSTRAINT {q(table + "_legacy_bound")}')
+            for constraint, columns in _unique_keys(cursor, table):
+                columns = [column for column in columns if column != 'timestamp'] + ['timestamp']
+                schema_editor.execute(
+                    f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {q(_keyed_index(constraint))} '
+                    f'ON {q(table)} ({", ".join(map(q, columns))})'
+                )
+
+
+def partition_tables(apps, schema_editor):
+    """
+    Step 3 of 3: turn each table into one partitioned by month on
+    timestamp. The existing table becomes its "_legacy" partition, covering
+    everything before next month, so no rows are copied. A default
+    partition and the partitions of the next MONTHS_AHEAD months are created
+    too, and the rows set aside in step 1 are put back through the parent.
+    Unique keys of a partitioned table must include the partition key, so
+    timestamp is appended to them; the primary key becomes (id, timestamp).
+
+    The table is locked while this runs, but only for catalog changes: the
+    new keys take over the indexes built in step 2, and the validated CHECK
+    constraint proves the legacy rows fit their partition, so ATTACH
+    PARTITION neither scans the table nor builds an index.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    q = schema_editor.quote_name
+    first = _first_month()
+    with schema_editor.connection.cursor() as cursor:
+        for model_name in PARTITIONED_MODELS:
+            table = apps.get_model('server_api', model_name)._meta.db_table
+            legacy = f'{table}_legacy'
+            for constraint, _ in _unique_keys(cursor, table):
+                schema_editor.execute(f'ALTER TABLE {q(table)} DROP CONSTRAINT {q(constraint)}')
+                kind = 'PRIMARY KEY' if constraint == f'{table}_pkey' else 'UNIQUE'
+                schema_editor.execute(
+                    f'ALTER TABLE {q(table)} ADD CONSTRAINT {q(constraint)} {kind} USING INDEX {q(_keyed_index(constraint))}'
+                )
+            indexes, uniques, foreign_keys = _shape(cursor, table)
+            _set_aside(schema_editor, cursor, table, '_legacy')
+
+            # ids keep counting from where the identity column of the old table was
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [legacy])
+            sequence = cursor.fetchone()[0]
+            cursor.execute(f'SELECT last_value + 1 FROM {sequence}')
+            next_id = cursor.fetchone()[0]
+            cursor.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM {q(legacy)}')
+            next_id = max(next_id, cursor.fetchone()[0])
+            schema_editor.execute(f'ALTER TABLE {q(legacy)} ALTER COLUMN id DROP IDENTITY')
+
+            schema_editor.execute(
+                f'CREATE TABLE {q(table)} (LIKE {q(legacy)} INCLUDING DEFAULTS INCLUDING STORAGE) '
+                f'PARTITION BY RANGE ("timestamp")'
+            )
+            schema_editor.execute(f'CREATE SEQUENCE {q(table + "_id_seq")} OWNED BY {q(table)}.id')
+            cursor.execute('SELECT setval(%s, %s, false)', [f'{table}_id_seq', next_id])
+            schema_editor.execute(
+                f'ALTER TABLE {q(table)} ALTER COLUMN id SET DEFAULT nextval({schema_editor.quote_value(table + "_id_seq")})'
+            )
+            schema_editor.execute(f'ALTER TABLE {q(table)} ADD CONSTRAINT {q(table + "_pkey")} PRIMARY KEY (id, "timestamp")')
+            # The unique keys already end in timestamp
+            _recreate(schema_editor, table, indexes, uniques, foreign_keys)
+
+            # Its indexes and foreign keys match the new table's and are attached as they are
+            schema_editor.execute(
+                f'ALTER TABLE {q(table)} ATTACH PARTITION {q(legacy)} FOR VALUES FROM (MINVALUE) TO (%s)'
+                % schema_editor.quote_value(first)
+            )
+            # The partition bound supersedes it
+            schema_editor.execute(f'ALTER TABLE {q(legacy)} DROP CONSTRAINT {q(table + "_legacy_bound")}')
+
+            schema_editor.execute(f'CREATE TABLE {q(table + "_default")} PARTITION OF {q(table)} DEFAULT')
+            for offset in range(MONTHS_AHEAD):
+                month = _month(first.year, first.month + offset)
+                following = _month(month.year, month.month + 1)
+                schema_editor.execute(
+                    f'CREATE TABLE {q(table + month.strftime("_p%Y%m"))} PARTITION OF {q(table)} '
+                    f'FOR VALUES FROM (%s) TO (%s)' % (schema_editor.quote_value(month), schema_editor.quote_value(following))
+                )
+            schema_editor.execute(f'INSERT INTO {q(table)} SELECT * FROM {q(table + "_future")}')
+            schema_editor.execute(f'DROP TABLE {q(table + "_future")}')
+
+
+def unpartition_tables(apps, schema_editor):
+    """Copy each partitioned table back into a plain one with an identity id."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    q = schema_editor.quote_name
+    with schema_editor.connection.cursor() as cursor:
+        for model_name in PARTITIONED_MODELS:
+            table = apps.get_model('server_api', model_name)._meta.db_table
+            partitioned = f'{table}_partitioned'
+            indexes, uniques, foreign_keys = _shape(cursor, table)
+            _set_aside(schema_editor, cursor, table, '_partitioned')
+
+            schema_editor.execute(f'CREATE TABLE {q(table)} (LIKE {q(partitioned)} INCLUDING STORAGE)')
+            schema_editor.execute(f'INSERT INTO {q(table)} SELECT * FROM {q(partitioned)}')
+            # Dropping it drops its id sequence too, freeing the name for the identity's
+            schema_editor.execute(f'DROP TABLE {q(partitioned)}')
+            schema_editor.execute(f'ALTER TABLE {q(table)} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY')
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX(id), 0) + 1, false) FROM {q(table)}",
+                [table],
+            )
+            schema_editor.execute(f'ALTER TABLE {q(table)} ADD CONSTRAINT {q(table + "_pkey")} PRIMARY KEY (id)')
+            _recreate(
+                schema_editor, table, [index.replace(' ON ONLY ', ' ON ') for index in indexes], uniques, foreign_keys,
+                lambda columns: [column for column in columns if column != 'timestamp'],
+            )
+
+
+class Migration(migrations.Migration):
+    # Step 2 cannot run in a transaction; steps 1 and 3 each run in their own
+    atomic = False
+
+    dependencies = [
+        ('server_api', '0014_time_series_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(bound_legacy_rows, migrations.RunPython.noop, atomic=True),
+        migrations.RunPython(prepare_legacy_rows, migrations.RunPython.noop),
+        migrations.RunPython(partition_tables, unpartition_tables, atomic=True),
+        # A unique key of a partitioned table has to include the partition key
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveConstraint(
+                    model_name='sensordata',
+                    name='unique_sensordata_source',
+                ),
+                migrations.AddConstraint(
+                    model_name='sensordata',
+                    constraint=models.UniqueConstraint(fields=('source', 'source_id', 'timestamp'), name='unique_sensordata_source'),
+                ),
+            ],
+        ),
+    ]
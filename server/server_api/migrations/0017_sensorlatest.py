@@ -0,0 +1,54 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:59
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+SOURCES = ('airqualitydata', 'energydata', 'occupancydata', 'radardata')
+EXCLUDED_COLUMNS = ['id', 'sensor_id', 'timestamp', 'action', 'created_at', 'raw_data', 'raw_payload']
+
+
+def fill_latest(apps, schema_editor):
+    """The newest reading of every sensor so far, as latest.rebuild_latest computes it."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    q = schema_editor.quote_name
+    table = q(apps.get_model('server_api', 'SensorLatest')._meta.db_table)
+    with schema_editor.connection.cursor() as cursor:
+        for model_name in SOURCES:
+            source = q(apps.get_model('server_api', model_name)._meta.db_table)
+            cursor.execute(
+                f'INSERT INTO {table} (sensor_id, source, source_id, "timestamp", action, "values", updated_at) '
+                f'SELECT DISTINCT ON (sensor_id) sensor_id, %s, id, "timestamp", action, to_jsonb(t) - %s::text[], now() '
+                f'FROM {source} t WHERE sensor_id IS NOT NULL ORDER BY sensor_id, "timestamp" DESC '
+                f'ON CONFLICT (sensor_id) DO UPDATE SET source = EXCLUDED.source, source_id = EXCLUDED.source_id, '
+                f'"timestamp" = EXCLUDED."timestamp", action = EXCLUDED.action, "values" = EXCLUDED."values" '
+                f'WHERE EXCLUDED."timestamp" >= {table}."timestamp"',
+                [model_name, EXCLUDED_COLUMNS],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('server_api', '0016_retentioncheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorLatest',
+            fields=[
+                ('sensor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='latest', serialize=False, to='server_api.sensor')),
+                ('source', models.CharField(max_length=50)),
+                ('source_id', models.BigIntegerField()),
+                ('timestamp', models.DateTimeField()),
+                ('action', models.CharField(blank=True, max_length=255, null=True)),
+                ('values', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['source', '-timestamp'], name='sensor_latest_source_ts')],
+            },
+        ),
+        migrations.RunPython(fill_latest, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,27 @@
+from django.contrib.postgres.indexes import BrinIndex
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
 # Create your models here.
 
+# Actions that need no attention; SensorData indexes only the others
+NORMAL_ACTIONS = ("NORMAL_AQ", "NORMAL_EM", "NO_MOVEMENT")
+
+
+def time_series_indexes(prefix):
+    """
+    Indexes of a sensor reading table: (sensor, timestamp DESC) for the
+    latest readings of a sensor, and BRIN on timestamp for time-range scans.
+    Rows arrive roughly in timestamp order, so the BRIN index stays a few
+    pages however large the table grows. The (sensor, timestamp) index also
+    serves lookups by sensor, so the sensor foreign keys are not indexed on
+    their own (db_index=False).
+    """
+    return [
+        models.Index(fields=["sensor", "-timestamp"], name=f"{prefix}_sensor_ts"),
+        BrinIndex(fields=["timestamp"], name=f"{prefix}_ts_brin", autosummarize=True),
+    ]
+
 # class LSG01AirQualityData(models.Model):
 #     sensor = models.ForeignKey('Sensor', on_delete=models.CASCADE)
 #     device = models.CharField(max_length=100)
@@ -19,7 +39,7 @@ from django.db import models
 #         return f"{self.device} | {self.timestamp}"
 
 class Lsg01AirQualityData(models.Model):
-    sensor = models.ForeignKey("Sensor", on_delete=models.CASCADE)
+    sensor = models.ForeignKey("Sensor", on_delete=models.CASCADE, db_index=False)
     device = models.CharField(max_length=100)
     pm25 = models.FloatField(null=True, blank=True)
     hcho = models.FloatField(null=True, blank=True)
@@ -29,6 +49,9 @@ class Lsg01AirQualityData(models.Model):
     humidity = models.FloatField(null=True, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = time_series_indexes("lsg01")
+
 # class SensorReading(models.Model):
 
 #     co2 = models.IntegerField()
@@ -48,19 +71,22 @@ class Lsg01AirQualityData(models.Model):
 #         return f"Sensor {self.sensor_id} at {self.timestamp}"
 
 class TemperatureHumidityData(models.Model):
-    sensor = models.ForeignKey('Sensor', on_delete=models.CASCADE, related_name='temp_humidity_data', null=True, blank=True)
+    sensor = models.ForeignKey('Sensor', on_delete=models.CASCADE, related_name='temp_humidity_data', null=True, blank=True, db_index=False)
     device = models.CharField(max_length=100)
     temperature = models.FloatField()
     humidity = models.FloatField()
     timestamp = models.DateTimeField(auto_now_add=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = time_series_indexes("temphum")
+
     def __str__(self):
         return f"{self.device} @ {self.timestamp} → Temp: {self.temperature}°C, Humidity: {self.humidity}%"
 
 
 class AirQualityData(models.Model):
-    sensor = models.ForeignKey('Sensor', on_delete=models.CASCADE, related_name='aq_data', null=True, blank=True)
+    sensor = models.ForeignKey('Sensor', on_delete=models.CASCADE, related_name='aq_data', null=True, blank=True, db_index=False)
     device = models.CharField(max_length=100)
     quality = models.CharField(max_length=50)
     co2 = models.IntegerField()
@@ -75,6 +101,9 @@ class AirQualityData(models.Model):
     version = models.CharField(max_length=50)
     action = models.CharField(max_length=100, blank=True, null=True)
 
+    class Meta:
+        indexes = time_series_indexes("aq")
+
     def __str__(self):
         return f"{self.device} @ {self.timestamp}"
 
@@ -101,7 +130,7 @@ class AirQualityData(models.Model):
 
 
 class EnergyData(models.Model):
-    sensor = models.ForeignKey('Sensor', on_delete=models.CASCADE, related_name='em_data', null=True, blank=True)
+    sensor = models.ForeignKey('Sensor', on_delete=models.CASCADE, related_name='em_data', null=True, blank=True, db_index=False)
     device_id = models.IntegerField()
     a_current = models.FloatField()
     a_voltage = models.FloatField()
@@ -129,6 +158,9 @@ class EnergyData(models.Model):
     timestamp = models.DateTimeField()
     action = models.CharField(max_length=100, blank=True, null=True)
 
+    class Meta:
+        indexes = time_series_indexes("em")
+
     def __str__(self):
         return f"{self.device_id} @ {self.timestamp}"
 
@@ -153,7 +185,7 @@ class RawSensorData(models.Model):
         return f"Data received at {self.received_at}"
     
 class OccupancyData(models.Model):
-    sensor = models.ForeignKey('Sensor', on_delete=models.CASCADE, related_name='oc_data', null=True, blank=True)
+    sensor = models.ForeignKey('Sensor', on_delete=models.CASCADE, related_name='oc_data', null=True, blank=True, db_index=False)
     mac = models.CharField(max_length=50, blank=True, null=True)
     frame_version = models.CharField(max_length=10, blank=True, null=True)
     battery = models.IntegerField(blank=True, null=True)
@@ -174,6 +206,8 @@ class OccupancyData(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     action = models.CharField(max_length=100, blank=True, null=True)
     
+    class Meta:
+        indexes = time_series_indexes("oc")
 
     def __str__(self):
         return f"{self.mac} @ {self.timestamp}"
@@ -208,13 +242,15 @@ class Sensor(models.Model):
     office = models.CharField(max_length=100, blank=True, null=True)
     description = models.CharField(max_length=100, blank=True)
     active = models.BooleanField(default=True)
+    # Where polled devices (EM meters) are reached: host[:port] or a base URL
+    address = models.CharField(max_length=255, blank=True, default="")
 
     def __str__(self):
         return f"{self.get_sensor_type_display()} {self.sensor_id} @ {self.floor}/{self.office}"
     
 
 class RadarData(models.Model):
-    sensor = models.ForeignKey('Sensor', on_delete=models.CASCADE, related_name='radar_data', null=True, blank=True)
+    sensor = models.ForeignKey('Sensor', on_delete=models.CASCADE, related_name='radar_data', null=True, blank=True, db_index=False)
     mac = models.CharField(max_length=100)
     sn = models.IntegerField()  # Sequence number
     timestamp = models.DateTimeField(auto_now_add=True)
@@ -223,6 +259,9 @@ class RadarData(models.Model):
     raw_payload = models.JSONField()  # Save original JSON (optional)
     action = models.CharField(max_length=100, blank=True, null=True)
 
+    class Meta:
+        indexes = time_series_indexes("radar")
+
     def __str__(self):
         return f"RadarData from {self.mac} at {self.timestamp}"
 
@@ -238,7 +277,7 @@ class RadarData(models.Model):
     
 
 class SensorData(models.Model):
-    sensor = models.ForeignKey('Sensor', on_delete=models.CASCADE, related_name='all_data')
+    sensor = models.ForeignKey('Sensor', on_delete=models.CASCADE, related_name='all_data', db_index=False)
     timestamp = models.DateTimeField()
     action = models.CharField(max_length=255, blank=True, null=True)
     
@@ -295,6 +334,25 @@ class SensorData(models.Model):
     coordinates = models.JSONField(blank=True, null=True)
     raw_payload = models.JSONField(blank=True, null=True)
 
+    # Source row this entry mirrors (set by the unified-table projector)
+    source = models.CharField(max_length=50, blank=True, null=True)
+    source_id = models.BigIntegerField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            # The table is partitioned on timestamp (see partitions.py), so its
+            # unique keys include it; a mirror has its source row's timestamp
+            models.UniqueConstraint(fields=["source", "source_id", "timestamp"], name="unique_sensordata_source"),
+        ]
+        indexes = [
+            *time_series_indexes("sensordata"),
+            # Alerts by action, newest first; the bulk of NORMAL rows stays out
+            models.Index(
+                fields=["action", "-timestamp"], name="sensordata_alert_action",
+                condition=~models.Q(action__in=NORMAL_ACTIONS),
+            ),
+        ]
+
     def __str__(self):
         return f"{self.sensor} @ {self.timestamp} - {self.action}"
 
@@ -356,6 +414,116 @@ class SensorData(models.Model):
         super().save(*args, **kwargs)
 
 
+class ProjectionWatermark(models.Model):
+    """Highest source id the SensorData catch-up projection has processed, per source table."""
+    source = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source} @ {self.last_id}"
+
+
+class RetentionCheckpoint(models.Model):
+    """
+    How far purge_raw_readings has got, per source table: raw rows before
+    purged_before were summarised in the hourly SensorRollup and deleted.
+    """
+    source = models.CharField(max_length=50, unique=True)
+    purged_before = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source} purged before {self.purged_before}"
+
+
+class UplinkReceipt(models.Model):
+    """
+    One processed LoRaWAN (TTN) uplink and the response it got, so webhook
+    retries of the same uplink are answered without inserting again.
+    received_at is kept as the exact string TTN sent.
+    """
+    device_id = models.CharField(max_length=100)
+    f_cnt = models.BigIntegerField()
+    received_at = models.CharField(max_length=40)
+    status_code = models.PositiveSmallIntegerField(default=0)
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["device_id", "f_cnt", "received_at"], name="unique_uplink_receipt"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.device_id} f_cnt={self.f_cnt} @ {self.received_at}"
+
+
+class SensorRollup(models.Model):
+    """
+    Summary of one channel (co2, total_act_power, ...) of one sensor over one
+    time bucket, at 1-minute, 15-minute or 1-hour grain. Kept up to date as
+    readings are ingested (see rollups.py); the mean is sum_value / count.
+    """
+    GRAINS = [
+        ('1m', '1 minute'),
+        ('15m', '15 minutes'),
+        ('1h', '1 hour'),
+    ]
+    sensor = models.ForeignKey('Sensor', on_delete=models.CASCADE, related_name='rollups')
+    channel = models.CharField(max_length=32)
+    grain = models.CharField(max_length=3, choices=GRAINS)
+    bucket = models.DateTimeField()  # start of the bucket
+    count = models.IntegerField()
+    sum_value = models.FloatField()
+    min_value = models.FloatField()
+    max_value = models.FloatField()
+    last_value = models.FloatField()
+    last_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["sensor", "channel", "grain", "bucket"], name="unique_sensor_rollup"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["grain", "bucket"], name="sensor_rollup_grain_bucket"),
+        ]
+
+    @property
+    def mean(self):
+        return self.sum_value / self.count if self.count else None
+
+    def __str__(self):
+        return f"{self.sensor_id} {self.channel} {self.grain} @ {self.bucket}"
+
+
+class SensorLatest(models.Model):
+    """
+    The newest reading of one sensor: its source table and row, time,
+    action and field values. Upserted as readings are ingested (see
+    latest.py), so "current state" reads need no sort of the raw tables.
+    """
+    sensor = models.OneToOneField('Sensor', on_delete=models.CASCADE, primary_key=True, related_name='latest')
+    source = models.CharField(max_length=50)  # model name of the raw table, as SensorData.source
+    source_id = models.BigIntegerField()
+    timestamp = models.DateTimeField()
+    action = models.CharField(max_length=255, blank=True, null=True)
+    values = models.JSONField(encoder=DjangoJSONEncoder)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["source", "-timestamp"], name="sensor_latest_source_ts"),
+        ]
+
+    def __str__(self):
+        return f"{self.sensor_id} @ {self.timestamp}"
+
+
 # --- Weather models ---
 
 class WeatherLocation(models.Model):
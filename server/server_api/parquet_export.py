@@ -0,0 +1,193 @@
+# server_api/parquet_export.py
+"""
+Columnar export of the reading tables for the recommender pipeline.
+
+Each table is written as Parquet, partitioned by sensor type and day
+("Hive" layout), so a reader can select both with directory filters:
+
+    <root>/sensor_type=AQ/date=2025-06-01/part-0.parquet
+
+Columns are typed from the model fields. The sensor is exported as its
+sensor_id, and raw payload columns are left out. Every day is read with a
+server-side cursor (QuerySet.iterator) and written in row groups of
+PARQUET_EXPORT_CHUNK_SIZE rows, so memory stays flat however big the
+table is.
+
+Only whole days are exported. <root>/_watermark.json records, per sensor
+type, the first day not exported yet, so each run only adds the days
+since the last one. Re-exporting a day overwrites its file.
+
+Readings can arrive after their day was exported (gateways uploading a
+backlog, replays). Each run therefore also re-exports the
+PARQUET_EXPORT_REEXPORT_DAYS days before the watermark; rows arriving
+later than that are only exported by an explicit --since. Days whose raw
+rows were partly purged (see retention.py) are never re-exported.
+"""
+import json
+import os
+from datetime import date, datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.db import models
+
+from .models import AirQualityData, EnergyData, OccupancyData, RadarData
+from .rollups import raw_horizon
+
+# Sensor type (Sensor.SENSOR_TYPES) -> reading table
+EXPORT_MODELS = {
+    "AQ": AirQualityData,
+    "EM": EnergyData,
+    "OC": OccupancyData,
+    "RD": RadarData,
+}
+
+# Whole payloads, already decoded into the other columns
+EXCLUDED_FIELDS = {"raw_data", "raw_payload"}
+
+WATERMARK_FILE = "_watermark.json"
+
+_ARROW_TYPES = (
+    (models.BooleanField, pa.bool_()),
+    (models.BigIntegerField, pa.int64()),
+    (models.IntegerField, pa.int32()),
+    (models.FloatField, pa.float64()),
+    (models.DateTimeField, pa.timestamp("us")),
+)
+
+
+def _arrow_type(field):
+    for field_class, arrow_type in _ARROW_TYPES:
+        if isinstance(field, field_class):
+            return arrow_type
+    return pa.string()
+
+
+def export_columns(model):
+    """
+    [(column, lookup, arrow type, to_value)] of `model`: every concrete
+    field except EXCLUDED_FIELDS, the sensor as sensor_id and JSON as text.
+    """
+    columns = []
+    for field in model._meta.concrete_fields:
+        if field.name in EXCLUDED_FIELDS:
+            continue
+        if field.name == "sensor":
+            columns.append(("sensor_id", "sensor__sensor_id", pa.string(), None))
+        elif isinstance(field, models.JSONField):
+            columns.append((field.name, field.name, pa.string(), json.dumps))
+        else:
+            columns.append((field.name, field.name, _arrow_type(field), None))
+    return columns
+
+
+def export_schema(model):
+    return pa.schema([(name, arrow_type) for name, _, arrow_type, _ in export_columns(model)])
+
+
+def day_path(root, sensor_type, day):
+    return os.path.join(root, f"sensor_type={sensor_type}", f"date={day:%Y-%m-%d}", "part-0.parquet")
+
+
+def read_watermarks(root):
+    """{sensor type: first day not exported yet}."""
+    try:
+        with open(os.path.join(root, WATERMARK_FILE)) as handle:
+            return {key: date.fromisoformat(value) for key, value in json.load(handle).items()}
+    except FileNotFoundError:
+        return {}
+
+
+def write_watermark(root, sensor_type, day):
+    watermarks = read_watermarks(root)
+    watermarks[sensor_type] = day
+    path = os.path.join(root, WATERMARK_FILE)
+    with open(path + ".tmp", "w") as handle:
+        json.dump({key: value.isoformat() for key, value in sorted(watermarks.items())}, handle, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def export_day(model, start, path, chunk_size):
+    """
+    Write the rows of `model` stamped on the day starting at `start` to
+    `path`, `chunk_size` rows per row group. Returns the number of rows.
+    """
+    columns = export_columns(model)
+    schema = export_schema(model)
+    rows = (
+        model.objects.filter(timestamp__gte=start, timestamp__lt=start + timedelta(days=1))
+        .order_by("timestamp", "pk")
+        .values_list(*(lookup for _, lookup, _, _ in columns))
+        .iterator(chunk_size=chunk_size)
+    )
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written = 0
+    # Written aside and moved into place, so readers never see half a day
+    with pq.ParquetWriter(path + ".tmp", schema, compression="zstd") as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == chunk_size:
+                writer.write_table(_table(batch, columns, schema))
+                written += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(_table(batch, columns, schema))
+            written += len(batch)
+    os.replace(path + ".tmp", path)
+    return written
+
+
+def _table(batch, columns, schema):
+    arrays = []
+    for index, (_, _, arrow_type, to_value) in enumerate(columns):
+        values = [row[index] for row in batch]
+        if to_value is not None:
+            values = [None if value is None else to_value(value) for value in values]
+        arrays.append(pa.array(values, type=arrow_type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def reexport_start(model, watermark, trailing_days):
+    """First day to export when resuming from `watermark`: `trailing_days` earlier, but not into purged days."""
+    start = watermark - timedelta(days=trailing_days)
+    horizon = raw_horizon(model)
+    if horizon is not None:
+        # The day the horizon falls in is only whole if it falls at midnight
+        whole = horizon.date() if horizon.time() == datetime.min.time() else horizon.date() + timedelta(days=1)
+        start = max(start, min(whole, watermark))
+    return start
+
+
+def export_readings(root, sensor_type, until, since=None, chunk_size=10000, trailing_days=0):
+    """
+    Export the days of `sensor_type` readings from `since` (default:
+    `trailing_days` before the watermark, else the oldest reading) up to the
+    day before `until`, advancing the watermark past each. Days without
+    readings are skipped. Yields (day, rows written).
+    """
+    model = EXPORT_MODELS[sensor_type]
+    watermark = read_watermarks(root).get(sensor_type)
+    day = since
+    if day is None and watermark is not None:
+        day = reexport_start(model, watermark, trailing_days)
+    while day is None or day < until:
+        # Skip straight over days with no readings
+        rows = model.objects.filter(timestamp__lt=datetime.combine(until, datetime.min.time()))
+        if day is not None:
+            rows = rows.filter(timestamp__gte=datetime.combine(day, datetime.min.time()))
+        oldest = rows.order_by("timestamp").values_list("timestamp", flat=True).first()
+        if oldest is None:
+            break
+        day = oldest.date()
+        written = export_day(
+            model, datetime.combine(day, datetime.min.time()), day_path(root, sensor_type, day), chunk_size
+        )
+        day += timedelta(days=1)
+        # Re-exported days leave it where it was
+        if watermark is None or day > watermark:
+            watermark = day
+            write_watermark(root, sensor_type, day)
+        yield day - timedelta(days=1), written
+    if day is not None and (watermark is None or until > watermark):
+        write_watermark(root, sensor_type, until)
@@ -0,0 +1,159 @@
+# server_api/partitions.py
+"""
+Monthly range partitions of the high-volume reading tables (PostgreSQL).
+
+EnergyData and SensorData are partitioned by month on timestamp (migration
+0015). The partition holding month M of table T is T_pYYYYMM. T_legacy is
+the table as it was before partitioning; it covers everything before the
+first monthly partition. T_default catches rows that fall outside every
+partition, e.g. when the partitions ahead were not created in time.
+
+ensure_partitions() creates the partitions of the coming months, moving
+any rows the default partition already caught for them.
+expired_partitions() and drop_partition() implement retention: a whole
+month is dropped in one cheap DDL statement instead of deleting its rows.
+Queries that filter on timestamp only touch the partitions of the months
+they cover.
+"""
+import re
+from datetime import datetime
+
+from django.db import connection, transaction
+
+from .models import EnergyData, SensorData
+
+PARTITIONED_MODELS = (EnergyData, SensorData)
+
+_BOUND = re.compile(r"FROM \((.+)\) TO \((.+)\)")
+
+
+def month_start(moment):
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(model, month):
+    return f"{model._meta.db_table}_p{month:%Y%m}"
+
+
+def _bound_value(text):
+    """A partition bound as a naive local datetime; None for MINVALUE/MAXVALUE."""
+    if text in ("MINVALUE", "MAXVALUE"):
+        return None
+    # Printed in the session time zone, which is TIME_ZONE
+    return datetime.fromisoformat(text.strip("'")).replace(tzinfo=None)
+
+
+def is_partitioned(model):
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [model._meta.db_table])
+        row = cursor.fetchone()
+    return row is not None and row[0] == "p"
+
+
+def partitions(model):
+    """
+    The partitions of `model`'s table, oldest first: dicts with the name,
+    the lower and upper bound (None when unbounded) and a "default" flag.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass",
+            [model._meta.db_table],
+        )
+        rows = cursor.fetchall()
+    found = []
+    for name, bound in rows:
+        match = _BOUND.search(bound)
+        if match is None:
+            found.append({"name": name, "lower": None, "upper": None, "default": True})
+        else:
+            lower, upper = map(_bound_value, match.groups())
+            found.append({"name": name, "lower": lower, "upper": upper, "default": False})
+    return sorted(found, key=lambda partition: (partition["default"], partition["lower"] or datetime.min))
+
+
+def _default_partition(model):
+    return next((partition["name"] for partition in partitions(model) if partition["default"]), None)
+
+
+def _covered(existing, lower, upper):
+    return any(
+        not partition["default"]
+        and (partition["lower"] is None or partition["lower"] < upper)
+        and (partition["upper"] is None or partition["upper"] > lower)
+        for partition in existing
+    )
+
+
+def create_partition(model, month):
+    """
+    Create and attach the partition of `month`. Rows of that month already
+    in the default partition are moved into it first, since a partition
+    cannot be attached while the default one holds rows of its range.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    name = connection.ops.quote_name(partition_name(model, month))
+    ts = connection.ops.quote_name(model._meta.get_field("timestamp").column)
+    default = _default_partition(model)
+    lower, upper = month, add_months(month, 1)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING STORAGE)")
+        if default is not None:
+            default = connection.ops.quote_name(default)
+            cursor.execute(
+                f"WITH moved AS (DELETE FROM {default} WHERE {ts} >= %s AND {ts} < %s RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved",
+                [lower, upper],
+            )
+        # Attaching creates the partition's indexes and foreign keys
+        cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", [lower, upper])
+
+
+def ensure_partitions(model, ahead, now=None, dry_run=False):
+    """
+    Make sure every month from the current one to `ahead` months later has a
+    partition. Returns the names of the partitions created.
+    """
+    month = month_start(now or datetime.now())
+    existing = partitions(model)
+    created = []
+    for _ in range(ahead + 1):
+        following = add_months(month, 1)
+        if not _covered(existing, month, following):
+            if not dry_run:
+                create_partition(model, month)
+            created.append(partition_name(model, month))
+        month = following
+    return created
+
+
+def expired_partitions(model, retention_months, now=None):
+    """Partitions holding only rows older than `retention_months` whole months."""
+    cutoff = add_months(month_start(now or datetime.now()), -retention_months)
+    return [
+        partition["name"] for partition in partitions(model)
+        if not partition["default"] and partition["upper"] is not None and partition["upper"] <= cutoff
+    ]
+
+
+def drop_partition(name):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE {connection.ops.quote_name(name)}")
+
+
+def default_rows(model):
+    """Rows in the default partition; more than 0 means partitions are missing."""
+    default = _default_partition(model)
+    if default is None:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(default)}")
+        return cursor.fetchone()[0]
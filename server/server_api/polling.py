@@ -0,0 +1,112 @@
+# server_api/polling.py
+"""
+Fixed-rate scheduling for the polling commands.
+
+A poller that does `while True: poll(); time.sleep(10)` really runs every
+10 s plus however long the poll took, so its samples drift. Here rounds
+start on a fixed grid aligned to the wall clock (:00, :10, :20, ... for a
+10 s interval), whatever a round costs. A round that overruns skips the
+grid ticks it ran into rather than firing late, and the skipped ticks are
+counted. Each round has a deadline, and whatever has not finished by then is
+cancelled, so one slow device cannot push the next round back.
+
+Readings are stamped with their tick, so samples are evenly spaced and
+line up with the minute buckets used by the training features.
+"""
+import asyncio
+import datetime
+import math
+import time
+import zlib
+
+
+def aligned_tick(now, interval, offset=0.0):
+    """First tick strictly after `now` (epoch seconds) on the grid offset + k * interval."""
+    return (math.floor((now - offset) / interval) + 1) * interval + offset
+
+
+def device_jitter(key, spread):
+    """Stable per-device delay in [0, spread) seconds, so a fleet is not hit all at the same instant."""
+    if spread <= 0:
+        return 0.0
+    return zlib.crc32(str(key).encode()) / 2**32 * spread
+
+
+class FixedRateSchedule:
+    """
+    Ticks every `interval` seconds on the wall-clock grid. wait() (or
+    wait_async()) sleeps until the next tick and returns it; the round that
+    follows should finish within `deadline` seconds of the tick (by default
+    the whole interval), see remaining().
+    """
+
+    def __init__(self, interval, offset=0.0, deadline=None, clock=time.time):
+        self.interval = interval
+        self.offset = offset
+        self.deadline = deadline if deadline is not None else interval
+        self._clock = clock
+        self.tick = None
+        self.ticks = 0
+        self.skipped = 0
+
+    def _advance(self):
+        """Move to the next tick and return the seconds to sleep until it."""
+        now = self._clock()
+        if self.tick is None:
+            next_tick = aligned_tick(now, self.interval, self.offset)
+        else:
+            next_tick = self.tick + self.interval
+            if next_tick <= now:
+                # The last round overran: skip the ticks that went by
+                missed = math.floor((now - next_tick) / self.interval) + 1
+                self.skipped += missed
+                next_tick += missed * self.interval
+            elif next_tick - now > self.interval:
+                # The wall clock was set back; realign instead of sleeping it off
+                next_tick = aligned_tick(now, self.interval, self.offset)
+        self.tick = next_tick
+        self.ticks += 1
+        return next_tick - now
+
+    def wait(self):
+        time.sleep(self._advance())
+        return self.tick
+
+    async def wait_async(self):
+        await asyncio.sleep(self._advance())
+        return self.tick
+
+    def remaining(self):
+        """Seconds left until the current round's deadline (0 once it has passed)."""
+        return max(0.0, self.tick + self.deadline - self._clock())
+
+    @property
+    def timestamp(self):
+        """The current tick as a naive local datetime, the way readings are stored."""
+        return datetime.datetime.fromtimestamp(self.tick)
+
+    def stats(self):
+        return {"interval": self.interval, "ticks": self.ticks, "skipped": self.skipped}
+
+
+async def gather_until(awaitables, timeout):
+    """
+    Run awaitables concurrently for at most `timeout` seconds. Returns their
+    results in order; the ones still running at the deadline are cancelled
+    and come back as None. Exceptions propagate as with asyncio.gather.
+    """
+    tasks = [asyncio.ensure_future(awaitable) for awaitable in awaitables]
+    if not tasks:
+        return []
+    try:
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+    except asyncio.CancelledError:
+        # Cancelled ourselves (e.g. on shutdown): take the requests down too
+        pending = tasks
+        raise
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    return [None if task in pending else task.result() for task in tasks]
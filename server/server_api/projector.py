@@ -0,0 +1,225 @@
+# server_api/projector.py
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .deadband import deadband_filter
+from .hot_store import hot_store
+from .latest import latest_partials, merge_latest, write_latest
+from .models import AirQualityData, EnergyData, OccupancyData, RadarData, SensorData
+from .rollups import merge_partials, rollup_partials, rollups_enabled, write_rollups
+
+logger = logging.getLogger(__name__)
+
+
+def unified_from_air_quality(instance):
+    return SensorData(
+        sensor=instance.sensor,
+        timestamp=instance.timestamp,
+        device_id=instance.device,
+        quality=instance.quality,
+        co2=instance.co2,
+        temp=instance.temp,
+        humidity=instance.humidity,
+        voc=instance.voc,
+        pm2p5=instance.pm2p5,
+        pm10=instance.pm10,
+        pm1=instance.pm1,
+        pm4=instance.pm4,
+        version=instance.version
+    )
+
+
+def unified_from_energy(instance):
+    return SensorData(
+        sensor=instance.sensor,
+        timestamp=instance.timestamp,
+        device_id=str(instance.device_id),
+        a_current=instance.a_current,
+        a_voltage=instance.a_voltage,
+        a_act_power=instance.a_act_power,
+        a_aprt_power=instance.a_aprt_power,
+        a_pf=instance.a_pf,
+        a_freq=instance.a_freq,
+        b_current=instance.b_current,
+        b_voltage=instance.b_voltage,
+        b_act_power=instance.b_act_power,
+        b_aprt_power=instance.b_aprt_power,
+        b_pf=instance.b_pf,
+        b_freq=instance.b_freq,
+        c_current=instance.c_current,
+        c_voltage=instance.c_voltage,
+        c_act_power=instance.c_act_power,
+        c_aprt_power=instance.c_aprt_power,
+        c_pf=instance.c_pf,
+        c_freq=instance.c_freq,
+        total_current=instance.total_current,
+        total_act_power=instance.total_act_power,
+        total_aprt_power=instance.total_aprt_power
+    )
+
+
+def unified_from_occupancy(instance):
+    return SensorData(
+        sensor=instance.sensor,
+        timestamp=instance.timestamp,
+        mac=instance.mac,
+        frame_version=instance.frame_version,
+        serial_number=instance.serial_number,
+        entries=instance.entries,
+        exits=instance.exits,
+        total_entries=instance.total_entries,
+        total_exits=instance.total_exits
+    )
+
+
+def unified_from_radar(instance):
+    return SensorData(
+        sensor=instance.sensor,
+        timestamp=instance.timestamp,
+        mac=instance.mac,
+        sn=instance.sn,
+        num_targets=instance.num_targets,
+        coordinates=instance.coordinates,
+        raw_payload=instance.raw_payload
+    )
+
+
+# Source model → builder of its (unsaved) SensorData mirror
+UNIFIED_BUILDERS = {
+    AirQualityData: unified_from_air_quality,
+    EnergyData: unified_from_energy,
+    OccupancyData: unified_from_occupancy,
+    RadarData: unified_from_radar,
+}
+
+
+def build_unified(instance):
+    """Build the SensorData mirror of a saved source row, or None if it cannot be mirrored."""
+    builder = UNIFIED_BUILDERS.get(type(instance))
+    if builder is None or instance.sensor_id is None:
+        return None
+    row = builder(instance)
+    row.source = instance._meta.model_name
+    row.source_id = instance.pk
+    # bulk_create skips SensorData.save(), so fill the action here
+    row.action = row.determine_action()
+    return row
+
+
+def write_unified(rows):
+    """Insert SensorData mirrors in batches; rows already projected are skipped."""
+    if rows:
+        SensorData.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+
+
+def write_projection(rows, partials, latest=None):
+    write_unified(rows)
+    try:
+        write_rollups(partials)
+    except Exception:
+        # The rows are in; rebuild_rollups can redo the buckets later
+        logger.exception("Failed to update %d rollups", len(partials))
+    # Not swallowed here: flush() keeps the latest state for its next attempt
+    write_latest(latest)
+
+
+def write_committed_projection(rows, partials, latest):
+    """
+    write_projection for rows whose transaction already committed. A failure
+    is logged, not raised: the rows are in, and failing the request would
+    only make the sender retry a stored reading. project_sensor_data,
+    rebuild_rollups and rebuild_sensor_latest catch the projections up.
+    """
+    try:
+        write_projection(rows, partials, latest)
+    except Exception:
+        logger.exception("Failed to project %d committed SensorData rows", len(rows))
+
+
+class UnifiedProjector:
+    """
+    Collects newly saved AirQualityData/EnergyData/OccupancyData/RadarData rows
+    and writes their SensorData mirrors, SensorRollup and SensorLatest updates
+    in batches.
+    The rows also go to the hot store, and become the deadband references of
+    their devices, as soon as they are committed.
+
+    In "on_commit" mode the mirrors of each add() call are written with one
+    bulk insert right after the surrounding transaction commits. In "interval"
+    mode they are buffered and a background thread flushes the buffer every
+    SENSORDATA_FLUSH_INTERVAL seconds, or sooner once SENSORDATA_FLUSH_MAX_ROWS
+    rows are waiting. Rows lost on a crash are picked up by the
+    project_sensor_data command, and rollups by rebuild_rollups. Failures
+    never fail the ingest that committed the rows: in "on_commit" mode they
+    are logged (rebuild_sensor_latest repairs SensorLatest), in "interval"
+    mode the latest state is retried by the next flush.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._buffer = []
+        self._rollups = {}
+        self._latest = {}
+        self._thread = None
+
+    @property
+    def mode(self):
+        return getattr(settings, "SENSORDATA_PROJECTION_MODE", "on_commit")
+
+    def add(self, instances):
+        hot_store.record_on_commit(instances)
+        deadband_filter.stored_on_commit(instances)
+        rows = [row for row in map(build_unified, instances) if row is not None]
+        partials = rollup_partials(instances) if rollups_enabled() else {}
+        latest = latest_partials(instances)
+        if not rows and not partials and not latest:
+            return
+
+        if self.mode == "interval":
+            with self._lock:
+                self._buffer.extend(rows)
+                merge_partials(self._rollups, partials)
+                merge_latest(self._latest, latest)
+                full = len(self._buffer) >= getattr(settings, "SENSORDATA_FLUSH_MAX_ROWS", 500)
+            self._ensure_thread()
+            if full:
+                self._wakeup.set()
+        else:
+            transaction.on_commit(lambda: write_committed_projection(rows, partials, latest))
+
+    def flush(self):
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+            partials, self._rollups = self._rollups, {}
+            latest, self._latest = self._latest, {}
+        try:
+            write_projection(rows, partials, latest)
+        except Exception:
+            logger.exception("Failed to flush %d SensorData rows", len(rows))
+            # Retried with the next flush; a newer reading that arrived meanwhile wins
+            with self._lock:
+                self._latest = merge_latest(latest, self._latest)
+        return len(rows)
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="sensordata-projector", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        interval = getattr(settings, "SENSORDATA_FLUSH_INTERVAL", 1.0)
+        while True:
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            close_old_connections()
+            self.flush()
+
+
+projector = UnifiedProjector()
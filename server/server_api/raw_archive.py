@@ -0,0 +1,195 @@
+# server_api/raw_archive.py
+"""
+Append-only segment store for raw gateway payloads (the `data/oc` endpoint).
+
+Layout of RAW_ARCHIVE_DIR:
+
+    <start>-<pid>-<seq>.seg   records: >dII header (received_at epoch seconds,
+                              compressed length, crc32) + zlib-compressed JSON
+    <start>-<pid>-<seq>.idx   sparse index: >dQ entries (received_at, offset of
+                              the record in the .seg file), one for the first
+                              record and then every RAW_ARCHIVE_INDEX_EVERY records
+
+Each process writes its own segment and rolls over to a new one once the
+segment reaches RAW_ARCHIVE_SEGMENT_BYTES or is RAW_ARCHIVE_SEGMENT_SECONDS
+old. Records are stamped under the writer lock, so inside one segment they
+are in time order: a range read seeks through the index and stops at the
+first record past the range. A segment holds records from the start time in
+its name until RAW_ARCHIVE_SEGMENT_SECONDS later, so range reads skip
+segments outside the range without opening them. Segments of different
+processes are merged back into a single time-ordered stream.
+"""
+import bisect
+import heapq
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+RECORD_HEADER = struct.Struct(">dII")
+INDEX_ENTRY = struct.Struct(">dQ")
+
+
+def archive_dir():
+    return Path(getattr(settings, "RAW_ARCHIVE_DIR", Path(settings.BASE_DIR) / "raw_archive"))
+
+
+def _to_epoch(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
+
+class SegmentWriter:
+    """Thread-safe appender for the current process's active segment."""
+
+    def __init__(self, directory=None, max_bytes=None, max_age=None, index_every=None):
+        self.directory = Path(directory) if directory else archive_dir()
+        self.max_bytes = max_bytes or getattr(settings, "RAW_ARCHIVE_SEGMENT_BYTES", 64 * 1024 * 1024)
+        self.max_age = max_age or getattr(settings, "RAW_ARCHIVE_SEGMENT_SECONDS", 3600)
+        self.index_every = index_every or getattr(settings, "RAW_ARCHIVE_INDEX_EVERY", 64)
+        self._lock = threading.Lock()
+        self._seg = None
+        self._idx = None
+        self._pid = None
+        self._opened_at = 0.0
+        self._records = 0
+        self._seq = 0
+
+    def append(self, payload, received_at=None):
+        """
+        Append one JSON-serialisable payload; returns its received_at timestamp
+        (epoch seconds). Leave received_at unset to have it stamped under the
+        lock: a time taken before it can be older than the previous record.
+        """
+        body = zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+
+        with self._lock:
+            ts = _to_epoch(received_at) if received_at is not None else time.time()
+            record = RECORD_HEADER.pack(ts, len(body), zlib.crc32(body)) + body
+            if self._needs_roll(ts):
+                self._roll(ts)
+            offset = self._seg.tell()
+            self._seg.write(record)
+            self._seg.flush()
+            if self._records % self.index_every == 0:
+                self._idx.write(INDEX_ENTRY.pack(ts, offset))
+                self._idx.flush()
+            self._records += 1
+        return ts
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _needs_roll(self, ts):
+        # A forked worker must not keep writing its parent's segment
+        if self._seg is None or self._pid != os.getpid():
+            return True
+        return self._seg.tell() >= self.max_bytes or ts - self._opened_at >= self.max_age
+
+    def _roll(self, ts):
+        if self._pid == os.getpid():
+            self._close()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._pid = os.getpid()
+        self._seq += 1
+        stem = f"{datetime.fromtimestamp(ts):%Y%m%dT%H%M%S}-{self._pid}-{self._seq:04d}"
+        self._seg = open(self.directory / f"{stem}.seg", "ab")
+        self._idx = open(self.directory / f"{stem}.idx", "ab")
+        self._opened_at = ts
+        self._records = 0
+
+    def _close(self):
+        for handle in (self._seg, self._idx):
+            if handle is not None:
+                handle.close()
+        self._seg = self._idx = None
+
+
+def list_segments(directory=None):
+    return sorted((Path(directory) if directory else archive_dir()).glob("*.seg"))
+
+
+def segment_bounds(segment_path, max_age=None):
+    """
+    (earliest, latest) received_at (epoch seconds) a segment can hold, from
+    the start time in its name and the rollover age.
+    """
+    max_age = max_age or getattr(settings, "RAW_ARCHIVE_SEGMENT_SECONDS", 3600)
+    opened = datetime.strptime(Path(segment_path).name.split("-", 1)[0], "%Y%m%dT%H%M%S")
+    # Names are local time to the second: allow for both readings of an hour
+    # repeated when the clocks go back, and for the truncated fraction
+    return opened.timestamp(), opened.replace(fold=1).timestamp() + 1 + max_age
+
+
+def read_index(segment_path):
+    try:
+        data = Path(segment_path).with_suffix(".idx").read_bytes()
+    except FileNotFoundError:
+        return []
+    usable = len(data) - len(data) % INDEX_ENTRY.size
+    return [INDEX_ENTRY.unpack_from(data, pos) for pos in range(0, usable, INDEX_ENTRY.size)]
+
+
+def iter_segment(segment_path, start=None, end=None):
+    """Yield (received_at epoch, payload) from one segment, limited to [start, end]."""
+    index = read_index(segment_path)
+    if index and end is not None and index[0][0] > end:
+        return
+
+    offset = 0
+    if index and start is not None:
+        # Last indexed record at or before `start`
+        pos = bisect.bisect_right([ts for ts, _ in index], start) - 1
+        if pos >= 0:
+            offset = index[pos][1]
+
+    with open(segment_path, "rb") as seg:
+        seg.seek(offset)
+        while True:
+            header = seg.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            ts, length, crc = RECORD_HEADER.unpack(header)
+            body = seg.read(length)
+            if len(body) < length or zlib.crc32(body) != crc:
+                # Torn tail of a segment that is still being written (or crashed mid-write)
+                logger.warning("Stopping at incomplete record in %s @ %d", segment_path, seg.tell())
+                return
+            if end is not None and ts > end:
+                return
+            if start is not None and ts < start:
+                continue
+            yield ts, json.loads(zlib.decompress(body))
+
+
+def iter_range(start=None, end=None, directory=None):
+    """
+    Stream archived payloads received in [start, end] (datetimes or epoch
+    seconds, either may be None) as (received_at datetime, payload), in time
+    order across all segments.
+    """
+    start, end = _to_epoch(start), _to_epoch(end)
+    streams = []
+    for path in list_segments(directory):
+        earliest, latest = segment_bounds(path)
+        if (end is not None and earliest > end) or (start is not None and latest < start):
+            continue
+        streams.append(iter_segment(path, start, end))
+    for ts, payload in heapq.merge(*streams, key=lambda record: record[0]):
+        yield datetime.fromtimestamp(ts), payload
+
+
+raw_archive = SegmentWriter()
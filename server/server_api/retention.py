@@ -0,0 +1,111 @@
+# server_api/retention.py
+"""
+Downsample-and-purge retention for raw readings.
+
+AirQualityData, EnergyData, OccupancyData and RadarData rows older than
+RAW_RETENTION_DAYS are purged an hour at a time, RAW_PURGE_CHUNK_SIZE rows
+per short committed transaction, so no lock is held for long. Their
+SensorData mirrors follow in chunks of the same size.
+
+A RetentionCheckpoint per table records the hour before which raw rows
+were purged. Each hour first has its 1h buckets reset and the checkpoint
+moved past it, in one transaction: with ROLLUPS_ENABLED the buckets are
+rebuilt from the hour's raw rows and the chunks are then only deleted, as
+ingest merges anything arriving later; otherwise the buckets are emptied
+and each chunk is deleted and its summary merged in by one statement, so
+exactly the rows deleted are summarised. A run stopped partway through an
+hour resumes with the remaining chunks. Rows stamped before the checkpoint
+that arrive later (late uploads, replays) are picked up the same way by
+the next run.
+
+rollups.raw_horizon() reads the checkpoint: it is where a table's raw rows
+now start. The history views report it, since older ranges are only
+available from the hourly rollups, and rebuild_rollups() leaves the buckets
+before it alone.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+
+from .models import RetentionCheckpoint, SensorData, SensorRollup
+from .rollups import ROLLUP_CHANNELS, bucket_start, rebuild_rollups, rollups_enabled, summarise_and_delete
+
+PURGED_MODELS = tuple(ROLLUP_CHANNELS)
+
+HOUR = timedelta(hours=1)
+
+
+def delete_in_chunks(queryset, chunk_size):
+    """Delete the rows of `queryset`, `chunk_size` per committed transaction. Returns the number deleted."""
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.values_list("pk", flat=True)[:chunk_size])
+            if not ids:
+                return deleted
+            queryset.filter(pk__in=ids).delete()
+        deleted += len(ids)
+
+
+def purge_hour(model, hour, checkpoint, chunk_size):
+    """
+    Summarise and delete the raw rows of `model` in the hour starting at
+    `hour`, `chunk_size` rows per committed transaction. Returns the number
+    deleted.
+    """
+    if checkpoint.purged_before is None or hour >= checkpoint.purged_before:
+        with transaction.atomic():
+            if rollups_enabled():
+                # Start the hour's buckets from exactly the rows stored now;
+                # ingest merges in whatever arrives from here on
+                rebuild_rollups(model, hour, hour, grains=["1h"])
+            else:
+                # Rebuilt below from the summaries of the deleted chunks
+                SensorRollup.objects.filter(channel__in=ROLLUP_CHANNELS[model], grain="1h", bucket=hour).delete()
+            # Moved before the rows go, so a run stopped halfway through the
+            # hour resumes with the chunks instead of resetting the buckets
+            checkpoint.purged_before = hour + HOUR
+            checkpoint.save(update_fields=["purged_before", "updated_at"])
+
+    rows = model.objects.filter(timestamp__gte=hour, timestamp__lt=hour + HOUR)
+    if rollups_enabled():
+        # Already in the rollups: rebuilt above, or merged by ingest when they arrived
+        return delete_in_chunks(rows, chunk_size)
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(rows.order_by("pk").values_list("pk", flat=True)[:chunk_size])
+            if not ids:
+                return deleted
+            deleted += summarise_and_delete(model, hour, ids)
+
+
+def downsample_and_purge(model, cutoff, chunk_size, window=timedelta(days=1)):
+    """
+    Summarise and purge the raw rows of `model` older than `cutoff`, oldest
+    first, a window at a time. Yields the window bounds and the number of
+    rows and mirrors deleted per window.
+    """
+    name = model._meta.model_name
+    cutoff = bucket_start(cutoff, "1h")
+    checkpoint, _ = RetentionCheckpoint.objects.get_or_create(source=name)
+    start = None
+    while True:
+        # Skip straight over stretches with no raw rows
+        rows = model.objects.filter(timestamp__lt=cutoff)
+        if start is not None:
+            rows = rows.filter(timestamp__gte=start)
+        oldest = rows.order_by("timestamp").values_list("timestamp", flat=True).first()
+        if oldest is None:
+            return
+        start = bucket_start(oldest, "1h")
+        end = min(start + window, cutoff)
+
+        rows = 0
+        for hours in range(int((end - start) / HOUR)):
+            rows += purge_hour(model, start + hours * HOUR, checkpoint, chunk_size)
+        mirrors = delete_in_chunks(
+            SensorData.objects.filter(source=name, timestamp__gte=start, timestamp__lt=end), chunk_size
+        )
+        yield {"start": start, "end": end, "rows": rows, "mirrors": mirrors}
+        start = end
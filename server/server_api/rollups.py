@@ -0,0 +1,227 @@
+# server_api/rollups.py
+"""
+Time-bucketed rollups (SensorRollup) of the key channels of each sensor.
+
+Every batch of new readings that reaches the SensorData projector is also
+summarised per (sensor, channel, grain, bucket) in Python, and the partial
+summaries are merged into SensorRollup with one INSERT ... ON CONFLICT DO
+UPDATE per batch. Counts and sums add up, min/max widen, and the last
+value is the one with the latest timestamp. History views can then read a
+few thousand rollup rows instead of the raw tables. rebuild_rollups()
+recomputes buckets from the raw rows, for backfills and after raw rows were
+replayed; it never touches buckets before the raw horizon, whose raw rows
+were purged. summarise_and_delete() purges raw rows into their 1h rollups.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import AirQualityData, EnergyData, OccupancyData, RadarData, RetentionCheckpoint, SensorRollup
+
+logger = logging.getLogger(__name__)
+
+# Grain -> bucket length in seconds (all divide an hour)
+GRAINS = {"1m": 60, "15m": 900, "1h": 3600}
+
+# Source model -> channels rolled up (each a field of that model)
+ROLLUP_CHANNELS = {
+    AirQualityData: ("co2", "temp", "pm2p5"),
+    EnergyData: ("total_act_power",),
+    OccupancyData: ("total_entries", "total_exits"),
+    RadarData: ("num_targets",),
+}
+
+
+def rollups_enabled():
+    return getattr(settings, "ROLLUPS_ENABLED", True)
+
+
+def bucket_start(timestamp, grain):
+    """Start of the `grain` bucket containing `timestamp`."""
+    seconds = GRAINS[grain]
+    offset = (timestamp.minute * 60 + timestamp.second) % seconds
+    return timestamp.replace(microsecond=0) - timedelta(seconds=offset)
+
+
+def rollup_partials(instances):
+    """
+    Summarise saved readings into {(sensor_id, channel, grain, bucket):
+    [count, sum, min, max, last, last_at]}. Readings without a sensor, and
+    empty channels, are left out.
+    """
+    partials = {}
+    for instance in instances:
+        channels = ROLLUP_CHANNELS.get(type(instance))
+        if channels is None or instance.sensor_id is None or instance.timestamp is None:
+            continue
+        timestamp = instance.timestamp
+        buckets = [(grain, bucket_start(timestamp, grain)) for grain in GRAINS]
+        for channel in channels:
+            value = getattr(instance, channel)
+            if value is None:
+                continue
+            value = float(value)
+            for grain, bucket in buckets:
+                key = (instance.sensor_id, channel, grain, bucket)
+                partial = partials.get(key)
+                if partial is None:
+                    partials[key] = [1, value, value, value, value, timestamp]
+                    continue
+                partial[0] += 1
+                partial[1] += value
+                partial[2] = min(partial[2], value)
+                partial[3] = max(partial[3], value)
+                if timestamp >= partial[5]:
+                    partial[4] = value
+                    partial[5] = timestamp
+    return partials
+
+
+def merge_partials(into, partials):
+    """Fold `partials` into `into` (both as returned by rollup_partials)."""
+    for key, (count, total, minimum, maximum, last, last_at) in partials.items():
+        partial = into.get(key)
+        if partial is None:
+            into[key] = [count, total, minimum, maximum, last, last_at]
+            continue
+        partial[0] += count
+        partial[1] += total
+        partial[2] = min(partial[2], minimum)
+        partial[3] = max(partial[3], maximum)
+        if last_at >= partial[5]:
+            partial[4] = last
+            partial[5] = last_at
+    return into
+
+
+def _merge_sql():
+    table = connection.ops.quote_name(SensorRollup._meta.db_table)
+    return (
+        f"ON CONFLICT (sensor_id, channel, grain, bucket) DO UPDATE SET "
+        f"count = {table}.count + EXCLUDED.count, "
+        f"sum_value = {table}.sum_value + EXCLUDED.sum_value, "
+        f"min_value = LEAST({table}.min_value, EXCLUDED.min_value), "
+        f"max_value = GREATEST({table}.max_value, EXCLUDED.max_value), "
+        f"last_value = CASE WHEN EXCLUDED.last_at >= {table}.last_at "
+        f"THEN EXCLUDED.last_value ELSE {table}.last_value END, "
+        f"last_at = GREATEST({table}.last_at, EXCLUDED.last_at)"
+    )
+
+
+def write_rollups(partials, batch_size=500):
+    """Merge partial summaries into SensorRollup."""
+    if not partials:
+        return
+    table = connection.ops.quote_name(SensorRollup._meta.db_table)
+    columns = "(sensor_id, channel, grain, bucket, count, sum_value, min_value, max_value, last_value, last_at)"
+    # A fixed key order keeps concurrent writers from deadlocking on each other's rows
+    rows = [(*key, *partials[key]) for key in sorted(partials)]
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            values = ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"] * len(batch))
+            cursor.execute(
+                f"INSERT INTO {table} {columns} VALUES {values} {_merge_sql()}",
+                [value for row in batch for value in row],
+            )
+
+
+def raw_horizon(model):
+    """Raw rows of `model` before this instant were purged (None if none were)."""
+    return (
+        RetentionCheckpoint.objects.filter(source=model._meta.model_name)
+        .values_list("purged_before", flat=True).first()
+    )
+
+
+def rebuild_rollups(model, start=None, end=None, grains=None):
+    """
+    Recompute the rollups of `model`'s channels from its raw rows, for every
+    bucket that overlaps [start, end] (everything by default). Buckets are
+    rebuilt whole, so the raw range read is widened to bucket boundaries.
+
+    Buckets before the raw horizon are left alone: their raw rows were
+    purged and the rollups are all that is left of them. The horizon is on
+    an hour boundary, so no bucket straddles it.
+
+    Returns the number of rollup rows written.
+    """
+    horizon = raw_horizon(model)
+    if horizon is not None:
+        if end is not None and end < horizon:
+            return 0
+        start = horizon if start is None else max(start, horizon)
+    channels = ROLLUP_CHANNELS[model]
+    source = connection.ops.quote_name(model._meta.db_table)
+    table = connection.ops.quote_name(SensorRollup._meta.db_table)
+    ts = connection.ops.quote_name(model._meta.get_field("timestamp").column)
+    written = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        for grain in grains or GRAINS:
+            seconds = GRAINS[grain]
+            stale = SensorRollup.objects.filter(channel__in=channels, grain=grain)
+            where = ["sensor_id IS NOT NULL"]
+            params = []
+            if start is not None:
+                first = bucket_start(start, grain)
+                stale = stale.filter(bucket__gte=first)
+                where.append(f"{ts} >= %s")
+                params.append(first)
+            if end is not None:
+                stale = stale.filter(bucket__lte=end)
+                where.append(f"{ts} < %s")
+                params.append(bucket_start(end, grain) + timedelta(seconds=seconds))
+            stale.delete()
+
+            bucket_sql = (
+                f"date_trunc('hour', {ts}) + floor(extract(epoch FROM {ts} - date_trunc('hour', {ts}))"
+                f" / {seconds}) * interval '{seconds} seconds'"
+            )
+            for channel in channels:
+                column = connection.ops.quote_name(model._meta.get_field(channel).column)
+                cursor.execute(
+                    f"INSERT INTO {table} "
+                    "(sensor_id, channel, grain, bucket, count, sum_value, min_value, max_value, last_value, last_at) "
+                    f"SELECT sensor_id, %s, %s, {bucket_sql} AS bucket, COUNT(*), SUM({column}), "
+                    f"MIN({column}), MAX({column}), (ARRAY_AGG({column} ORDER BY {ts} DESC))[1], MAX({ts}) "
+                    f"FROM {source} WHERE {' AND '.join(where)} AND {column} IS NOT NULL "
+                    f"GROUP BY sensor_id, bucket {_merge_sql()}",
+                    [channel, grain, *params],
+                )
+                written += cursor.rowcount
+    return written
+
+
+def summarise_and_delete(model, hour, ids):
+    """
+    Delete the raw rows `ids` of `model`, stamped in the hour starting at
+    `hour`, and merge the 1h rollups of exactly the deleted rows into the
+    stored buckets, in one statement. Returns the number of rows deleted.
+    """
+    source = connection.ops.quote_name(model._meta.db_table)
+    table = connection.ops.quote_name(SensorRollup._meta.db_table)
+    ts = connection.ops.quote_name(model._meta.get_field("timestamp").column)
+    pk = connection.ops.quote_name(model._meta.pk.column)
+    columns = [connection.ops.quote_name(model._meta.get_field(channel).column) for channel in ROLLUP_CHANNELS[model]]
+    summaries = " UNION ALL ".join(
+        f"SELECT sensor_id, %s, '1h', %s::timestamp, COUNT({column}), SUM({column}), MIN({column}), MAX({column}), "
+        f"(ARRAY_AGG({column} ORDER BY {ts} DESC) FILTER (WHERE {column} IS NOT NULL))[1], "
+        f"MAX({ts}) FILTER (WHERE {column} IS NOT NULL) "
+        f"FROM purged WHERE sensor_id IS NOT NULL GROUP BY sensor_id HAVING COUNT({column}) > 0"
+        for column in columns
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            # The timestamp bounds let the delete prune to the hour's partition
+            f"WITH purged AS (DELETE FROM {source} WHERE {ts} >= %s AND {ts} < %s AND {pk} = ANY(%s) "
+            f"RETURNING sensor_id, {ts}, {', '.join(columns)}), "
+            f"summarised AS (INSERT INTO {table} "
+            "(sensor_id, channel, grain, bucket, count, sum_value, min_value, max_value, last_value, last_at) "
+            f"{summaries} {_merge_sql()}) "
+            "SELECT COUNT(*) FROM purged",
+            [hour, hour + timedelta(hours=1), list(ids),
+             *(value for channel in ROLLUP_CHANNELS[model] for value in (channel, hour))],
+        )
+        return cursor.fetchone()[0]
@@ -0,0 +1,136 @@
+# server_api/sensor_registry.py
+import threading
+import time
+
+from django.conf import settings
+
+from .models import Sensor
+
+
+class SensorRegistry:
+    """
+    Process-wide cache of Sensor rows keyed by sensor_id (and by pk).
+
+    Every ingest path and poller resolves sensors through it, so a warm
+    reading runs no Sensor query at all. Entries are dropped when a sensor is
+    saved or deleted in this process (see signals.py) and expire after
+    SENSOR_REGISTRY_TTL seconds, which bounds how long another worker process
+    can keep a stale copy.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_sensor_id = {}
+        self._by_pk = {}
+
+    @property
+    def ttl(self):
+        return getattr(settings, "SENSOR_REGISTRY_TTL", 300)
+
+    def _cached(self, index, key):
+        entry = index.get(key)
+        if entry is None:
+            return None
+        sensor, expires_at = entry
+        if expires_at < time.monotonic():
+            return None
+        return sensor
+
+    def _remember(self, sensor):
+        entry = (sensor, time.monotonic() + self.ttl)
+        with self._lock:
+            self._by_sensor_id[sensor.sensor_id] = entry
+            self._by_pk[sensor.pk] = entry
+        return sensor
+
+    def get(self, sensor_id):
+        """Return the Sensor with this sensor_id, or None if it does not exist."""
+        sensor = self._cached(self._by_sensor_id, sensor_id)
+        if sensor is None:
+            sensor = Sensor.objects.filter(sensor_id=sensor_id).first()
+            if sensor is not None:
+                self._remember(sensor)
+        return sensor
+
+    def get_by_pk(self, pk):
+        """Return the Sensor with this primary key, or None if it does not exist."""
+        sensor = self._cached(self._by_pk, pk)
+        if sensor is None:
+            sensor = Sensor.objects.filter(pk=pk).first()
+            if sensor is not None:
+                self._remember(sensor)
+        return sensor
+
+    def get_or_create(self, sensor_id, sensor_type, description=None):
+        """
+        Return the Sensor with this sensor_id, creating it if needed. Creation
+        goes through Model.objects.get_or_create, which falls back to reading the
+        row when a concurrent request inserted the same sensor_id first.
+        """
+        sensor = self._cached(self._by_sensor_id, sensor_id)
+        if sensor is None:
+            sensor, _ = Sensor.objects.get_or_create(
+                sensor_id=sensor_id,
+                defaults={
+                    "sensor_type": sensor_type,
+                    "description": description or f"Auto-created {sensor_type} sensor",
+                },
+            )
+            self._remember(sensor)
+        return sensor
+
+    def get_many(self, sensor_ids, sensor_type, create=True):
+        """
+        Resolve many sensor_ids at once, auto-creating the missing ones (or,
+        with create=False, leaving them out). Cold lookups take a constant
+        number of queries; warm ones take none.
+        Returns a dict of sensor_id -> Sensor.
+        """
+        sensors = {}
+        missing = set()
+        for sensor_id in set(sensor_ids):
+            sensor = self._cached(self._by_sensor_id, sensor_id)
+            if sensor is None:
+                missing.add(sensor_id)
+            else:
+                sensors[sensor_id] = sensor
+        if not missing:
+            return sensors
+
+        found = Sensor.objects.in_bulk(missing, field_name="sensor_id")
+        to_create = missing - found.keys()
+        if to_create and create:
+            Sensor.objects.bulk_create(
+                [
+                    Sensor(
+                        sensor_id=sensor_id,
+                        sensor_type=sensor_type,
+                        description=f"Auto-created {sensor_type} sensor",
+                    )
+                    for sensor_id in to_create
+                ],
+                ignore_conflicts=True,
+            )
+            # ignore_conflicts does not hand back primary keys (and a concurrent
+            # request may have won the insert), so re-read them
+            found.update(Sensor.objects.in_bulk(to_create, field_name="sensor_id"))
+
+        for sensor in found.values():
+            self._remember(sensor)
+        sensors.update(found)
+        return sensors
+
+    def invalidate(self, sensor=None):
+        """Forget one sensor (both its old and current sensor_id), or everything."""
+        with self._lock:
+            if sensor is None:
+                self._by_sensor_id.clear()
+                self._by_pk.clear()
+                return
+            entry = self._by_pk.pop(sensor.pk, None)
+            if entry is not None:
+                self._by_sensor_id.pop(entry[0].sensor_id, None)
+            self._by_sensor_id.pop(sensor.sensor_id, None)
+
+
+sensor_registry = SensorRegistry()
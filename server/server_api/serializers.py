@@ -1,8 +1,36 @@
 from rest_framework import serializers
 from .models import (
-    AirQualityData, EnergyData, OccupancyData, RadarData, Sensor, SensorData, RawSensorData, TemperatureHumidityData, Lsg01AirQualityData,
+    AirQualityData, EnergyData, OccupancyData, RadarData, Sensor, SensorData, SensorRollup, SensorLatest, RawSensorData, TemperatureHumidityData, Lsg01AirQualityData,
     WeatherLocation, WeatherHourly, WeatherDaily, WeatherCurrent
 )
+from .sensor_registry import sensor_registry
+
+
+class CachedSensorField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField that resolves the sensor through the shared sensor
+    registry, so validating a reading for a known sensor runs no query.
+    """
+
+    def __init__(self, sensor_type=None, **kwargs):
+        self.sensor_type = sensor_type
+        if not kwargs.get("read_only"):
+            queryset = Sensor.objects.all()
+            if sensor_type:
+                queryset = queryset.filter(sensor_type=sensor_type)
+            kwargs.setdefault("queryset", queryset)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, Sensor):
+            data = data.pk
+        try:
+            sensor = sensor_registry.get_by_pk(int(data))
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if sensor is None or (self.sensor_type and sensor.sensor_type != self.sensor_type):
+            self.fail("does_not_exist", pk_value=data)
+        return sensor
 
 # class LSG01AirQualityDataSerializer(serializers.ModelSerializer):
 #     class Meta:
@@ -10,6 +38,8 @@ from .models import (
 #         fields = "__all__"
 
 class Lsg01AirQualityDataSerializer(serializers.ModelSerializer):
+    sensor = CachedSensorField()
+
     class Meta:
         model = Lsg01AirQualityData
         fields = '__all__'
@@ -23,12 +53,12 @@ class TemperatureHumidityDataSerializer(serializers.ModelSerializer):
 class SensorSerializer(serializers.ModelSerializer):
     class Meta:
         model = Sensor
-        fields = ['id', 'sensor_id', 'sensor_type', 'floor', 'office', 'description', 'active']
+        fields = ['id', 'sensor_id', 'sensor_type', 'floor', 'office', 'description', 'active', 'address']
 
 class AirQualityDataSerializer(serializers.ModelSerializer):
     sensor = SensorSerializer(read_only=True)
-    sensor_id = serializers.PrimaryKeyRelatedField(
-        queryset=Sensor.objects.filter(sensor_type='AQ'),
+    sensor_id = CachedSensorField(
+        sensor_type='AQ',
         source='sensor',
         write_only=True
     )
@@ -39,8 +69,8 @@ class AirQualityDataSerializer(serializers.ModelSerializer):
 
 class EnergyDataSerializer(serializers.ModelSerializer):
     sensor = SensorSerializer(read_only=True)
-    sensor_id = serializers.PrimaryKeyRelatedField(
-        queryset=Sensor.objects.filter(sensor_type='EM'),
+    sensor_id = CachedSensorField(
+        sensor_type='EM',
         source='sensor',
         write_only=True
     )
@@ -56,8 +86,8 @@ class RawSensorDataSerializer(serializers.ModelSerializer):
 
 class OccupancyDataSerializer(serializers.ModelSerializer):
     sensor = SensorSerializer(read_only=True)
-    sensor_id = serializers.PrimaryKeyRelatedField(
-        queryset=Sensor.objects.filter(sensor_type='OC'),
+    sensor_id = CachedSensorField(
+        sensor_type='OC',
         source='sensor',
         write_only=True
     )
@@ -68,8 +98,8 @@ class OccupancyDataSerializer(serializers.ModelSerializer):
 
 class RadarDataSerializer(serializers.ModelSerializer):
     sensor = SensorSerializer(read_only=True)
-    sensor_id = serializers.PrimaryKeyRelatedField(
-        queryset=Sensor.objects.filter(sensor_type='RD'),
+    sensor_id = CachedSensorField(
+        sensor_type='RD',
         source='sensor',
         write_only=True
     )
@@ -90,6 +120,28 @@ class SensorDataSerializer(serializers.ModelSerializer):
         model = SensorData
         fields = '__all__'
 
+class SensorRollupSerializer(serializers.ModelSerializer):
+    sensor_id = serializers.CharField(source='sensor.sensor_id', read_only=True)
+    mean = serializers.FloatField(read_only=True)
+    min = serializers.FloatField(source='min_value', read_only=True)
+    max = serializers.FloatField(source='max_value', read_only=True)
+    last = serializers.FloatField(source='last_value', read_only=True)
+
+    class Meta:
+        model = SensorRollup
+        fields = ['sensor_id', 'channel', 'grain', 'bucket', 'count', 'mean', 'min', 'max', 'last', 'last_at']
+
+
+class SensorLatestSerializer(serializers.ModelSerializer):
+    sensor_id = serializers.CharField(source='sensor.sensor_id', read_only=True)
+    sensor_type = serializers.CharField(source='sensor.sensor_type', read_only=True)
+    floor = serializers.IntegerField(source='sensor.floor', read_only=True)
+    office = serializers.CharField(source='sensor.office', read_only=True)
+
+    class Meta:
+        model = SensorLatest
+        fields = ['sensor_id', 'sensor_type', 'floor', 'office', 'source', 'timestamp', 'action', 'values']
+
 
 
 class WeatherLocationSerializer(serializers.ModelSerializer):
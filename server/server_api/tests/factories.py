@@ -0,0 +1,14 @@
+from server_api.models import EnergyData
+
+
+def energy(sensor, timestamp, power=1000.0, **fields):
+    """An unsaved EnergyData reading of `power` W, split evenly over the three phases."""
+    values = dict(
+        sensor=sensor, device_id=0, timestamp=timestamp,
+        a_current=1, a_voltage=230, a_act_power=power / 3, a_aprt_power=power / 3, a_pf=1, a_freq=50,
+        b_current=1, b_voltage=230, b_act_power=power / 3, b_aprt_power=power / 3, b_pf=1, b_freq=50,
+        c_current=1, c_voltage=230, c_act_power=power / 3, c_aprt_power=power / 3, c_pf=1, c_freq=50,
+        total_current=3, total_act_power=power, total_aprt_power=power, action="NORMAL_EM",
+    )
+    values.update(fields)
+    return EnergyData(**values)
@@ -0,0 +1,35 @@
+from django.test import TransactionTestCase, override_settings
+
+from server_api.models import AirQualityData
+from server_api.sensor_registry import sensor_registry
+
+
+# The views run on pool threads with their own connections, outside any test transaction
+@override_settings(HOT_STORE_ENABLED=False)
+class AsyncIngestViewTests(TransactionTestCase):
+    def setUp(self):
+        sensor_registry.invalidate()
+
+    async def test_push_is_stored(self):
+        response = await self.async_client.post(
+            "/api/async/data/aq/push",
+            {"msg": {"device_id": "aq-1", "timestamp": 1748779200, "co2": 700}},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(await AirQualityData.objects.filter(co2=700).acount(), 1)
+
+    async def test_malformed_json_is_a_bad_request(self):
+        response = await self.async_client.post(
+            "/api/async/data/aq/push", "{not json", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("JSON parse error", response.json()["detail"])
+
+    async def test_unsupported_media_type_is_reported(self):
+        response = await self.async_client.post("/api/async/data/aq/push", "co2=1", content_type="text/csv")
+        self.assertEqual(response.status_code, 415)
+
+    async def test_get_is_not_allowed(self):
+        response = await self.async_client.get("/api/async/data/aq/push")
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,59 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from server_api.models import AirQualityData, SensorData
+from server_api.sensor_registry import sensor_registry
+
+
+def push_message(device_id, co2):
+    return {"msg": {
+        "device_id": device_id, "timestamp": 1748779200, "co2": co2, "temperature": 21, "humidity": 40,
+        "tvoc_index": 1, "pm_2p5": 3.0, "pm_10": 4.0, "pm_1": 1.0, "pm_4": 2.0,
+    }}
+
+
+@override_settings(HOT_STORE_ENABLED=False)
+class AirQualityBatchPushTests(TestCase):
+    def setUp(self):
+        # Sensors cached by earlier tests were rolled back with them
+        sensor_registry.invalidate()
+        self.client = APIClient()
+
+    def test_array_is_stored_in_one_batch(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/data/aq/push", [push_message("aq-1", 500), push_message("aq-2", 900)], format="json"
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(
+            sorted(AirQualityData.objects.values_list("sensor__sensor_id", "co2")), [("aq-1", 500), ("aq-2", 900)]
+        )
+        self.assertEqual(SensorData.objects.filter(source="airqualitydata").count(), 2)
+
+    def test_bad_items_are_reported_per_item(self):
+        response = self.client.post(
+            "/api/data/aq/push", [push_message("aq-1", 500), {"msg": {"co2": 1}}, push_message("aq-1", "high")],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result["status"] for result in response.data["results"]], ["created", "failed", "failed"])
+        self.assertEqual(AirQualityData.objects.count(), 1)
+
+    def test_malformed_items_fail_alone(self):
+        out_of_range = push_message("aq-1", 500)
+        out_of_range["msg"]["timestamp"] = 10 ** 20
+        response = self.client.post(
+            "/api/data/aq/push",
+            [push_message("aq-1", 500), {"msg": "co2=1"}, 7, push_message(["aq-1"], 500), out_of_range],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 207)
+        statuses = [result["status"] for result in response.data["results"]]
+        self.assertEqual(statuses, ["created", "failed", "failed", "failed", "failed"])
+        self.assertEqual(AirQualityData.objects.count(), 1)
+
+    def test_single_message_still_accepted(self):
+        response = self.client.post("/api/data/aq/push", push_message("aq-1", 500), format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(AirQualityData.objects.get().co2, 500)
@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+
+from server_api.collectors import Collector, CollectorHealth, CollectorSupervisor
+
+
+class FlakyCollector(Collector):
+    name = "flaky"
+
+    def __init__(self, crashes):
+        super().__init__(interval=10)
+        self.crashes = crashes
+        self.starts = 0
+
+    async def run(self, session):
+        self.starts += 1
+        if self.starts <= self.crashes:
+            raise RuntimeError(f"crash {self.starts}")
+        self.health.succeeded("done")
+
+
+class CollectorSupervisorTests(SimpleTestCase):
+    def test_crashed_collector_is_restarted(self):
+        collector = FlakyCollector(crashes=2)
+        supervisor = CollectorSupervisor([collector], backoff_initial=0.01, backoff_max=1)
+        with self.assertLogs("server_api.collectors", "ERROR"):
+            asyncio.run(supervisor.run())
+        self.assertEqual(collector.starts, 3)
+        health = supervisor.health()["collectors"]["flaky"]
+        self.assertEqual((health["state"], health["restarts"], health["rounds"]), ("stopped", 2, 1))
+        self.assertEqual(health["last_error"], "RuntimeError: crash 2")
+
+    def test_health(self):
+        health = CollectorHealth(interval=10)
+        self.assertFalse(health.healthy)
+        health.running()
+        self.assertTrue(health.healthy)
+        health.failed("timeout")
+        self.assertEqual(health.as_dict()["consecutive_failures"], 1)
+        # No success for three intervals
+        health.started_at = time.time() - 31
+        self.assertFalse(health.healthy)
+        health.succeeded()
+        self.assertTrue(health.healthy)
+
+    def test_unknown_collector(self):
+        with self.assertRaisesMessage(CommandError, "Unknown collectors: nope"):
+            call_command("run_collectors", "nope")
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from server_api.deadband import DeadbandFilter, deadband_filter
+from server_api.models import EnergyData, Sensor
+from server_api.projector import UnifiedProjector
+from server_api.sensor_registry import sensor_registry
+from server_api.tests.factories import energy
+
+START = datetime(2025, 6, 2, 9, 0)
+
+
+def at(seconds):
+    return START + timedelta(seconds=seconds)
+
+
+class DeadbandFilterTests(TestCase):
+    def setUp(self):
+        self.filter = DeadbandFilter(enabled=True, heartbeat=300)
+
+    def test_unchanged_reading_suppressed_once_stored(self):
+        first = energy(None, at(0))
+        self.assertTrue(self.filter.keep(first))
+        self.filter.stored([first])
+        self.assertFalse(self.filter.keep(energy(None, at(10), power=1010)))
+        self.assertTrue(self.filter.keep(energy(None, at(20), power=1100)))
+        self.assertTrue(self.filter.keep(energy(None, at(300))))
+        self.assertEqual(self.filter.stats()["suppressed"], {"energydata": 1})
+
+    def test_reading_not_stored_does_not_suppress(self):
+        # keep() said yes, but the write failed: the next reading is compared with nothing
+        self.assertTrue(self.filter.keep(energy(None, at(0))))
+        self.assertTrue(self.filter.keep(energy(None, at(10))))
+
+    def test_older_reading_does_not_replace_reference(self):
+        newer, older = energy(None, at(60)), energy(None, at(0), power=2000)
+        self.filter.stored([newer, older])
+        self.assertFalse(self.filter.keep(energy(None, at(70))))
+
+
+@override_settings(HOT_STORE_ENABLED=False, POLL_COMPRESSION_ENABLED=True)
+class DeadbandCommitTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sensor = Sensor.objects.create(sensor_id="em-deadband", sensor_type="EM")
+
+    def setUp(self):
+        deadband_filter.clear()
+        self.addCleanup(deadband_filter.clear)
+
+    def write(self, records):
+        EnergyData.objects.bulk_create(records)
+        UnifiedProjector().add(records)
+
+    def test_reference_set_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.write(deadband_filter.filter([energy(self.sensor, at(0))]))
+        self.assertEqual(deadband_filter.filter([energy(self.sensor, at(10))]), [])
+
+    def test_rolled_back_write_leaves_no_reference(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.write(deadband_filter.filter([energy(self.sensor, at(0))]))
+                    raise RuntimeError("write failed")
+            except RuntimeError:
+                pass
+        self.assertEqual(len(deadband_filter.filter([energy(self.sensor, at(10))])), 1)
+
+
+@override_settings(HOT_STORE_ENABLED=False)
+class StepHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sensor = Sensor.objects.create(sensor_id="em-step", sensor_type="EM")
+        EnergyData.objects.bulk_create([energy(cls.sensor, at(0)), energy(cls.sensor, at(120), power=3000)])
+
+    def setUp(self):
+        sensor_registry.invalidate()
+
+    def get(self, **params):
+        return self.client.get("/api/data/em/history", {"sensor": "em-step", "step": 60, **params})
+
+    def test_naive_range(self):
+        response = self.get(start="2025-06-02T09:00:00", end="2025-06-02T09:03:00")
+        self.assertEqual(response.status_code, 200)
+        series = response.json()["series"]
+        self.assertEqual([sample["total_act_power"] for sample in series], [1000.0, 1000.0, 3000.0, 3000.0])
+
+    def test_aware_range_converted_to_local_time(self):
+        # 08:00 UTC is 09:00 in London summer time
+        response = self.get(start="2025-06-02T08:00:00Z", end="2025-06-02T08:03:00+00:00")
+        self.assertEqual(response.status_code, 200)
+        series = response.json()["series"]
+        self.assertEqual(series[0]["timestamp"], "2025-06-02T09:00:00")
+        self.assertEqual(series[2]["total_act_power"], 3000.0)
+
+    def test_aware_start_with_default_end(self):
+        response = self.get(start=(datetime.now() - timedelta(hours=1)).isoformat() + "+00:00")
+        self.assertEqual(response.status_code, 200)
+
+    def test_invalid_range(self):
+        self.assertEqual(self.get(start="yesterday").status_code, 400)
+
+    def test_invalid_step(self):
+        for step in ("abc", "inf", "1e20", "0"):
+            self.assertEqual(self.get(step=step).status_code, 400, step)
+
+    def test_step_and_resolution_rejected_together(self):
+        self.assertEqual(self.get(resolution="1h").status_code, 400)
+        response = self.client.get("/api/data/co2/history", {"sensor": "em-step", "step": 60, "resolution": "1h"})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,162 @@
+import base64
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+
+from server_api import decoders
+from server_api.decoders import (
+    DECODERS, MINEW_BATCH_MIN_FRAMES, FrameDecoder, Lsg01Decoder, decode, decode_batch, decode_minew_batch,
+    decode_minew_hex, register_decoder,
+)
+from server_api.utils import parse_minew_data, parse_mst01_ht_payload
+
+CORPORA = Path(decoders.__file__).parent / "corpora"
+
+
+def corpus(name):
+    with open(CORPORA / name) as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def subset(decoded, expected):
+    return {key: decoded.get(key) for key in expected}
+
+
+class MinewBatchDecoderTests(SimpleTestCase):
+    def setUp(self):
+        self.records = corpus("minew_v3.jsonl")
+        self.assertGreaterEqual(len(self.records), MINEW_BATCH_MIN_FRAMES)
+
+    def test_corpus_round_trip(self):
+        raws = [record["raw"] for record in self.records]
+        for raw, scalar, batch in zip(raws, map(decode_minew_hex, raws), decode_minew_batch(raws)):
+            self.assertEqual(batch, scalar, raw)
+        for record, decoded in zip(self.records, decode_minew_batch(raws)):
+            self.assertEqual(subset(decoded, record["expected"]), record["expected"])
+
+    def test_malformed_frames_match_the_scalar_decoder(self):
+        good = self.records[0]["raw"]
+        raws = [good, good[:30], good.upper(), good[:-2] + "zz", "", good[:14] + "cb" + good[16:]]
+        self.assertEqual(list(decode_minew_batch(raws)), [decode_minew_hex(raw) for raw in raws])
+
+    def test_small_batches_take_the_scalar_path(self):
+        raws = [record["raw"] for record in self.records]
+        with mock.patch.object(decoders, "decode_minew_batch", wraps=decode_minew_batch) as vectorized:
+            small = decode_batch("minew_v3", raws[:MINEW_BATCH_MIN_FRAMES - 1])
+            vectorized.assert_not_called()
+            large = decode_batch("minew_v3", raws[:MINEW_BATCH_MIN_FRAMES])
+            vectorized.assert_called_once()
+        self.assertEqual(small, [decode("minew_v3", raw) for raw in raws[:MINEW_BATCH_MIN_FRAMES - 1]])
+        self.assertEqual(large[:len(small)], small)
+
+
+class StructDecoderTests(SimpleTestCase):
+    def test_mst01_corpus_round_trip(self):
+        for record in corpus("mst01_ht.jsonl"):
+            self.assertEqual(parse_mst01_ht_payload(record["raw"]), record["expected"], record["raw"])
+
+    def test_mst01_errors(self):
+        self.assertEqual(parse_mst01_ht_payload(base64.b64encode(b"\x00" * 8)), {"error": "Frame too short"})
+        self.assertEqual(parse_mst01_ht_payload(base64.b64encode(b"\x00" * 32)), {"error": "Not an HT frame"})
+        self.assertIn("error", parse_mst01_ht_payload("not base64!"))
+
+    def test_minew_device_information_frame(self):
+        raw = "0201061bff3906ca00" + "ac233f000102" + "64" + "0203" + "0011223344556677" + "ff" + "abcd" + "ef01"
+        self.assertEqual(parse_minew_data(raw), {
+            "frame_version": "00", "mac": "ac:23:3f:00:01:02", "battery": 100, "firmware_version": "515",
+            "peripheral_support": "0011223344556677", "salt": "abcd", "digital_signature": "ef01",
+        })
+
+    def test_minew_truncated_frame_keeps_complete_fields(self):
+        decoded = parse_minew_data("0201061bff3906ca1800d801")
+        self.assertEqual(subset(decoded, {"frame_version": 0, "usage": 0, "serial_number": 0}), {
+            "frame_version": "18", "usage": "00", "serial_number": 216,
+        })
+        self.assertNotIn("entries", decoded)
+
+    def test_minew_rejects_foreign_frames(self):
+        self.assertIn("error", parse_minew_data("0201061bff4c00ca1800d80100"))
+        self.assertEqual(parse_minew_data("0201061bff3906ca18 0d8"), {"error": "Invalid hex"})
+
+
+class Lsg01DecoderTests(SimpleTestCase):
+    def test_corpus_round_trip(self):
+        # The corpus includes truncated and malformed uplinks, which are logged
+        with self.assertLogs("server_api.decoders", "WARNING"):
+            for record in corpus("lsg01.jsonl"):
+                self.assertEqual(decode("lsg01", record["raw"]), record["expected"], record["raw"])
+
+    def test_plan_matches_the_walker(self):
+        decoder = Lsg01Decoder()
+        first, second = (base64.b64decode(record["raw"]) for record in corpus("lsg01.jsonl")[:2])
+        decoder.decode(first)
+        with mock.patch.object(decoder, "walk", wraps=decoder.walk) as walk:
+            self.assertEqual(decoder.decode(second), Lsg01Decoder().walk(second)[0])
+            walk.assert_not_called()
+
+    def test_layout_change_falls_back_to_the_walker(self):
+        decoder = Lsg01Decoder()
+        decoder.decode(bytes([0x00, 0x49, 0x01, 0xF4, 0x12, 0x02, 0x58]))
+        # Same length, tags in another order
+        self.assertEqual(
+            decoder.decode(bytes([0x00, 0x12, 0x02, 0x58, 0x49, 0x01, 0xF4])), {"humidity": 60.0, "co2": 500}
+        )
+
+    def test_unknown_tag_and_truncated_field(self):
+        decoder = Lsg01Decoder()
+        with self.assertLogs("server_api.decoders", "WARNING"):
+            self.assertEqual(decoder.decode(bytes([0x00, 0x49, 0x01, 0xF4, 0x77, 0x00])), {"co2": 500})
+            self.assertEqual(decoder.decode(bytes([0x00, 0x49, 0x01, 0xF4, 0x10, 0xFF])), {"co2": 500})
+        self.assertEqual(decoder._plans, {})
+        self.assertEqual(decoder.decode(bytes([0x00, 0x10, 0xFF, 0x38])), {"temperature": -2.0})
+
+
+class DecoderRegistryTests(SimpleTestCase):
+    def test_registered_families(self):
+        self.assertEqual(set(DECODERS), {"minew_v3", "mst01_ht", "lsg01"})
+        with self.assertRaisesMessage(KeyError, "No decoder registered for device family 'nope'"):
+            decode("nope", "00")
+
+    def test_new_family_is_one_subclass(self):
+        class UpperDecoder(FrameDecoder):
+            family = "upper"
+
+            def decode(self, raw):
+                return {"value": raw.upper()}
+
+        self.addCleanup(DECODERS.pop, "upper")
+        register_decoder(UpperDecoder())
+        self.assertEqual(decode_batch("upper", ["a", "b"]), [{"value": "A"}, {"value": "B"}])
+
+    def test_decoder_without_family_is_refused(self):
+        with self.assertRaises(ValueError):
+            register_decoder(FrameDecoder())
+
+
+class BenchDecodersCommandTests(SimpleTestCase):
+    def bench(self, *args):
+        out = StringIO()
+        call_command("bench_decoders", "--repeat=1", "--scale=1", *args, stdout=out)
+        return out.getvalue()
+
+    def test_every_corpus_decodes_as_expected(self):
+        output = self.bench()
+        self.assertNotIn("MISMATCHES", output)
+        for family in DECODERS:
+            self.assertIn(f"{family} (", output)
+
+    def test_unknown_family(self):
+        with self.assertRaisesMessage(CommandError, "No decoder registered for: nope"):
+            self.bench("nope")
+
+    def test_compare_fails_on_a_slower_run(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as baseline:
+            json.dump({"mst01_ht.decode": {"ns_per_frame": 0.001, "blocks_per_frame": 0}}, baseline)
+            baseline.flush()
+            with self.assertRaisesMessage(CommandError, "Slower than the saved baseline: mst01_ht.decode"):
+                self.bench("mst01_ht", f"--compare={baseline.name}")
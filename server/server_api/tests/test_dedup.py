@@ -0,0 +1,33 @@
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+from server_api.dedup import FrameDedup
+
+
+class FrameDedupTests(SimpleTestCase):
+    def setUp(self):
+        caches["default"].clear()
+
+    def test_copies_inside_the_ttl_are_duplicates(self):
+        dedup = FrameDedup(ttl=60, cache_alias="")
+        self.assertFalse(dedup.is_duplicate("frame", "gw-1", now=1000))
+        self.assertTrue(dedup.is_duplicate("frame", "gw-2", now=1030))
+        self.assertFalse(dedup.is_duplicate("frame", "gw-2", now=1100))
+
+    def test_least_recently_seen_is_evicted(self):
+        dedup = FrameDedup(ttl=60, max_entries=2, cache_alias="")
+        for key in ("a", "b", "c"):
+            dedup.is_duplicate(key, now=1000)
+        self.assertFalse(dedup.is_duplicate("a", now=1001))
+
+    def test_shared_cache_catches_copies_on_other_workers(self):
+        worker_1, worker_2 = FrameDedup(cache_alias="default"), FrameDedup(cache_alias="default")
+        self.assertFalse(worker_1.is_duplicate(("door-1", 216, "0895", "8587")))
+        self.assertTrue(worker_2.is_duplicate(("door-1", 216, "0895", "8587")))
+
+    def test_released_frames_are_kept_again(self):
+        worker_1, worker_2 = FrameDedup(cache_alias="default"), FrameDedup(cache_alias="default")
+        key = ("door-1", 216, "0895", "8587")
+        worker_1.is_duplicate(key)
+        worker_1.release([key])
+        self.assertFalse(worker_2.is_duplicate(key))
@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from django.test import TransactionTestCase, override_settings
+
+from server_api.em_poller import EM_FIELDS, EMFleetPoller
+from server_api.models import EnergyData, Sensor
+from server_api.polling import FixedRateSchedule
+
+READING = {"id": 0, **{field: 1.0 for field in EM_FIELDS}}
+
+
+async def meter(request):
+    name = request.match_info["name"]
+    if name == "broken":
+        return web.Response(status=500)
+    if name == "slow":
+        await asyncio.sleep(5)
+    if name == "partial":
+        return web.json_response({"id": 0, "a_current": 1.0})
+    return web.json_response({**READING, "total_act_power": float(len(name))})
+
+
+# load_em_sensors recycles the connection, which a test transaction would not survive
+@override_settings(HOT_STORE_ENABLED=False, POLL_COMPRESSION_ENABLED=False)
+class EMFleetPollerTests(TransactionTestCase):
+    def setUp(self):
+        # Leave out the meters seeded by migration 0012
+        Sensor.objects.filter(sensor_type="EM").delete()
+
+    async def test_round_polls_every_meter_concurrently(self):
+        app = web.Application()
+        app.router.add_get("/{name}/rpc/EM.GetStatus", meter)
+        async with TestServer(app) as server:
+            base = f"127.0.0.1:{server.port}"
+            for name in ("meter-a", "meter-bb", "broken", "slow", "partial"):
+                await Sensor.objects.acreate(sensor_id=name, sensor_type="EM", address=f"{base}/{name}")
+            await Sensor.objects.acreate(sensor_id="no-address", sensor_type="EM")
+            await Sensor.objects.acreate(sensor_id="retired", sensor_type="EM", address=f"{base}/x", active=False)
+
+            poller = EMFleetPoller(timeout=0.5, concurrency=10, jitter=0)
+            schedule = FixedRateSchedule(10, deadline=3)
+            schedule.tick = time.time()
+            async with poller.session() as session:
+                result = await poller.poll_round(session, schedule)
+
+        self.assertEqual((result["meters"], result["answered"], result["stored"]), (5, 2, 2))
+        self.assertEqual(result["failed"]["broken"], "HTTP 500")
+        self.assertEqual(result["failed"]["slow"], "timeout")
+        self.assertIn("Missing", result["failed"]["partial"])
+        # The slow meter did not hold the others up
+        self.assertLess(result["elapsed"], 2)
+        rows = [
+            (row.sensor.sensor_id, row.total_act_power, row.timestamp)
+            async for row in EnergyData.objects.select_related("sensor").order_by("total_act_power")
+        ]
+        self.assertEqual(rows, [("meter-a", 7.0, schedule.timestamp), ("meter-bb", 8.0, schedule.timestamp)])
@@ -0,0 +1,119 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from server_api.hot_store import HotStore, Ring, latest_reading, record_dtype
+from server_api.models import EnergyData, Sensor, SensorLatest
+from server_api.tests.factories import energy
+
+START = datetime(2025, 6, 2, 9, 0)
+
+
+def moment(seconds):
+    return np.datetime64(START + timedelta(seconds=seconds), "us")
+
+
+def at(seconds):
+    return START + timedelta(seconds=seconds)
+
+
+class TemporaryDirectoryMixin:
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+
+
+class RingTests(TemporaryDirectoryMixin, SimpleTestCase):
+    def ring(self, capacity=4):
+        return Ring(os.path.join(self.root, "energydata", "1.ring"), record_dtype(EnergyData), capacity)
+
+    def append(self, ring, *seconds):
+        ring.append([(moment(second), {"sensor_pk": 1, "total_act_power": float(second)}) for second in seconds])
+
+    def powers(self, readings):
+        return [float(power) for power in readings["total_act_power"]]
+
+    def test_append_keeps_time_order(self):
+        ring = self.ring()
+        self.append(ring, 20, 10)
+        # Older than the newest reading: skipped
+        self.append(ring, 15, 30)
+        self.assertEqual(self.powers(ring.last(10)), [10.0, 20.0, 30.0])
+        self.assertEqual(float(ring.newest()["total_act_power"]), 30.0)
+
+    def test_wraps_around_at_capacity(self):
+        ring = self.ring()
+        self.append(ring, 1, 2, 3, 4, 5, 6)
+        self.assertEqual(ring.written, 6)
+        self.assertEqual(self.powers(ring.last(10)), [3.0, 4.0, 5.0, 6.0])
+        self.assertEqual(self.powers(ring.last(2)), [5.0, 6.0])
+
+    def test_since(self):
+        ring = self.ring()
+        self.append(ring, 10, 20, 30)
+        self.assertEqual(self.powers(ring.since(START + timedelta(seconds=20))), [20.0, 30.0])
+        self.assertEqual(self.powers(ring.since(START + timedelta(seconds=31))), [])
+
+    def test_reopened_with_its_readings_and_capacity(self):
+        self.append(self.ring(), 10, 20)
+        ring = self.ring(capacity=100)
+        self.assertEqual(ring.capacity, 4)
+        self.assertEqual(self.powers(ring.last(10)), [10.0, 20.0])
+
+    def test_created_once_by_concurrent_openers(self):
+        first = self.ring()
+        self.append(first, 10)
+        # A worker that saw no file yet creates it again: the existing ring is kept
+        with mock.patch("server_api.hot_store.os.path.exists", return_value=False):
+            second = self.ring(capacity=100)
+        self.assertEqual(second.capacity, 4)
+        self.assertEqual(self.powers(second.last(10)), [10.0])
+        self.assertEqual(os.listdir(os.path.dirname(first.path)), ["1.ring"])
+
+    def test_empty_ring(self):
+        ring = self.ring()
+        self.assertIsNone(ring.newest())
+        self.assertEqual(len(ring.since(START)), 0)
+
+
+class HotStoreTests(TemporaryDirectoryMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sensor = Sensor.objects.create(sensor_id="em-hot", sensor_type="EM")
+        cls.other = Sensor.objects.create(sensor_id="em-hot-2", sensor_type="EM")
+
+    def setUp(self):
+        super().setUp()
+        settings = override_settings(HOT_STORE_DIR=self.root, HOT_STORE_CAPACITY=8)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.store = HotStore()
+
+    def test_record_per_sensor_and_table(self):
+        self.store.record(
+            [energy(self.sensor, at(0), 100), energy(self.other, at(10), 200), energy(self.sensor, at(20), 300)]
+        )
+        self.assertEqual(sorted(self.store.sensors(EnergyData)), sorted([self.sensor.pk, self.other.pk]))
+        latest = self.store.latest(EnergyData, self.sensor.pk)
+        self.assertEqual((latest["timestamp"], latest["total_act_power"]), (START + timedelta(seconds=20), 300.0))
+        self.assertEqual(self.store.latest(EnergyData)["sensor_pk"], self.sensor.pk)
+        window = self.store.window(EnergyData, self.sensor.pk, START + timedelta(seconds=10))
+        self.assertEqual([float(power) for power in window["total_act_power"]], [300.0])
+
+    def test_missing_values_read_back_as_none(self):
+        reading = energy(self.sensor, at(0), 100)
+        reading.total_act_power = None
+        self.store.record([reading])
+        self.assertIsNone(self.store.latest(EnergyData, self.sensor.pk)["total_act_power"])
+
+    def test_latest_reading_falls_back_to_sensor_latest(self):
+        SensorLatest.objects.create(
+            sensor=self.sensor, source="energydata", source_id=1, timestamp=START, values={"total_act_power": 150.0}
+        )
+        self.assertEqual(latest_reading(EnergyData)["total_act_power"], 150.0)
+        self.assertIsNone(latest_reading(EnergyData, since=START + timedelta(seconds=1)))
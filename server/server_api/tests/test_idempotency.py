@@ -0,0 +1,76 @@
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from server_api.idempotency import uplink_key, uplink_window
+from server_api.models import Lsg01AirQualityData, Sensor, UplinkReceipt
+from server_api.sensor_registry import sensor_registry
+
+# LSG01 uplink from the lsg01 corpus (co2 3814)
+FRM_PAYLOAD = "AAFLUg55nxHpSQ7moA51EAYDEgJC"
+
+
+def uplink(f_cnt=7, device_id="lsg-1", received_at="2025-06-01T09:00:00.123456789Z"):
+    return {
+        "end_device_ids": {"device_id": device_id},
+        "received_at": received_at,
+        "uplink_message": {"f_cnt": f_cnt, "frm_payload": FRM_PAYLOAD},
+    }
+
+
+class UplinkKeyTests(TestCase):
+    def test_key(self):
+        self.assertEqual(uplink_key(uplink()), ("lsg-1", 7, "2025-06-01T09:00:00.123456789Z"))
+        self.assertEqual(uplink_key(uplink(f_cnt="7"))[1], 7)
+
+    def test_unusable_counters_give_no_key(self):
+        for f_cnt in (None, "abc", [], {"n": 1}, -1, 2**32):
+            self.assertIsNone(uplink_key(uplink(f_cnt=f_cnt)), f_cnt)
+
+    def test_malformed_uplinks_give_no_key(self):
+        self.assertIsNone(uplink_key("uplink"))
+        self.assertIsNone(uplink_key({**uplink(), "end_device_ids": "lsg-1"}))
+        self.assertIsNone(uplink_key({**uplink(), "uplink_message": "x"}))
+        self.assertIsNone(uplink_key(uplink(device_id="x" * 101)))
+        self.assertIsNone(uplink_key(uplink(received_at="")))
+
+
+@override_settings(HOT_STORE_ENABLED=False)
+class Lsg01IdempotentPushTests(TestCase):
+    def setUp(self):
+        sensor_registry.invalidate()
+        uplink_window.clear()
+        self.addCleanup(uplink_window.clear)
+        Sensor.objects.create(sensor_id="lsg-1", sensor_type="AQ")
+        self.client = APIClient()
+
+    def post(self, data):
+        return self.client.post("/api/data/lsg01", data, format="json")
+
+    def test_retry_gets_the_stored_response(self):
+        first = self.post(uplink())
+        self.assertEqual(first.status_code, 201)
+        retry = self.post(uplink())
+        self.assertEqual((retry.status_code, retry.data), (201, first.data))
+        self.assertEqual(retry["Idempotent-Replay"], "true")
+        self.assertEqual(Lsg01AirQualityData.objects.count(), 1)
+
+    def test_batch_with_a_bad_counter_is_still_stored(self):
+        response = self.post([uplink(f_cnt="garbage"), uplink(f_cnt=8), uplink(f_cnt=8)])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([result["status"] for result in response.data["results"]], ["created", "created", "duplicate"])
+        self.assertEqual(Lsg01AirQualityData.objects.count(), 2)
+        # Only the uplink with a usable key has a receipt
+        self.assertEqual(list(UplinkReceipt.objects.values_list("f_cnt", flat=True)), [8])
+
+    def test_batch_rows_and_receipts_commit_together(self):
+        with mock.patch.object(UplinkReceipt.objects, "bulk_create", side_effect=DatabaseError("down")):
+            with self.assertRaises(DatabaseError):
+                self.post([uplink(f_cnt=8), uplink(f_cnt=9)])
+        self.assertFalse(Lsg01AirQualityData.objects.exists())
+        self.assertIsNone(uplink_window.get(uplink_key(uplink(f_cnt=8))))
+        # The gateway's retry is stored
+        self.assertEqual(self.post([uplink(f_cnt=8), uplink(f_cnt=9)]).status_code, 201)
+        self.assertEqual(Lsg01AirQualityData.objects.count(), 2)
@@ -0,0 +1,79 @@
+from datetime import datetime
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+
+from server_api.dedup import frame_dedup
+from server_api.ingest import bulk_ingest_occupancy, last_occupancy_totals
+from server_api.models import OccupancyData, Sensor
+from server_api.sensor_registry import sensor_registry
+
+# Human flow frame (serial 216) from the minew_v3 corpus
+FRAME = "0201061bff3906ca1800d80100a9076140e61a9877299b33298df208958587"
+
+
+def occupancy(sensor, timestamp, total_entries, serial_number):
+    row = OccupancyData.objects.create(
+        sensor=sensor, raw_data="", total_entries=total_entries, total_exits=0, serial_number=serial_number
+    )
+    # timestamp is auto_now_add; backdate it the way replays store it
+    OccupancyData.objects.filter(pk=row.pk).update(timestamp=timestamp)
+    return row
+
+
+class LastOccupancyTotalsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.door = Sensor.objects.create(sensor_id="oc-door", sensor_type="OC")
+        cls.lift = Sensor.objects.create(sensor_id="oc-lift", sensor_type="OC")
+        cls.idle = Sensor.objects.create(sensor_id="oc-idle", sensor_type="OC")
+        # Inserted out of order: the newest timestamp wins, not the newest row
+        occupancy(cls.door, datetime(2025, 6, 1, 9), 5, 1)
+        occupancy(cls.door, datetime(2025, 6, 1, 11), 9, 3)
+        occupancy(cls.door, datetime(2025, 6, 1, 10), 7, 2)
+        occupancy(cls.lift, datetime(2025, 6, 1, 8), 2, 40)
+
+    def test_newest_row_per_sensor(self):
+        totals = last_occupancy_totals([self.door, self.lift, self.idle])
+        self.assertEqual(totals, {
+            self.door.pk: {"entries": 9, "exits": 0, "s_no": 3},
+            self.lift.pk: {"entries": 2, "exits": 0, "s_no": 40},
+        })
+
+    def test_only_rows_before(self):
+        totals = last_occupancy_totals([self.door, self.lift], before=datetime(2025, 6, 1, 10, 30))
+        self.assertEqual(totals[self.door.pk]["s_no"], 2)
+        self.assertEqual(totals[self.lift.pk]["s_no"], 40)
+
+    def test_other_sensors_left_out(self):
+        self.assertEqual(set(last_occupancy_totals([self.lift])), {self.lift.pk})
+
+    def test_single_query(self):
+        with self.assertNumQueries(1):
+            last_occupancy_totals([self.door, self.lift, self.idle])
+
+
+@override_settings(HOT_STORE_ENABLED=False, OCCUPANCY_DEDUP_ENABLED=True, OCCUPANCY_DEDUP_CACHE=None)
+class OccupancyBatchDedupTests(TestCase):
+    def setUp(self):
+        sensor_registry.invalidate()
+        frame_dedup.clear()
+        self.addCleanup(frame_dedup.clear)
+
+    def batch(self, gateway):
+        return [{"gateway": gateway, "mac": gateway}, {"mac": "door-1", "rssi": -60, "raw": FRAME}]
+
+    def test_relayed_copy_is_dropped(self):
+        self.assertEqual(bulk_ingest_occupancy(self.batch("gw-1")), (1, [], 0))
+        self.assertEqual(bulk_ingest_occupancy(self.batch("gw-2")), (0, [], 1))
+        self.assertEqual(OccupancyData.objects.count(), 1)
+        self.assertEqual(frame_dedup.stats()["suppressed_by_gateway"], {"gw-2": 1})
+
+    def test_retry_after_a_failed_write_is_stored(self):
+        with mock.patch.object(OccupancyData.objects, "bulk_create", side_effect=DatabaseError("down")):
+            with self.assertRaises(DatabaseError):
+                bulk_ingest_occupancy(self.batch("gw-1"))
+        self.assertFalse(OccupancyData.objects.exists())
+        self.assertEqual(bulk_ingest_occupancy(self.batch("gw-1")), (1, [], 0))
+        self.assertEqual(OccupancyData.objects.get().serial_number, 216)
@@ -0,0 +1,73 @@
+from datetime import datetime
+from unittest import mock
+
+from django.test import TransactionTestCase, override_settings
+
+from server_api import ingest_queue
+from server_api.ingest_queue import IngestQueue, IngestQueues
+from server_api.models import AirQualityData, Sensor, SensorData
+from server_api.projector import projector
+
+
+def air_quality(sensor, co2=600, action=None, timestamp=datetime(2025, 6, 1, 12)):
+    return AirQualityData(
+        sensor=sensor, device="aq-1", quality="good", co2=co2, temp=21, humidity=40, voc=1,
+        pm2p5=3.0, pm10=4.0, pm1=1.0, pm4=2.0, version="1", timestamp=timestamp, action=action,
+    )
+
+
+# The writer closes its connection after a failure, so these tests cannot run inside a transaction
+@override_settings(HOT_STORE_ENABLED=False)
+@mock.patch.object(IngestQueue, "_ensure_thread")
+class IngestQueueWriteTests(TransactionTestCase):
+    def setUp(self):
+        self.sensor = Sensor.objects.create(sensor_id="aq-1", sensor_type="AQ")
+        self.queue = IngestQueue(AirQualityData, maxsize=10, flush_rows=10, flush_interval_ms=10, retry_delay_ms=0)
+
+    def test_transient_failure_is_retried(self, _):
+        insert_stamped = ingest_queue.insert_stamped
+        calls = []
+
+        def flaky(model, rows):
+            calls.append(len(rows))
+            if len(calls) == 1:
+                raise OSError("connection reset")
+            return insert_stamped(model, rows)
+
+        with mock.patch.object(ingest_queue, "insert_stamped", side_effect=flaky), \
+                self.assertLogs("server_api.ingest_queue", "WARNING"):
+            self.queue._write([air_quality(self.sensor), air_quality(self.sensor)])
+        self.assertEqual(calls, [2, 2])
+        self.assertEqual(AirQualityData.objects.count(), 2)
+        self.assertEqual(self.queue.stats()["flushed_rows"], 2)
+        self.assertEqual(self.queue.stats()["failed_rows"], 0)
+
+    def test_rejected_rows_do_not_drop_the_batch(self, _):
+        rows = [air_quality(self.sensor), air_quality(self.sensor, co2=None, action="NORMAL_AQ"), air_quality(self.sensor)]
+        with self.assertLogs("server_api.ingest_queue", "ERROR"):
+            self.queue._write(rows)
+        self.assertEqual(AirQualityData.objects.count(), 2)
+        self.assertEqual(SensorData.objects.count(), 2)
+        stats = self.queue.stats()
+        self.assertEqual((stats["flushed_rows"], stats["failed_rows"]), (2, 1))
+
+    def test_queued_rows_keep_the_time_they_were_accepted(self, _):
+        accepted = datetime(2025, 6, 1, 12, 0, 5)
+        with mock.patch("server_api.ingest_queue.timezone.now", return_value=accepted):
+            self.queue.put(air_quality(self.sensor, timestamp=None))
+        # Flushed well after it was accepted
+        with mock.patch("server_api.ingest_queue.timezone.now", return_value=accepted.replace(minute=5)):
+            self.queue.drain()
+        row = AirQualityData.objects.get()
+        self.assertEqual(row.timestamp, accepted)
+        self.assertEqual(SensorData.objects.get().timestamp, accepted)
+
+    @override_settings(SENSORDATA_PROJECTION_MODE="interval", SENSORDATA_FLUSH_INTERVAL=3600)
+    def test_exit_drain_flushes_the_projector(self, _):
+        queues = IngestQueues()
+        queues.put(air_quality(self.sensor))
+        with mock.patch.object(ingest_queue, "ingest_queues", queues), \
+                mock.patch.object(projector, "_ensure_thread"):
+            ingest_queue.drain_on_exit()
+        self.assertEqual(AirQualityData.objects.count(), 1)
+        self.assertEqual(SensorData.objects.count(), 1)
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+
+from server_api.latest import latest_partials, rebuild_latest, write_latest
+from server_api.models import EnergyData, Sensor, SensorLatest
+from server_api.projector import UnifiedProjector
+from server_api.tests.factories import energy
+
+START = datetime(2025, 6, 2, 9, 0)
+
+
+def at(seconds):
+    return START + timedelta(seconds=seconds)
+
+
+@override_settings(HOT_STORE_ENABLED=False)
+class SensorLatestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sensor = Sensor.objects.create(sensor_id="em-latest", sensor_type="EM")
+
+    def latest(self):
+        return SensorLatest.objects.get(sensor=self.sensor)
+
+    def test_newest_reading_of_a_batch(self):
+        readings = EnergyData.objects.bulk_create(
+            [energy(self.sensor, at(10), 200), energy(self.sensor, at(20), 300), energy(self.sensor, at(0), 100)]
+        )
+        write_latest(latest_partials(readings))
+        latest = self.latest()
+        self.assertEqual(
+            (latest.source, latest.source_id, latest.timestamp), ("energydata", readings[1].pk, START + timedelta(seconds=20))
+        )
+        self.assertEqual(latest.values["total_act_power"], 300.0)
+        self.assertNotIn("timestamp", latest.values)
+
+    def test_never_goes_backwards(self):
+        newer, older, same = EnergyData.objects.bulk_create(
+            [energy(self.sensor, at(20), 300), energy(self.sensor, at(10), 200), energy(self.sensor, at(20), 400)]
+        )
+        write_latest(latest_partials([newer]))
+        write_latest(latest_partials([older]))
+        self.assertEqual(self.latest().source_id, newer.pk)
+        # A reading stamped at the same time replaces it
+        write_latest(latest_partials([same]))
+        self.assertEqual(self.latest().values["total_act_power"], 400.0)
+
+    def test_rebuild_latest(self):
+        readings = EnergyData.objects.bulk_create([energy(self.sensor, at(0), 100), energy(self.sensor, at(30), 300)])
+        rebuild_latest(EnergyData)
+        latest = self.latest()
+        self.assertEqual((latest.source_id, latest.values["total_act_power"]), (readings[1].pk, 300.0))
+
+    def test_latest_failure_logged_on_commit(self):
+        readings = EnergyData.objects.bulk_create([energy(self.sensor, at(0), 100)])
+        with mock.patch("server_api.projector.write_latest", side_effect=DatabaseError("down")):
+            # The ingest already committed; it must not fail
+            with self.assertLogs("server_api.projector", "ERROR"):
+                with self.captureOnCommitCallbacks(execute=True):
+                    UnifiedProjector().add(readings)
+        self.assertFalse(SensorLatest.objects.filter(sensor=self.sensor).exists())
+        rebuild_latest(EnergyData)
+        self.assertEqual(self.latest().source_id, readings[0].pk)
+
+    @override_settings(SENSORDATA_PROJECTION_MODE="interval")
+    def test_latest_failure_retried_by_next_flush(self):
+        projector = UnifiedProjector()
+        readings = EnergyData.objects.bulk_create([energy(self.sensor, at(0), 100)])
+        with mock.patch.object(projector, "_ensure_thread"):
+            projector.add(readings)
+            with mock.patch("server_api.projector.write_latest", side_effect=DatabaseError("down")):
+                with self.assertLogs("server_api.projector", "ERROR"):
+                    projector.flush()
+            self.assertFalse(SensorLatest.objects.filter(sensor=self.sensor).exists())
+            projector.flush()
+        self.assertEqual(self.latest().source_id, readings[0].pk)
+
+
+@override_settings(HOT_STORE_ENABLED=False)
+class EnergyDataListViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sensor = Sensor.objects.create(sensor_id="em-latest", sensor_type="EM")
+
+    def test_latest_from_sensor_latest(self):
+        readings = EnergyData.objects.bulk_create([energy(self.sensor, at(0), 100), energy(self.sensor, at(30), 300)])
+        write_latest(latest_partials(readings))
+        response = self.client.get("/api/data/em")
+        self.assertEqual(response.json()["id"], readings[1].pk)
+
+    def test_falls_back_to_the_table(self):
+        # Not projected into SensorLatest
+        readings = EnergyData.objects.bulk_create([energy(self.sensor, at(0), 100), energy(self.sensor, at(30), 300)])
+        self.assertEqual(self.client.get("/api/data/em").json()["id"], readings[1].pk)
+
+    def test_no_data(self):
+        self.assertEqual(self.client.get("/api/data/em").json(), {"detail": "No Energy data available."})
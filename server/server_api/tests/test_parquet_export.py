@@ -0,0 +1,77 @@
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.test import TestCase, override_settings
+
+from server_api.models import EnergyData, RetentionCheckpoint, Sensor
+from server_api.parquet_export import day_path, export_readings, read_watermarks
+from server_api.tests.factories import energy
+
+DAY = date(2025, 6, 2)
+
+
+def at(day, hour):
+    return datetime.combine(day, datetime.min.time()) + timedelta(hours=hour)
+
+
+@override_settings(HOT_STORE_ENABLED=False)
+class ExportReadingsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sensor = Sensor.objects.create(sensor_id="em-export", sensor_type="EM")
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+
+    def export(self, until, **options):
+        return list(export_readings(self.root, "EM", until, chunk_size=2, **options))
+
+    def read_day(self, day):
+        return pq.read_table(day_path(self.root, "EM", day))
+
+    def test_days_exported_with_watermark(self):
+        EnergyData.objects.bulk_create(
+            [energy(self.sensor, at(DAY, 1)), energy(self.sensor, at(DAY, 2), 200.0), energy(self.sensor, at(DAY, 3)),
+             energy(self.sensor, at(DAY + timedelta(days=2), 1)), energy(self.sensor, at(DAY + timedelta(days=3), 1))]
+        )
+        self.assertEqual(self.export(DAY + timedelta(days=3)), [(DAY, 3), (DAY + timedelta(days=2), 1)])
+        self.assertFalse(os.path.exists(day_path(self.root, "EM", DAY + timedelta(days=1))))
+        table = self.read_day(DAY)
+        self.assertEqual(table.schema.field("timestamp").type, pa.timestamp("us"))
+        self.assertEqual(table.schema.field("total_act_power").type, pa.float64())
+        self.assertEqual(table.column("total_act_power").to_pylist(), [1000.0, 200.0, 1000.0])
+        self.assertEqual(set(table.column("sensor_id").to_pylist()), {"em-export"})
+        self.assertNotIn("raw_data", table.schema.names)
+        # Row groups of at most chunk_size rows
+        self.assertEqual(pq.ParquetFile(day_path(self.root, "EM", DAY)).metadata.num_row_groups, 2)
+        self.assertEqual(read_watermarks(self.root), {"EM": DAY + timedelta(days=3)})
+
+    def test_late_rows_reexported_within_trailing_days(self):
+        EnergyData.objects.bulk_create(
+            [energy(self.sensor, at(DAY, 1)), energy(self.sensor, at(DAY + timedelta(days=2), 1))]
+        )
+        self.export(DAY + timedelta(days=3))
+        # Late arrivals: one a day before the watermark, one well before it
+        EnergyData.objects.bulk_create(
+            [energy(self.sensor, at(DAY + timedelta(days=2), 5)), energy(self.sensor, at(DAY, 5))]
+        )
+        self.assertEqual(self.export(DAY + timedelta(days=3), trailing_days=2), [(DAY + timedelta(days=2), 2)])
+        self.assertEqual(self.read_day(DAY).num_rows, 1)
+        self.assertEqual(read_watermarks(self.root), {"EM": DAY + timedelta(days=3)})
+        self.assertEqual(self.export(DAY + timedelta(days=3), since=DAY), [(DAY, 2), (DAY + timedelta(days=2), 2)])
+
+    def test_partly_purged_days_not_reexported(self):
+        EnergyData.objects.bulk_create([energy(self.sensor, at(DAY, 1)), energy(self.sensor, at(DAY, 20))])
+        self.export(DAY + timedelta(days=1))
+        # Retention purged the morning of the exported day
+        EnergyData.objects.filter(sensor=self.sensor, timestamp__hour__lt=12).delete()
+        RetentionCheckpoint.objects.create(
+            source="energydata", purged_before=datetime.combine(DAY, datetime.min.time()) + timedelta(hours=12)
+        )
+        self.assertEqual(self.export(DAY + timedelta(days=1), trailing_days=2), [])
+        self.assertEqual(self.read_day(DAY).num_rows, 2)
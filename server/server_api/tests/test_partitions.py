@@ -0,0 +1,83 @@
+from datetime import datetime
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from server_api.models import EnergyData, SensorData
+from server_api.partitions import (
+    PARTITIONED_MODELS, add_months, default_rows, ensure_partitions, expired_partitions, is_partitioned, month_start,
+    partitions,
+)
+from server_api.tests.factories import energy
+
+
+def fetch(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+class PartitionMigrationTests(TestCase):
+    def test_tables_partitioned_by_month(self):
+        first = add_months(month_start(datetime.now()), 1)
+        for model in PARTITIONED_MODELS:
+            table = model._meta.db_table
+            self.assertTrue(is_partitioned(model))
+            bounds = [(p["name"], p["lower"], p["upper"]) for p in partitions(model)]
+            self.assertEqual(bounds[0], (f"{table}_legacy", None, first))
+            self.assertEqual(bounds[1][1:], (first, add_months(first, 1)))
+            self.assertEqual(bounds[-1], (f"{table}_default", None, None))
+
+    def test_keys_include_timestamp(self):
+        self.assertEqual(
+            fetch(
+                "SELECT a.attname FROM pg_constraint c JOIN pg_attribute a "
+                "ON a.attrelid = c.conrelid AND a.attnum = ANY(c.conkey) "
+                "WHERE c.conrelid = %s::regclass AND c.contype = 'p' ORDER BY a.attname",
+                [EnergyData._meta.db_table],
+            ),
+            [("id",), ("timestamp",)],
+        )
+
+    def test_legacy_partition_left_clean(self):
+        for model in PARTITIONED_MODELS:
+            table = model._meta.db_table
+            # Every index of the legacy partition belongs to one of the partitioned table
+            self.assertEqual(
+                fetch(
+                    "SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = %s::regclass "
+                    "AND indexrelid NOT IN (SELECT inhrelid FROM pg_inherits)",
+                    [f"{table}_legacy"],
+                ),
+                [],
+            )
+            self.assertEqual(fetch("SELECT conname FROM pg_constraint WHERE conname = %s", [f"{table}_legacy_bound"]), [])
+            self.assertEqual(fetch("SELECT to_regclass(%s)", [f"{table}_future"]), [(None,)])
+
+
+@override_settings(HOT_STORE_ENABLED=False)
+class PartitionTests(TestCase):
+    def test_rows_route_to_their_month(self):
+        now = datetime.now()
+        EnergyData.objects.bulk_create(
+            [energy(None, datetime(2020, 1, 1)), energy(None, add_months(month_start(now), 1))]
+        )
+        table = EnergyData._meta.db_table
+        self.assertEqual(
+            fetch(f"SELECT tableoid::regclass::text FROM {table} ORDER BY timestamp", []),
+            [(f"{table}_legacy",), (f"{table}_p{add_months(month_start(now), 1):%Y%m}",)],
+        )
+
+    def test_ensure_partitions_moves_rows_out_of_default(self):
+        later = add_months(month_start(datetime.now()), 24)
+        EnergyData.objects.bulk_create([energy(None, later)])
+        self.assertEqual(default_rows(EnergyData), 1)
+        self.assertEqual(ensure_partitions(EnergyData, 0, now=later), [f"{EnergyData._meta.db_table}_p{later:%Y%m}"])
+        self.assertEqual(default_rows(EnergyData), 0)
+        self.assertEqual(EnergyData.objects.filter(timestamp=later).count(), 1)
+        self.assertEqual(ensure_partitions(EnergyData, 0, now=later), [])
+
+    def test_expired_partitions(self):
+        first = add_months(month_start(datetime.now()), 1)
+        self.assertEqual(expired_partitions(SensorData, 1, now=add_months(first, 1)), [f"{SensorData._meta.db_table}_legacy"])
+        self.assertEqual(expired_partitions(SensorData, 1, now=first), [])
@@ -0,0 +1,79 @@
+import asyncio
+from datetime import datetime
+
+from django.test import SimpleTestCase
+
+from server_api.polling import FixedRateSchedule, aligned_tick, device_jitter, gather_until
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FixedRateScheduleTests(SimpleTestCase):
+    def test_ticks_are_aligned_to_the_grid(self):
+        self.assertEqual(aligned_tick(1003.2, 10), 1010)
+        self.assertEqual(aligned_tick(1010, 10), 1020)
+        self.assertEqual(aligned_tick(1003.2, 10, offset=5), 1005)
+
+    def test_no_drift_whatever_a_round_costs(self):
+        clock = FakeClock(1003.2)
+        schedule = FixedRateSchedule(10, clock=clock)
+        self.assertAlmostEqual(schedule._advance(), 6.8)
+        # A round that took 4.5 s still starts the next one on the grid
+        clock.now = 1014.5
+        self.assertAlmostEqual(schedule._advance(), 5.5)
+        self.assertEqual(schedule.tick, 1020)
+        self.assertEqual(schedule.skipped, 0)
+
+    def test_overrun_skips_the_missed_ticks(self):
+        clock = FakeClock(1000.5)
+        schedule = FixedRateSchedule(10, clock=clock)
+        schedule._advance()
+        clock.now = 1035
+        self.assertEqual(schedule._advance(), 5)
+        self.assertEqual((schedule.tick, schedule.skipped), (1040, 2))
+
+    def test_clock_set_back_realigns(self):
+        clock = FakeClock(1000.5)
+        schedule = FixedRateSchedule(10, clock=clock)
+        schedule._advance()
+        clock.now = 500.5
+        self.assertAlmostEqual(schedule._advance(), 9.5)
+        self.assertEqual(schedule.tick, 510)
+
+    def test_deadline(self):
+        clock = FakeClock(1000.5)
+        schedule = FixedRateSchedule(10, deadline=8, clock=clock)
+        schedule._advance()
+        clock.now = 1003
+        self.assertEqual(schedule.remaining(), 15)
+        clock.now = 1020
+        self.assertEqual(schedule.remaining(), 0)
+        self.assertEqual(schedule.timestamp, datetime.fromtimestamp(1010))
+
+    def test_device_jitter_is_stable_and_bounded(self):
+        self.assertEqual(device_jitter("em-1", 1.0), device_jitter("em-1", 1.0))
+        self.assertTrue(0 <= device_jitter("em-1", 1.0) < 1.0)
+        self.assertEqual(device_jitter("em-1", 0), 0.0)
+
+
+class GatherUntilTests(SimpleTestCase):
+    def test_late_awaitables_are_cancelled(self):
+        cancelled = []
+
+        async def answer(value, delay):
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                cancelled.append(value)
+                raise
+            return value
+
+        results = asyncio.run(gather_until([answer("fast", 0), answer("slow", 5)], timeout=0.1))
+        self.assertEqual(results, ["fast", None])
+        self.assertEqual(cancelled, ["slow"])
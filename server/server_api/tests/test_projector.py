@@ -0,0 +1,59 @@
+from datetime import datetime
+
+from django.test import TestCase, override_settings
+
+from server_api.models import AirQualityData, EnergyData, Sensor, SensorData
+from server_api.projector import UnifiedProjector
+
+
+def air_quality(sensor, co2=600):
+    return AirQualityData.objects.create(
+        sensor=sensor, device="aq-1", quality="good", co2=co2, temp=21, humidity=40, voc=1,
+        pm2p5=3.0, pm10=4.0, pm1=1.0, pm4=2.0, version="1",
+    )
+
+
+@override_settings(HOT_STORE_ENABLED=False)
+class UnifiedProjectorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sensor = Sensor.objects.create(sensor_id="aq-1", sensor_type="AQ")
+
+    def test_on_commit_mirrors_after_commit(self):
+        projector = UnifiedProjector()
+        with self.captureOnCommitCallbacks() as callbacks:
+            rows = [air_quality(self.sensor), air_quality(self.sensor, co2=1200)]
+            projector.add(rows)
+            self.assertFalse(SensorData.objects.exists())
+        for callback in callbacks:
+            callback()
+        mirrors = SensorData.objects.order_by("source_id")
+        self.assertEqual([(m.source, m.source_id) for m in mirrors], [("airqualitydata", row.pk) for row in rows])
+        self.assertEqual(mirrors[1].co2, 1200)
+        self.assertEqual(mirrors[1].action, mirrors[1].determine_action())
+
+    def test_rows_without_sensor_are_not_mirrored(self):
+        projector = UnifiedProjector()
+        with self.captureOnCommitCallbacks(execute=True):
+            projector.add([air_quality(None)])
+        self.assertFalse(SensorData.objects.exists())
+
+    @override_settings(SENSORDATA_PROJECTION_MODE="interval", SENSORDATA_FLUSH_INTERVAL=3600)
+    def test_interval_mode_buffers_until_flush(self):
+        projector = UnifiedProjector()
+        reading = EnergyData(
+            sensor=Sensor.objects.create(sensor_id="em-1", sensor_type="EM"), device_id=1,
+            timestamp=datetime(2025, 6, 1, 12), **{
+                f"{phase}_{name}": 1.0
+                for phase in "abc" for name in ("current", "voltage", "act_power", "aprt_power", "pf", "freq")
+            },
+            total_current=3.0, total_act_power=3.0, total_aprt_power=3.0,
+        )
+        # Saved without post_save, which would hand it to the shared projector too
+        EnergyData.objects.bulk_create([reading])
+        projector.add([reading])
+        self.assertFalse(SensorData.objects.exists())
+        self.assertEqual(projector.flush(), 1)
+        self.assertTrue(SensorData.objects.filter(source="energydata", source_id=reading.pk).exists())
+        # Flushing again writes nothing twice
+        self.assertEqual(projector.flush(), 0)
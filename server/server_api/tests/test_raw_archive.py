@@ -0,0 +1,68 @@
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from server_api import raw_archive
+from server_api.models import RawSensorData
+from server_api.raw_archive import SegmentWriter, iter_range, iter_segment, list_segments
+
+
+@override_settings(RAW_ARCHIVE_SEGMENT_SECONDS=3600)
+class RawArchiveTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.writer = SegmentWriter(self.directory, index_every=2)
+        self.addCleanup(self.writer.close)
+
+    def test_range_read_in_time_order(self):
+        for hour in (9, 10, 11):
+            for minute in (0, 20, 40):
+                self.writer.append({"hour": hour, "minute": minute}, datetime(2025, 6, 1, hour, minute))
+        records = list(iter_range(datetime(2025, 6, 1, 9, 30), datetime(2025, 6, 1, 10, 20), self.directory))
+        self.assertEqual(
+            [(received_at.hour, received_at.minute) for received_at, _ in records], [(9, 40), (10, 0), (10, 20)]
+        )
+        self.assertEqual(records[0][1], {"hour": 9, "minute": 40})
+
+    def test_segments_roll_over_by_age(self):
+        self.writer.append({}, datetime(2025, 6, 1, 9))
+        self.writer.append({}, datetime(2025, 6, 1, 10, 30))
+        self.assertEqual(len(list_segments(self.directory)), 2)
+
+    def test_segments_outside_the_range_are_not_opened(self):
+        for day in (1, 2, 3):
+            self.writer.append({"day": day}, datetime(2025, 6, day, 12))
+        self.assertEqual(len(list_segments(self.directory)), 3)
+        with mock.patch.object(raw_archive, "iter_segment", wraps=iter_segment) as opened:
+            records = list(iter_range(datetime(2025, 6, 2), datetime(2025, 6, 2, 23), self.directory))
+        self.assertEqual([payload for _, payload in records], [{"day": 2}])
+        self.assertEqual([call.args[0].name[:8] for call in opened.call_args_list], ["20250602"])
+
+    def test_concurrent_appends_stay_in_order(self):
+        def append_many():
+            for n in range(200):
+                self.writer.append({"n": n})
+
+        threads = [threading.Thread(target=append_many) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        [segment] = list_segments(self.directory)
+        stamps = [ts for ts, _ in iter_segment(segment)]
+        self.assertEqual(len(stamps), 800)
+        self.assertEqual(stamps, sorted(stamps))
+
+
+class RawSensorDataCreateViewTests(TestCase):
+    @override_settings(RAW_ARCHIVE_ENABLED=False, RAW_ARCHIVE_DB_ENABLED=False)
+    def test_stored_in_the_table_when_the_archive_is_off(self):
+        response = self.client.post("/api/data/oc", [{"mac": "gw-1"}], content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(RawSensorData.objects.get().raw_data, [{"mac": "gw-1"}])
@@ -0,0 +1,66 @@
+from datetime import datetime
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TransactionTestCase, override_settings
+
+from server_api.models import OccupancyData, RawSensorData, SensorData
+from server_api.sensor_registry import sensor_registry
+
+# Human flow frames (serial 216: 1 entry, serial 56: 1 entry) from the minew_v3 corpus
+FRAME_A = "0201061bff3906ca1800d80100a9076140e61a9877299b33298df208958587"
+FRAME_B = "0201061bff3906ca18013801005b63d9bd9774e329aabb4da1d55aa6939e32"
+
+
+def raw_payload(received_at, *frames, gateway="gw-1"):
+    row = RawSensorData.objects.create(
+        raw_data=[{"gateway": gateway, "mac": gateway}] + [{"mac": "door-1", "rssi": -60, "raw": raw} for raw in frames]
+    )
+    RawSensorData.objects.filter(pk=row.pk).update(received_at=received_at)
+
+
+# The command closes every connection before forking its decode workers
+@override_settings(HOT_STORE_ENABLED=False)
+class ReplayOccupancyTests(TransactionTestCase):
+    def setUp(self):
+        sensor_registry.invalidate()
+        raw_payload(datetime(2025, 6, 1, 9), FRAME_A)
+        # The same frame relayed by a second gateway, then a new one
+        raw_payload(datetime(2025, 6, 1, 9, 0, 1), FRAME_A, gateway="gw-2")
+        raw_payload(datetime(2025, 6, 1, 9, 5), FRAME_B)
+
+    def replay(self, *args):
+        out = StringIO()
+        call_command("replay_occupancy", "--workers=1", *args, stdout=out)
+        return out.getvalue()
+
+    def test_rows_keep_the_receive_time_and_running_totals(self):
+        output = self.replay()
+        self.assertIn("1 relayed duplicates", output)
+        rows = list(OccupancyData.objects.order_by("timestamp").values_list("timestamp", "serial_number", "total_entries"))
+        self.assertEqual(rows, [(datetime(2025, 6, 1, 9), 216, 1), (datetime(2025, 6, 1, 9, 5), 56, 2)])
+        self.assertEqual(SensorData.objects.filter(source="occupancydata").count(), 2)
+
+    def test_totals_continue_from_before_the_range(self):
+        self.replay("--end=2025-06-01T09:01:00")
+        self.replay("--start=2025-06-01T09:01:00")
+        self.assertEqual(list(OccupancyData.objects.order_by("timestamp").values_list("total_entries", flat=True)), [1, 2])
+
+    def test_replace_rewrites_the_range(self):
+        self.replay()
+        self.replay("--replace", "--start=2025-06-01T00:00:00")
+        self.assertEqual(OccupancyData.objects.count(), 2)
+        self.assertEqual(
+            list(OccupancyData.objects.order_by("timestamp").values_list("created_at", flat=True)),
+            [datetime(2025, 6, 1, 9), datetime(2025, 6, 1, 9, 5)],
+        )
+
+    def test_replace_needs_a_bound(self):
+        self.replay()
+        with self.assertRaises(CommandError):
+            self.replay("--replace")
+        self.assertEqual(OccupancyData.objects.count(), 2)
+
+    def test_dry_run_writes_nothing(self):
+        self.assertIn("would write 2", self.replay("--dry-run"))
+        self.assertFalse(OccupancyData.objects.exists())
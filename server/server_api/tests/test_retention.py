@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+
+from django.test import TestCase, override_settings
+
+from server_api.models import EnergyData, RetentionCheckpoint, Sensor, SensorData, SensorRollup
+from server_api.retention import downsample_and_purge
+from server_api.rollups import raw_horizon, rebuild_rollups
+from server_api.tests.factories import energy
+
+START = datetime(2025, 6, 2, 9, 0)
+CUTOFF = START + timedelta(hours=2)
+
+
+def at(minutes):
+    return START + timedelta(minutes=minutes)
+
+
+def hourly(sensor):
+    return list(
+        SensorRollup.objects.filter(sensor=sensor, grain="1h", channel="total_act_power")
+        .order_by("bucket").values_list("bucket", "count", "sum_value", "min_value", "max_value", "last_value")
+    )
+
+
+@override_settings(HOT_STORE_ENABLED=False)
+class DownsampleAndPurgeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sensor = Sensor.objects.create(sensor_id="em-retention", sensor_type="EM")
+
+    def purge(self):
+        return list(downsample_and_purge(EnergyData, CUTOFF, chunk_size=2))
+
+    def test_old_rows_summarised_then_deleted(self):
+        EnergyData.objects.bulk_create(
+            [energy(self.sensor, at(0), 100), energy(self.sensor, at(30), 300), energy(self.sensor, at(70), 200),
+             energy(self.sensor, at(130), 999)]
+        )
+        SensorData.objects.bulk_create([
+            SensorData(sensor=self.sensor, source="energydata", source_id=1, timestamp=START, total_entries=0, total_exits=0)
+        ])
+        # A stale incremental rollup is replaced by the summary of the purged rows
+        SensorRollup.objects.create(
+            sensor=self.sensor, channel="total_act_power", grain="1h", bucket=START, count=9, sum_value=1,
+            min_value=1, max_value=1, last_value=1, last_at=START,
+        )
+        steps = self.purge()
+        self.assertEqual([(step["start"], step["end"], step["rows"], step["mirrors"]) for step in steps],
+                         [(START, CUTOFF, 3, 1)])
+        self.assertEqual(hourly(self.sensor), [
+            (START, 2, 400.0, 100.0, 300.0, 300.0),
+            (START + timedelta(hours=1), 1, 200.0, 200.0, 200.0, 200.0),
+        ])
+        # Rows after the cutoff stay
+        self.assertEqual(list(EnergyData.objects.filter(sensor=self.sensor).values_list("total_act_power", flat=True)), [999])
+        self.assertFalse(SensorData.objects.filter(sensor=self.sensor).exists())
+        self.assertEqual(raw_horizon(EnergyData), CUTOFF)
+
+    def test_chunks_of_an_hour_merged_when_rollups_not_kept_on_ingest(self):
+        EnergyData.objects.bulk_create(
+            [energy(self.sensor, at(0), 100), energy(self.sensor, at(20), 300), energy(self.sensor, at(40), 200)]
+        )
+        SensorRollup.objects.create(
+            sensor=self.sensor, channel="total_act_power", grain="1h", bucket=START, count=9, sum_value=1,
+            min_value=1, max_value=1, last_value=1, last_at=START,
+        )
+        with self.settings(ROLLUPS_ENABLED=False):
+            self.assertEqual(self.purge()[0]["rows"], 3)
+        # Two chunks of at most two rows, merged into the reset bucket
+        self.assertEqual(hourly(self.sensor), [(START, 3, 600.0, 100.0, 300.0, 200.0)])
+
+    def test_rebuild_leaves_purged_buckets_alone(self):
+        EnergyData.objects.bulk_create([energy(self.sensor, at(0), 100), energy(self.sensor, at(30), 300),
+                                        energy(self.sensor, at(130), 500)])
+        self.purge()
+        rebuild_rollups(EnergyData)
+        rebuild_rollups(EnergyData, start=START, end=START + timedelta(minutes=30))
+        self.assertEqual(hourly(self.sensor), [
+            (START, 2, 400.0, 100.0, 300.0, 300.0),
+            (CUTOFF, 1, 500.0, 500.0, 500.0, 500.0),
+        ])
+
+    def test_late_rows_merged_when_rollups_not_kept_on_ingest(self):
+        EnergyData.objects.bulk_create([energy(self.sensor, at(0), 100)])
+        self.purge()
+        EnergyData.objects.bulk_create([energy(self.sensor, at(10), 300)])
+        with self.settings(ROLLUPS_ENABLED=False):
+            self.assertEqual(self.purge()[0]["rows"], 1)
+        self.assertEqual(hourly(self.sensor), [(START, 2, 400.0, 100.0, 300.0, 300.0)])
+        self.assertEqual(RetentionCheckpoint.objects.get(source="energydata").purged_before, CUTOFF)
+
+    def test_late_rows_only_deleted_when_ingest_rolled_them_up(self):
+        EnergyData.objects.bulk_create([energy(self.sensor, at(0), 100)])
+        self.purge()
+        EnergyData.objects.bulk_create([energy(self.sensor, at(10), 300)])
+        self.assertEqual(self.purge()[0]["rows"], 1)
+        self.assertEqual(hourly(self.sensor), [(START, 1, 100.0, 100.0, 100.0, 100.0)])
+        self.assertFalse(EnergyData.objects.filter(sensor=self.sensor).exists())
+
+
+@override_settings(HOT_STORE_ENABLED=False)
+class HistoryResolutionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sensor = Sensor.objects.create(sensor_id="em-retention", sensor_type="EM")
+        EnergyData.objects.bulk_create([energy(cls.sensor, at(0), 100), energy(cls.sensor, at(150), 200)])
+        list(downsample_and_purge(EnergyData, CUTOFF, chunk_size=100))
+
+    def test_raw_resolution_keeps_its_shape_before_the_horizon(self):
+        response = self.client.get("/api/data/em/history", {"start": "2025-06-02T00:00:00"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["total_act_power"] for row in response.json()], [200.0])
+        self.assertEqual(response["X-Raw-Horizon"], CUTOFF.isoformat())
+
+    def test_rollup_resolution(self):
+        response = self.client.get(
+            "/api/data/em/history", {"resolution": "1h", "sensor": "em-retention", "start": "2025-06-02T00:00:00"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(row["bucket"], row["mean"]) for row in response.json()], [("2025-06-02T09:00:00", 100.0)])
+
+    def test_unknown_resolution(self):
+        self.assertEqual(self.client.get("/api/data/em/history", {"resolution": "2h"}).status_code, 400)
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+from django.test import TestCase, override_settings
+
+from server_api.models import EnergyData, Sensor, SensorRollup
+from server_api.rollups import rebuild_rollups, rollup_partials, write_rollups
+from server_api.tests.factories import energy
+
+START = datetime(2025, 6, 2, 9, 0)
+
+
+def at(seconds):
+    return START + timedelta(seconds=seconds)
+
+
+def summary(grain):
+    return list(
+        SensorRollup.objects.filter(channel="total_act_power", grain=grain, sensor__sensor_id="em-rollup")
+        .order_by("bucket")
+        .values_list("bucket", "count", "sum_value", "min_value", "max_value", "last_value")
+    )
+
+
+@override_settings(HOT_STORE_ENABLED=False)
+class RollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sensor = Sensor.objects.create(sensor_id="em-rollup", sensor_type="EM")
+
+    def test_batches_merge_into_buckets(self):
+        readings = EnergyData.objects.bulk_create(
+            [energy(self.sensor, at(0), 100), energy(self.sensor, at(30), 300), energy(self.sensor, at(90), 200)]
+        )
+        write_rollups(rollup_partials(readings[:2]))
+        write_rollups(rollup_partials(readings[2:]))
+        self.assertEqual(summary("1m"), [
+            (START, 2, 400.0, 100.0, 300.0, 300.0),
+            (START + timedelta(minutes=1), 1, 200.0, 200.0, 200.0, 200.0),
+        ])
+        self.assertEqual(summary("1h"), [(START, 3, 600.0, 100.0, 300.0, 200.0)])
+
+    def test_late_reading_keeps_last_value(self):
+        late, newest = EnergyData.objects.bulk_create(
+            [energy(self.sensor, at(0), 100), energy(self.sensor, at(30), 300)]
+        )
+        write_rollups(rollup_partials([newest]))
+        write_rollups(rollup_partials([late]))
+        self.assertEqual(summary("15m"), [(START, 2, 400.0, 100.0, 300.0, 300.0)])
+
+    def test_rebuild_matches_incremental(self):
+        readings = EnergyData.objects.bulk_create(
+            [energy(self.sensor, at(seconds), seconds) for seconds in range(0, 4000, 400)]
+        )
+        write_rollups(rollup_partials(readings))
+        incremental = {grain: summary(grain) for grain in ("1m", "15m", "1h")}
+        SensorRollup.objects.filter(sensor=self.sensor).update(count=0)
+        rebuild_rollups(EnergyData)
+        self.assertEqual({grain: summary(grain) for grain in ("1m", "15m", "1h")}, incremental)
+
+
+@override_settings(HOT_STORE_ENABLED=False)
+class RollupHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        sensor = Sensor.objects.create(sensor_id="em-rollup", sensor_type="EM")
+        readings = EnergyData.objects.bulk_create(
+            [energy(sensor, at(0), 100), energy(sensor, at(3600), 200), energy(sensor, at(7200), 300)]
+        )
+        write_rollups(rollup_partials(readings))
+
+    def get(self, **params):
+        return self.client.get("/api/data/em/history", {"grain": "1h", "sensor": "em-rollup", **params})
+
+    def test_naive_range(self):
+        response = self.get(start="2025-06-02T10:00:00", end="2025-06-02T11:00:00")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["mean"] for row in response.json()], [200.0, 300.0])
+
+    def test_aware_range_converted_to_local_time(self):
+        # 09:00 UTC is 10:00 in London summer time
+        response = self.get(start="2025-06-02T09:00:00Z", end="2025-06-02T11:00:00+01:00")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["bucket"] for row in response.json()], ["2025-06-02T10:00:00", "2025-06-02T11:00:00"])
+
+    def test_aware_start_with_default_end(self):
+        response = self.get(start="2025-06-02T00:00:00+00:00")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 3)
+
+    def test_invalid_params(self):
+        self.assertEqual(self.get(end="soon").status_code, 400)
+        self.assertEqual(self.get(grain="2h").status_code, 400)
@@ -0,0 +1,51 @@
+from django.test import TestCase
+
+from server_api.models import Sensor
+from server_api.sensor_registry import SensorRegistry, sensor_registry
+
+
+class SensorRegistryTests(TestCase):
+    def setUp(self):
+        self.registry = SensorRegistry()
+
+    def test_warm_lookups_run_no_query(self):
+        sensor = Sensor.objects.create(sensor_id="aq-1", sensor_type="AQ")
+        self.assertEqual(self.registry.get("aq-1"), sensor)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.registry.get("aq-1"), sensor)
+            self.assertEqual(self.registry.get_by_pk(sensor.pk), sensor)
+
+    def test_missing_sensor_is_not_cached(self):
+        self.assertIsNone(self.registry.get("aq-1"))
+        sensor = Sensor.objects.create(sensor_id="aq-1", sensor_type="AQ")
+        self.assertEqual(self.registry.get("aq-1"), sensor)
+
+    def test_get_many_creates_the_missing_sensors(self):
+        Sensor.objects.create(sensor_id="oc-1", sensor_type="OC")
+        with self.assertNumQueries(3):
+            sensors = self.registry.get_many(["oc-1", "oc-2", "oc-2", "oc-3"], "OC")
+        self.assertEqual(set(sensors), {"oc-1", "oc-2", "oc-3"})
+        self.assertEqual(Sensor.objects.filter(sensor_id__in=["oc-1", "oc-2", "oc-3"]).count(), 3)
+        with self.assertNumQueries(0):
+            self.registry.get_many(["oc-1", "oc-3"], "OC")
+
+    def test_get_many_without_create(self):
+        self.assertEqual(self.registry.get_many(["em-9"], "EM", create=False), {})
+        self.assertFalse(Sensor.objects.filter(sensor_id="em-9").exists())
+
+    def test_expired_entries_are_read_again(self):
+        sensor = Sensor.objects.create(sensor_id="aq-1", sensor_type="AQ", floor=1)
+        with self.settings(SENSOR_REGISTRY_TTL=-1):
+            self.registry.get("aq-1")
+        Sensor.objects.filter(pk=sensor.pk).update(floor=2)
+        self.assertEqual(self.registry.get("aq-1").floor, 2)
+
+    def test_saving_a_sensor_invalidates_the_shared_registry(self):
+        sensor = Sensor.objects.create(sensor_id="aq-1", sensor_type="AQ")
+        self.assertEqual(sensor_registry.get("aq-1"), sensor)
+        sensor.sensor_id = "aq-renamed"
+        sensor.save()
+        self.assertIsNone(sensor_registry.get("aq-1"))
+        self.assertEqual(sensor_registry.get("aq-renamed").pk, sensor.pk)
+        sensor.delete()
+        self.assertIsNone(sensor_registry.get("aq-renamed"))
@@ -1,18 +1,20 @@
 from django.urls import path
+from . import async_views
 from .views import (
     EnergyDataListView, OccupancyDataCreateView,
     AirQualityDataHistoryView, EnergyDataHistoryView, OccupancyDataHistoryView,
     EnergyDataHistoryViewLevel3, EnergyDataHistoryViewLevel4, RadarDataCreateView, RadarDataHistoryView,
-    SensorListView, SensorDetailView, LiveRecommendationView, get_recommendation, 
-    RawSensorDataCreateView, Lsg01DataPush, Lsg01AirQualityHistoryView, UnifiedAirQualityHistoryView, TemperatureHumidityCreateView, AirQualitySensorPushView,#AirQualityDataListView,
+    SensorListView, SensorLatestView, SensorDetailView, LiveRecommendationView, get_recommendation, 
+    RawSensorDataCreateView, RawSensorDataArchiveView, Lsg01DataPush, Lsg01AirQualityHistoryView, UnifiedAirQualityHistoryView, TemperatureHumidityCreateView, AirQualitySensorPushView,#AirQualityDataListView,
     WeatherLocationView, WeatherRefreshView, WeatherCurrentView, WeatherHourlyView, WeatherDailyView,
-    WeatherAwareRecommendationView,
+    WeatherAwareRecommendationView, IngestStatsView,
 )
 
 urlpatterns = [
     # path('data/co2', AirQualityDataListView.as_view(), name='aq_data'),
     path('data/em', EnergyDataListView.as_view(), name='em_data'),
     path('data/oc', RawSensorDataCreateView.as_view(), name='oc_data'),
+    path('data/oc/raw', RawSensorDataArchiveView.as_view(), name='oc_raw_archive'),
     path('data/oc/parsed', OccupancyDataCreateView.as_view(), name='parsed_oc_data'),
     path('data/co2/history', AirQualityDataHistoryView.as_view()),
     path('data/em/history', EnergyDataHistoryView.as_view()),
@@ -28,12 +30,22 @@ urlpatterns = [
     path("data/lsg01", Lsg01DataPush.as_view(), name="lsg01-data-push"),
     path("data/lsg01/history", Lsg01AirQualityHistoryView.as_view(), name="lsg01_history"),
     path("data/air/unified", UnifiedAirQualityHistoryView.as_view(), name="air_unified_history"),
+    path("ingest/stats", IngestStatsView.as_view(), name="ingest_stats"),
+
+    # Async (ASGI) versions of the hot ingest endpoints
+    path("async/data/oc/parsed", async_views.occupancy_parsed, name="async_parsed_oc_data"),
+    path("async/data/aq/push", async_views.aq_push, name="async_aq_push"),
+    path("async/data/lsg01", async_views.lsg01_push, name="async_lsg01_data_push"),
+    path("async/data/radar", async_views.radar, name="async_radar_data"),
+    path("async/data/temp", async_views.temperature, name="async_temp_data"),
 
 
 
     
     # Sensor management endpoints
     path('sensors', SensorListView.as_view(), name='sensor_list'),
+    # Before sensors/<str:sensor_id>, which would take "latest" for a sensor_id
+    path('sensors/latest', SensorLatestView.as_view(), name='sensor_latest'),
     path('sensors/<str:sensor_id>', SensorDetailView.as_view(), name='sensor_detail'),
     path('recommendation/live', LiveRecommendationView.as_view(), name='live_recommendation'),
     path("recommendation/", get_recommendation, name="get_recommendation"),
@@ -1,10 +1,11 @@
 # server_api/utils.py
-import base64
 import struct
 import logging
 from datetime import timedelta
 from django.utils.timezone import now
 from server_api.models import AirQualityData, EnergyData, OccupancyData
+from server_api.hot_store import latest_reading
+from server_api.decoders import decode_lsg01_b64, decode_minew_hex, decode_mst01_ht_b64
 
 
 
@@ -33,130 +34,17 @@ def parse_minew_data(raw_hex):
       • Then 2 bytes random number,
       • Then 2 bytes digital signature.
     
-    Returns a dict of parsed fields.
+    Returns a dict of parsed fields. The frame is decoded as bytes by
+    decoders.decode_minew_frame.
     """
-    raw_hex = raw_hex.lower()
-    header = "0201061bff3906"
-    if not raw_hex.startswith(header):
-        return {"error": "Invalid header"}
-    remainder = raw_hex[len(header):]
-    
-    # Expect the next byte to be "ca" (protocol)
-    if not remainder.startswith("ca"):
-        return {"error": "Missing protocol indicator"}
-    remainder = remainder[2:]
-    
-    if len(remainder) < 2:
-        return {"error": "Incomplete packet"}
-    frame_version = remainder[:2]
-    remainder = remainder[2:]
-    parsed = {"frame_version": frame_version}
-    
-    if frame_version == "00":
-        # Device information frame
-        if len(remainder) < 12:
-            return {"error": "Incomplete device info frame"}
-        mac_hex = remainder[:12]
-        mac = ":".join(mac_hex[i:i+2] for i in range(0, 12, 2))
-        parsed["mac"] = mac
-        remainder = remainder[12:]
-        
-        if len(remainder) < 2:
-            return parsed
-        parsed["battery"] = int(remainder[:2], 16)
-        remainder = remainder[2:]
-        
-        if len(remainder) < 4:
-            return parsed
-        fw_int = int(remainder[:4], 16)
-        parsed["firmware_version"] = str(fw_int)
-        remainder = remainder[4:]
-        
-        if len(remainder) < 16:
-            return parsed
-        parsed["peripheral_support"] = remainder[:16]
-        remainder = remainder[16:]
-        
-        if len(remainder) < 2:
-            return parsed
-        remainder = remainder[2:]  # Skip TBD byte
-        
-        if len(remainder) < 4:
-            return parsed
-        parsed["salt"] = remainder[:4]
-        remainder = remainder[4:]
-        
-        if len(remainder) < 4:
-            return parsed
-        parsed["digital_signature"] = remainder[:4]
-        
-    elif frame_version == "18":
-        # Monitoring (human flow) data frame
-        if len(remainder) < 2:
-            return {"error": "Incomplete monitoring frame"}
-        parsed["usage"] = remainder[:2]
-        remainder = remainder[2:]
-        
-        if len(remainder) < 2:
-            return parsed
-        parsed["serial_number"] = int(remainder[:2], 16)
-        remainder = remainder[2:]
-        
-        if len(remainder) < 4:
-            return parsed
-        entries_hex = remainder[:4]
-        entries_swapped = entries_hex[2:] + entries_hex[:2]
-        parsed["entries"] = int(entries_swapped, 16)
-        remainder = remainder[4:]
-        
-        if len(remainder) < 4:
-            return parsed
-        exits_hex = remainder[:4]
-        exits_swapped = exits_hex[2:] + exits_hex[:2]
-        parsed["exits"] = int(exits_swapped, 16)
-        remainder = remainder[4:]
-        
-        if len(remainder) < 24:
-            return parsed
-        remainder = remainder[24:]  # Skip 12 bytes undefined
-        
-        if len(remainder) < 4:
-            return parsed
-        parsed["random_number"] = remainder[:4]
-        remainder = remainder[4:]
-        
-        if len(remainder) < 4:
-            return parsed
-        parsed["digital_signature"] = remainder[:4]
-    else:
-        parsed["error"] = "Unknown frame version"
-    return parsed
+    return decode_minew_hex(raw_hex)
 
 
 
 
 
 def parse_mst01_ht_payload(b64_payload):
-    try:
-        decoded = base64.b64decode(b64_payload)
-        if len(decoded) < 30:
-            return {"error": "Frame too short"}
-
-        if decoded[7] != 0xCA or decoded[8] != 0x05:
-            return {"error": "Not an HT frame"}
-
-        temp_raw = int.from_bytes(decoded[12:14], byteorder="big")
-        hum_raw = int.from_bytes(decoded[14:16], byteorder="big")
-
-        temperature = round(temp_raw / 256.0, 1)
-        humidity = round(hum_raw / 256.0, 1)
-
-        return {
-            "temperature": temperature,
-            "humidity": humidity,
-        }
-    except Exception as e:
-        return {"error": str(e)}
+    return decode_mst01_ht_b64(b64_payload)
 
 # utils.py
 
@@ -196,120 +84,12 @@ def parse_mst01_ht_payload(b64_payload):
 logger = logging.getLogger(__name__)
 
 def parse_lsg01_payload(frm_payload_b64):
-    try:
-        payload_bytes = base64.b64decode(frm_payload_b64)
-        logger.debug(f"[LSG01] Raw bytes: {payload_bytes.hex()}")
-
-        i = 0
-        results = {}
-
-        while i < len(payload_bytes):
-            type_byte = payload_bytes[i]
-            i += 1
-
-            if type_byte == 0x01:  # Product ID
-                model_id = payload_bytes[i]
-                results["model_id"] = model_id
-                i += 1
-
-            elif type_byte == 0x52:  # PM2.5
-                pm25 = int.from_bytes(payload_bytes[i:i+2], byteorder="big")
-                results["pm25"] = pm25
-                i += 2
-
-            elif type_byte == 0x9F:  # HCHO
-                hcho = int.from_bytes(payload_bytes[i:i+2], byteorder="big")
-                results["hcho"] = hcho
-                i += 2
-
-            elif type_byte == 0x49:  # CO2
-                co2 = int.from_bytes(payload_bytes[i:i+2], byteorder="big")
-                results["co2"] = co2
-                i += 2
-
-            elif type_byte == 0xA0:  # TVOC
-                tvoc = int.from_bytes(payload_bytes[i:i+2], byteorder="big")
-                results["tvoc"] = tvoc
-                i += 2
-
-            elif type_byte == 0x10:  # Temperature
-                temp_raw = int.from_bytes(payload_bytes[i:i+2], byteorder="big", signed=True)
-                results["temperature"] = round(temp_raw / 100.0, 2)
-                i += 2
-
-            elif type_byte == 0x12:  # Humidity
-                humidity_raw = int.from_bytes(payload_bytes[i:i+2], byteorder="big")
-                results["humidity"] = round(humidity_raw / 10.0, 2)
-                i += 2
-
-            else:
-                logger.warning(f"Unknown type byte: {hex(type_byte)} at index {i-1}")
-                break
-
-        return results
-
-    except Exception as e:
-        logger.exception("Failed to decode LSG01 payload")
-        return {"error": str(e)}
-
-
-
-logger = logging.getLogger(__name__)
-
-# LSG01 sensor tag definitions (tag → (label, num_bytes, signed, scale factor))
-LSG01_TAG_MAP = {
-    0x52: ("pm25", 2, False, 1),            # µg/m³
-    0x9F: ("hcho", 2, False, 1),            # µg/m³
-    0x49: ("co2", 2, False, 1),             # ppm
-    0xA0: ("tvoc", 2, False, 1),            # µg/m³
-    0x10: ("temperature", 2, True, 100),    # °C
-    0x12: ("humidity", 2, False, 10),       # %RH
-}
+    return decode_lsg01_b64(frm_payload_b64)
 
 
 def parse_lsg01_payload_dynamically(payload_base64: str) -> dict:
-    try:
-        # Decode base64 string to bytes
-        payload_bytes = base64.b64decode(payload_base64)
-        logger.debug(f"Decoded payload: {payload_bytes.hex()}")
-
-        index = 0
-        data = {}
-
-        # Skip header: 0x00 0x01 0x4B (LSG01 model ID)
-        if payload_bytes[:3] == b'\x00\x01\x4B':
-            index = 3
-        else:
-            logger.warning("Header doesn't match expected LSG01 prefix. Starting parse anyway.")
-
-        while index < len(payload_bytes):
-            tag = payload_bytes[index]
-            index += 1
-
-            if tag not in LSG01_TAG_MAP:
-                logger.warning(f"Unknown tag: 0x{tag:02X}, stopping parsing.")
-                break
-
-            label, num_bytes, is_signed, scale = LSG01_TAG_MAP[tag]
-
-            if index + num_bytes > len(payload_bytes):
-                logger.warning(f"Insufficient bytes for tag {label}, skipping.")
-                break
-
-            raw_bytes = payload_bytes[index:index + num_bytes]
-            index += num_bytes
-
-            # Convert bytes to value
-            value = int.from_bytes(raw_bytes, byteorder='big', signed=is_signed)
-            scaled_value = round(value / scale, 2)
-            data[label] = scaled_value
-
-        logger.debug(f"Parsed data: {data}")
-        return data
-
-    except Exception as e:
-        logger.exception("Error parsing LSG01 payload.")
-        return {"error": str(e)}
+    # Same engine as parse_lsg01_payload: compiled per-layout plans, see decoders.Lsg01Decoder
+    return decode_lsg01_b64(payload_base64)
 
 
 
@@ -352,25 +132,25 @@ def get_energy_summary(latest_power_value):
 
 def build_input_vector_from_latest_data():
     """
-    Fetch the latest sensor readings and construct a model input vector.
-    Returns None if any key data is missing.
+    Fetch the latest sensor readings (from the hot store) and construct a
+    model input vector. Returns None if any key data is missing.
     """
     try:
         cutoff_time = now() - timedelta(minutes=15)  # adjustable time window
 
-        latest_aq = AirQualityData.objects.filter(timestamp__gte=cutoff_time).order_by("-timestamp").first()
-        latest_em = EnergyData.objects.filter(timestamp__gte=cutoff_time).order_by("-timestamp").first()
-        latest_oc = OccupancyData.objects.filter(timestamp__gte=cutoff_time).order_by("-timestamp").first()
+        latest_aq = latest_reading(AirQualityData, since=cutoff_time)
+        latest_em = latest_reading(EnergyData, since=cutoff_time)
+        latest_oc = latest_reading(OccupancyData, since=cutoff_time)
 
         if not (latest_aq and latest_em and latest_oc):
             return None
 
         input_vector = {
-            "co2": latest_aq.co2 if latest_aq.co2 is not None else 0,
-            "temp": latest_aq.temp if latest_aq.temp is not None else 0,
-            "total_act_power": latest_em.total_act_power if latest_em.total_act_power is not None else 0,
-            "total_entries": latest_oc.total_entries if latest_oc.total_entries is not None else 0,
-            "total_exits": latest_oc.total_exits if latest_oc.total_exits is not None else 0,
+            "co2": latest_aq["co2"] if latest_aq["co2"] is not None else 0,
+            "temp": latest_aq["temp"] if latest_aq["temp"] is not None else 0,
+            "total_act_power": latest_em["total_act_power"] if latest_em["total_act_power"] is not None else 0,
+            "total_entries": latest_oc["total_entries"] if latest_oc["total_entries"] is not None else 0,
+            "total_exits": latest_oc["total_exits"] if latest_oc["total_exits"] is not None else 0,
         }
 
         return input_vector
@@ -1,14 +1,13 @@
 from django.shortcuts import render
-from collections import defaultdict
-from datetime import datetime
+from datetime import datetime, timedelta
+import json
 import pytz
 import time
 import logging
 logger = logging.getLogger(__name__)
-from .utils import parse_mst01_ht_payload
 import base64
 import traceback
-from .utils import get_energy_summary, build_input_vector_from_latest_data, generate_recommendations_by_location, parse_lsg01_payload_dynamically
+from .utils import get_energy_summary, build_input_vector_from_latest_data, generate_recommendations_by_location
 # Create your views here.
 import joblib
 from rest_framework.decorators import api_view
@@ -20,8 +19,11 @@ from rest_framework.permissions import AllowAny
 from rest_framework import generics
 
 from dateutil import parser as dateparser
-from .utils import parse_minew_data, parse_lsg01_payload, parse_mst01_ht_payload
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from .ml_model_loader import forecast_models, recommendation_model, label_encoder
 import pandas as pd
@@ -30,16 +32,26 @@ from django.utils.timezone import now
 from itertools import chain
 
 from .models import (
-    AirQualityData, EnergyData, OccupancyData, Sensor, RadarData, SensorData, Lsg01AirQualityData,
+    AirQualityData, EnergyData, OccupancyData, Sensor, RadarData, SensorData, SensorRollup, SensorLatest, Lsg01AirQualityData,
     WeatherLocation, WeatherHourly, WeatherDaily, WeatherCurrent,
 
 )
 from .serializers import (
     Lsg01AirQualityDataSerializer, AirQualityDataSerializer, TemperatureHumidityDataSerializer, 
     EnergyDataSerializer,OccupancyDataSerializer, RadarDataSerializer, SensorSerializer, 
-    SensorDataSerializer, RawSensorDataSerializer,
+    SensorDataSerializer, SensorRollupSerializer, SensorLatestSerializer, RawSensorDataSerializer,
     WeatherLocationSerializer, WeatherHourlySerializer, WeatherDailySerializer, WeatherCurrentSerializer
 )
+from .ingest import batch_response, bulk_ingest_occupancy, bulk_ingest_validated
+from .sensor_registry import sensor_registry
+from .ingest_queue import async_ingest_enabled, ingest_queues, queue_or_reject, save_or_queue
+from .raw_archive import iter_range, raw_archive
+from .decoders import decode
+from .dedup import frame_dedup
+from .deadband import step_series
+from .hot_store import latest_reading
+from .idempotency import filter_seen_uplinks, idempotent_uplink, record_uplinks
+from .rollups import GRAINS, ROLLUP_CHANNELS, raw_horizon
 from .weather_service import (
     ensure_default_location, refresh_weather_for_default_location, weather_feature_snapshot, overlay_weather_rules
 )
@@ -104,25 +116,37 @@ from .weather_service import (
 #         except Exception as e:
 #             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def lsg01_uplink_fields(payload):
+    """Pull the device id and decoded readings out of one TTN uplink; raises KeyError/TypeError on a malformed uplink."""
+    device_id = payload["end_device_ids"]["device_id"]
+    frm_payload = payload["uplink_message"]["frm_payload"]
+
+    # Decode sensor readings
+    parsed_data = decode("lsg01", frm_payload)
+    logger.debug(f"Parsed data: {parsed_data}")
+    return device_id, parsed_data
+
+
 class Lsg01DataPush(APIView):
     def post(self, request):
+        if isinstance(request.data, list):
+            return self.post_batch(request.data)
+
         print("[DEBUG] Received LSG01 payload:", request.data)
+        # TTN retries are answered with the original response (see idempotency.py)
+        return idempotent_uplink(request.data, lambda: self.post_uplink(request.data))
+
+    def post_uplink(self, payload):
         try:
-            payload = request.data
             logger.debug(f"Incoming payload: {payload}")
 
-            device_id = payload["end_device_ids"]["device_id"]
-            frm_payload = payload["uplink_message"]["frm_payload"]
-
-            # Decode sensor readings
-            parsed_data = parse_lsg01_payload_dynamically(frm_payload)
-            logger.debug(f"Parsed data: {parsed_data}")
+            device_id, parsed_data = lsg01_uplink_fields(payload)
 
             if "error" in parsed_data:
                 return Response({"error": parsed_data["error"]}, status=status.HTTP_400_BAD_REQUEST)
 
             # Get or create sensor (optional - modify if needed)
-            sensor = Sensor.objects.filter(sensor_id=device_id).first()
+            sensor = sensor_registry.get(device_id)
             if not sensor:
                 return Response({"error": f"Sensor {device_id} not found."}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -131,8 +155,7 @@ class Lsg01DataPush(APIView):
 
             serializer = Lsg01AirQualityDataSerializer(data=parsed_data)
             if serializer.is_valid():
-                serializer.save()
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
+                return save_or_queue(serializer)
             else:
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -140,23 +163,76 @@ class Lsg01DataPush(APIView):
             logger.exception("Error processing LSG01 data.")
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def post_batch(self, uplinks):
+        """
+        Decode and validate an array of TTN uplinks, then insert them with one
+        bulk_create, in the transaction that records their receipts. Uplinks
+        processed before are reported as duplicates.
+        """
+        seen = filter_seen_uplinks(uplinks)
+        fresh = [index for index in range(len(uplinks)) if index not in seen]
+        fresh_uplinks = [uplinks[index] for index in fresh]
+
+        # The receipts commit with the rows they stand for, so a retry can
+        # never find the rows stored but not the receipts
+        with transaction.atomic():
+            fresh_results = self.ingest_batch(fresh_uplinks)
+            for index, result in zip(fresh, fresh_results):
+                result["index"] = index
+            record_uplinks(fresh_uplinks, fresh_results)
+
+        results = fresh_results + [
+            {"index": index, "status": "duplicate", "original": data} for index, (_, data) in seen.items()
+        ]
+        results.sort(key=lambda result: result["index"])
+        return batch_response(results)
+
+    def ingest_batch(self, uplinks):
+        decoded = []
+        for payload in uplinks:
+            try:
+                decoded.append(lsg01_uplink_fields(payload))
+            except (KeyError, TypeError) as e:
+                decoded.append((None, {"error": f"Malformed uplink: missing {e}"}))
+
+        sensors = sensor_registry.get_many(
+            {device_id for device_id, parsed_data in decoded if device_id and "error" not in parsed_data},
+            'AQ',
+            create=False,
+        )
+
+        records = []
+        for device_id, parsed_data in decoded:
+            if "error" in parsed_data:
+                records.append((None, parsed_data["error"]))
+            elif device_id not in sensors:
+                records.append((None, f"Sensor {device_id} not found."))
+            else:
+                parsed_data["sensor"] = sensors[device_id].id
+                parsed_data["device"] = device_id
+                records.append((parsed_data, None))
+
+        return bulk_ingest_validated(Lsg01AirQualityDataSerializer, records)
+
 
 class TemperatureHumidityCreateView(APIView):
     def post(self, request):
+        # TTN retries are answered with the original response (see idempotency.py)
+        return idempotent_uplink(request.data.get("data"), lambda: self.post_uplink(request))
+
+    def post_uplink(self, request):
         frm_payload = request.data.get("data", {}).get("uplink_message", {}).get("frm_payload")
         dev_id = request.data.get("data", {}).get("end_device_ids", {}).get("device_id", "unknown")
 
         if not frm_payload:
             return Response({"error": "Missing frm_payload"}, status=status.HTTP_400_BAD_REQUEST)
 
-        parsed = parse_mst01_ht_payload(frm_payload)
+        parsed = decode("mst01_ht", frm_payload)
         if "error" in parsed:
             return Response(parsed, status=status.HTTP_400_BAD_REQUEST)
 
         # Get or create sensor
-        sensor = Sensor.objects.filter(sensor_id=dev_id).first()
-        if not sensor:
-            sensor = Sensor.objects.create(sensor_id=dev_id, sensor_type='AQ', description="MST01 Temp/Humidity Sensor")
+        sensor = sensor_registry.get_or_create(dev_id, 'AQ', description="MST01 Temp/Humidity Sensor")
 
         data = {
             "sensor_id": sensor.id,
@@ -176,8 +252,7 @@ class TemperatureHumidityCreateView(APIView):
 
         serializer = AirQualityDataSerializer(data=data)
         if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            return save_or_queue(serializer)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 # class TemperatureHumidityCreateView(APIView):
@@ -267,18 +342,8 @@ class TemperatureHumidityCreateView(APIView):
 #         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 def get_or_create_sensor(sensor_id, sensor_type, mac=None):
-    """Helper function to get or create a sensor"""
-    try:
-        sensor = Sensor.objects.get(sensor_id=sensor_id)
-        return sensor
-    except Sensor.DoesNotExist:
-        # Create new sensor if it doesn't exist
-        sensor = Sensor.objects.create(
-            sensor_id=sensor_id,
-            sensor_type=sensor_type,
-            description=f"Auto-created {sensor_type} sensor"
-        )
-        return sensor
+    """Helper function to get or create a sensor (served from the shared sensor registry)"""
+    return sensor_registry.get_or_create(sensor_id, sensor_type)
 
 # class AirQualityDataListView(APIView):
 #     def get(self, request, format=None):
@@ -301,10 +366,36 @@ def get_or_create_sensor(sensor_id, sensor_type, mac=None):
 #             return Response(serializer.data, status=status.HTTP_201_CREATED)
 #         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+def aq_push_record(payload, sensor):
+    """Map one push message of the AQ sensor onto AirQualityData serializer input."""
+    # Convert UNIX timestamp to timezone-aware datetime
+    ts = int(payload.get("timestamp", time.time()))
+    timestamp = datetime.fromtimestamp(ts, tz=pytz.UTC)
+
+    return {
+        "sensor_id": sensor.id,
+        "device": payload.get("device_id"),
+        "co2": int(payload.get("co2", 0)),
+        "temp": int(payload.get("temperature", 0)),
+        "humidity": int(payload.get("humidity", 0)),
+        "voc": int(payload.get("tvoc_index", 0)),
+        "pm2p5": float(payload.get("pm_2p5", 0.0)),
+        "pm10": float(payload.get("pm_10", 0.0)),
+        "pm1": float(payload.get("pm_1", 0.0)),
+        "pm4": float(payload.get("pm_4", 0.0)),
+        "timestamp": timestamp,
+        "quality": "Unknown",
+        "version": payload.get("company_name", "Unknown"),
+    }
+
+
 class AirQualitySensorPushView(APIView):
     permission_classes = [AllowAny]
 
     def post(self, request):
+        if isinstance(request.data, list):
+            return self.post_batch(request.data)
+
         try:
             payload = request.data.get("msg", {})
             if not payload:
@@ -317,39 +408,55 @@ class AirQualitySensorPushView(APIView):
             # Get or create sensor
             sensor = get_or_create_sensor(device_id, 'AQ')
 
-            # Convert UNIX timestamp to timezone-aware datetime
-            ts = int(payload.get("timestamp", time.time()))
-            timestamp = datetime.fromtimestamp(ts, tz=pytz.UTC)
-
-            aq_data = {
-                "sensor_id": sensor.id,
-                "device": device_id,
-                "co2": int(payload.get("co2", 0)),
-                "temp": int(payload.get("temperature", 0)),
-                "humidity": int(payload.get("humidity", 0)),
-                "voc": int(payload.get("tvoc_index", 0)),
-                "pm2p5": float(payload.get("pm_2p5", 0.0)),
-                "pm10": float(payload.get("pm_10", 0.0)),
-                "pm1": float(payload.get("pm_1", 0.0)),
-                "pm4": float(payload.get("pm_4", 0.0)),
-                "timestamp": timestamp,
-                "quality": "Unknown",
-                "version": payload.get("company_name", "Unknown"),
-            }
+            aq_data = aq_push_record(payload, sensor)
 
             serializer = AirQualityDataSerializer(data=aq_data)
             if serializer.is_valid():
-                serializer.save()
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
+                return save_or_queue(serializer)
             else:
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def post_batch(self, items):
+        """Validate an array of messages (each {"msg": {...}} or a bare message) and insert them with one bulk_create."""
+        messages = []
+        for item in items:
+            payload = item.get("msg", item) if isinstance(item, dict) else None
+            if not isinstance(payload, dict):
+                messages.append((None, "Expected a message object"))
+            elif not payload.get("device_id"):
+                messages.append((None, "Missing 'device_id'"))
+            elif not isinstance(payload["device_id"], str):
+                messages.append((None, "'device_id' must be a string"))
+            else:
+                messages.append((payload, None))
+        sensors = sensor_registry.get_many({payload["device_id"] for payload, _ in messages if payload}, 'AQ')
+
+        records = []
+        for payload, error in messages:
+            if payload is None:
+                records.append((None, error))
+                continue
+            try:
+                records.append((aq_push_record(payload, sensors[payload["device_id"]]), None))
+            except (TypeError, ValueError, OverflowError, OSError) as e:
+                # OverflowError/OSError: a timestamp out of datetime's range
+                records.append((None, str(e)))
+
+        return batch_response(bulk_ingest_validated(AirQualityDataSerializer, records))
+
 class EnergyDataListView(APIView):
     def get(self, request, format=None):
-        latest_data = EnergyData.objects.order_by('-timestamp').first()
+        # The newest EM sensor state points at its reading: no sort of the whole table
+        latest = SensorLatest.objects.filter(source="energydata").order_by("-timestamp").first()
+        latest_data = (
+            EnergyData.objects.filter(pk=latest.source_id, timestamp=latest.timestamp).first() if latest else None
+        )
+        if latest_data is None:
+            # Not projected yet (or its row was purged): fall back to the table itself
+            latest_data = EnergyData.objects.order_by('-timestamp').first()
         if latest_data:
             serializer = EnergyDataSerializer(latest_data)
             return Response(serializer.data)
@@ -364,8 +471,7 @@ class EnergyDataListView(APIView):
         
         serializer = EnergyDataSerializer(data=data)
         if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            return save_or_queue(serializer)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class RawSensorDataCreateView(APIView):
@@ -373,12 +479,47 @@ class RawSensorDataCreateView(APIView):
     permission_classes = [AllowAny]
 
     def post(self, request, format=None):
+        received_at = timezone.now()
+        archived = getattr(settings, "RAW_ARCHIVE_ENABLED", False)
+        if archived:
+            # Stamped by the archive under its writer lock, keeping segments in time order
+            received_at = datetime.fromtimestamp(raw_archive.append(request.data))
+        # The table is only skipped when the archive holds the payload
+        if archived and not getattr(settings, "RAW_ARCHIVE_DB_ENABLED", True):
+            return Response(
+                {"status": "archived", "received_at": received_at}, status=status.HTTP_201_CREATED
+            )
+
         # Wrap the incoming JSON data into a dict with key 'raw_data'
         serializer = RawSensorDataSerializer(data={'raw_data': request.data})
         if serializer.is_valid():
             serializer.save()  # Save the raw data to the database
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class RawSensorDataArchiveView(APIView):
+    """
+    Streams archived raw gateway payloads as NDJSON, one
+    {"received_at": ..., "raw_data": ...} object per line.
+    Query params: start, end (ISO datetimes; both optional).
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        bounds = {}
+        for name in ("start", "end"):
+            value = request.query_params.get(name)
+            if value:
+                bounds[name] = parse_datetime(value)
+                if bounds[name] is None:
+                    return Response({"error": f"Invalid {name} datetime"}, status=status.HTTP_400_BAD_REQUEST)
+
+        def lines():
+            for received_at, payload in iter_range(bounds.get("start"), bounds.get("end")):
+                yield json.dumps({"received_at": received_at.isoformat(), "raw_data": payload}) + "\n"
+
+        return StreamingHttpResponse(lines(), content_type="application/x-ndjson")
     
 # server_api/views.py
 
@@ -487,108 +628,177 @@ class OccupancyDataCreateView(APIView):
     permission_classes = [AllowAny]
 
     def post(self, request, format=None):
-        sensor_data_list = request.data
-        created_count = 0
-        errors = []
-        totals_by_sensor = defaultdict(lambda: {"entries": 0, "exits": 0, "s_no": 0})
+        # The whole gateway batch is parsed up front and written with bulk inserts,
+        # so the number of queries does not grow with the number of frames.
+        created_count, errors, duplicates = bulk_ingest_occupancy(request.data, gateway=request.META.get("REMOTE_ADDR"))
+        return Response({"created": created_count, "duplicates": duplicates, "errors": errors}, status=status.HTTP_201_CREATED if not errors else status.HTTP_207_MULTI_STATUS)
 
-        for item in sensor_data_list:
-            if "gateway" in item or "raw" not in item:
-                continue
-
-            raw = item["raw"]
-            parsed_dict = parse_minew_data(raw)
-
-            # Skip device information frame (frame_version == "00")
-            if parsed_dict.get("frame_version") == "00":
-                continue
-
-            # Skip if any other error
-            if parsed_dict.get("error"):
-                errors.append(f"Error parsing raw data for item {item}: {parsed_dict.get('error')}")
-                continue
-
-
-            mac = item.get("mac", parsed_dict.get("mac", "unknown-mac"))
-            rssi = item.get("rssi", -99)
-            timestamp = timezone.now()
-            serial_no = int(parsed_dict.get("serial_number", 0))
-            entries = int(parsed_dict.get("entries", 0))
-            exits = int(parsed_dict.get("exits", 0))
 
-            # Get or create sensor per MAC
-            sensor = get_or_create_sensor(mac, 'OC')
-
-            # Get last known totals for this sensor
-            if mac not in totals_by_sensor:
-                last_record = OccupancyData.objects.filter(sensor=sensor).order_by('-created_at').first()
-                totals_by_sensor[mac]["entries"] = last_record.total_entries if last_record else 0
-                totals_by_sensor[mac]["exits"] = last_record.total_exits if last_record else 0
-                totals_by_sensor[mac]["s_no"] = last_record.serial_number if last_record else -1
+def local_datetime(value):
+    """
+    An ISO datetime query parameter as naive local time, the way readings
+    are stored (USE_TZ is off). Values with an offset are converted to the
+    local zone. None if `value` is not a datetime.
+    """
+    moment = parse_datetime(value or "")
+    if moment is not None and timezone.is_aware(moment):
+        moment = timezone.make_naive(moment)
+    return moment
 
-            if serial_no != totals_by_sensor[mac]["s_no"]:
-                totals_by_sensor[mac]["entries"] += entries
-                totals_by_sensor[mac]["exits"] += exits
-                totals_by_sensor[mac]["s_no"] = serial_no
+def history_range(params):
+    """
+    (start, end) from ?start=&end=, the last 24 hours by default, or None
+    if either is given but invalid.
+    """
+    end = local_datetime(params["end"]) if params.get("end") else timezone.now()
+    start = local_datetime(params["start"]) if params.get("start") else end and end - timedelta(hours=24)
+    if start is None or end is None:
+        return None
+    return start, end
 
-            # Save record
-            record = OccupancyData.objects.create(
-                sensor=sensor,
-                mac=parsed_dict.get("mac", mac),
-                frame_version=parsed_dict.get("frame_version"),
-                battery=parsed_dict.get("battery"),
-                firmware_version=parsed_dict.get("firmware_version"),
-                peripheral_support=parsed_dict.get("peripheral_support"),
-                salt=parsed_dict.get("salt"),
-                digital_signature=parsed_dict.get("digital_signature"),
-                usage=parsed_dict.get("usage"),
-                serial_number=parsed_dict.get("serial_number"),
-                entries=parsed_dict.get("entries"),
-                exits=parsed_dict.get("exits"),
-                random_number=parsed_dict.get("random_number"),
-                raw_data=raw,
-                rssi=rssi,
-                timestamp=timestamp,
-                total_entries=totals_by_sensor[mac]["entries"],
-                total_exits=totals_by_sensor[mac]["exits"],
-            )
-            created_count += 1
+def step_history(request, model):
+    """
+    ?sensor=<sensor_id>&step=<seconds>[&start=&end=]: the evenly spaced series
+    of one polled device rebuilt from its (possibly change-only) stored
+    readings, see deadband.step_series. The range defaults to the last 24 hours.
+    A rollup ?resolution= alongside it is rejected.
+    """
+    params = request.query_params
+    if rollup_resolution(request):
+        return Response({"error": "Use either 'step' or 'resolution', not both."}, status=status.HTTP_400_BAD_REQUEST)
+    sensor = sensor_registry.get(params.get("sensor", ""))
+    if sensor is None:
+        return Response({"error": "Unknown or missing 'sensor'."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        step = timedelta(seconds=float(params["step"]))
+    except (ValueError, OverflowError):
+        # OverflowError: inf, or too many seconds for a timedelta
+        return Response({"error": "'step' must be a number of seconds."}, status=status.HTTP_400_BAD_REQUEST)
+    bounds = history_range(params)
+    if bounds is None or step.total_seconds() <= 0:
+        return Response({"error": "Invalid 'start', 'end' or 'step'."}, status=status.HTTP_400_BAD_REQUEST)
+    start, end = bounds
+    if (end - start) / step > 10_000:
+        return Response({"error": "More than 10000 steps; use a larger 'step'."}, status=status.HTTP_400_BAD_REQUEST)
+
+    fields = [*settings.POLL_DEADBANDS.get(model._meta.model_name, {}), "action"]
+    readings = model.objects.filter(sensor=sensor).values("timestamp", *fields)
+    # The reading in force at `start` is the last one before it
+    before = readings.filter(timestamp__lt=start).order_by("-timestamp")[:1]
+    rows = list(before) + list(readings.filter(timestamp__gte=start, timestamp__lte=end).order_by("timestamp"))
+    return with_raw_horizon(Response({
+        "sensor": sensor.sensor_id,
+        "step": step.total_seconds(),
+        "series": step_series(rows, start, end, step, fields),
+    }), model)
+
+def rollup_history(request, model, sensor_id=None):
+    """
+    ?resolution=1m|15m|1h[&sensor=&channel=&start=&end=]: count/mean/min/max/last
+    per bucket from SensorRollup instead of the raw rows. The range defaults
+    to the last 24 hours.
+    """
+    params = request.query_params
+    grain = rollup_resolution(request)
+    if grain not in GRAINS:
+        return Response(
+            {"error": f"'resolution' must be raw or one of {', '.join(GRAINS)}."}, status=status.HTTP_400_BAD_REQUEST
+        )
+    bounds = history_range(params)
+    if bounds is None:
+        return Response({"error": "Invalid 'start' or 'end'."}, status=status.HTTP_400_BAD_REQUEST)
+    start, end = bounds
+
+    channels = ROLLUP_CHANNELS[model]
+    if params.get("channel"):
+        if params["channel"] not in channels:
+            return Response({"error": f"'channel' must be one of {', '.join(channels)}."}, status=status.HTTP_400_BAD_REQUEST)
+        channels = [params["channel"]]
+    rollups = SensorRollup.objects.filter(channel__in=channels, grain=grain, bucket__gte=start, bucket__lte=end)
+    sensor_id = sensor_id or params.get("sensor")
+    if sensor_id:
+        rollups = rollups.filter(sensor__sensor_id=sensor_id)
+    rollups = rollups.select_related("sensor").order_by("bucket", "sensor_id", "channel")[:10_000]
+    return Response(SensorRollupSerializer(rollups, many=True).data)
+
+def rollup_resolution(request):
+    """
+    The rollup grain a history request asks for with ?resolution= (or
+    ?grain=), or None for the raw readings, the default. The shape of the
+    response follows from it alone, never from the range asked for.
+    """
+    params = request.query_params
+    resolution = params.get("resolution") or params.get("grain")
+    return None if resolution in (None, "", "raw") else resolution
 
-        return Response({"created": created_count, "errors": errors}, status=status.HTTP_201_CREATED if not errors else status.HTTP_207_MULTI_STATUS)
+def with_raw_horizon(response, model):
+    """
+    Tell clients where the raw rows of `model` start once purge_raw_readings
+    deleted older ones (X-Raw-Horizon); older ranges need ?resolution=1h.
+    """
+    horizon = raw_horizon(model)
+    if horizon is not None:
+        response["X-Raw-Horizon"] = horizon.isoformat()
+    return response
 
+def sampled_history(request, queryset, serializer_class, every=200):
+    """
+    Every `every`th row of `queryset`, newest first, limited to the optional
+    ?start=&end= range. EnergyData and SensorData are partitioned by month,
+    so a bounded range only reads the months it covers.
+    """
+    params = request.query_params
+    for bound, lookup in (("start", "timestamp__gte"), ("end", "timestamp__lte")):
+        if params.get(bound):
+            moment = local_datetime(params[bound])
+            if moment is None:
+                return Response({"error": f"Invalid '{bound}'."}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(**{lookup: moment})
+    return with_raw_horizon(
+        Response(serializer_class(queryset.order_by('-timestamp')[::every], many=True).data), queryset.model
+    )
 
 class AirQualityDataHistoryView(APIView):
     def get(self, request):
-        data = AirQualityData.objects.order_by('-timestamp')[::200]  # Get every 100th entry for performance
-        return Response(AirQualityDataSerializer(data, many=True).data)
+        if request.query_params.get("step"):
+            return step_history(request, AirQualityData)
+        if rollup_resolution(request):
+            return rollup_history(request, AirQualityData)
+        return sampled_history(request, AirQualityData.objects.all(), AirQualityDataSerializer)
 
 class EnergyDataHistoryView(APIView):
     def get(self, request):
-        data = EnergyData.objects.order_by('-timestamp')[::200]
-        return Response(EnergyDataSerializer(data, many=True).data)
+        if request.query_params.get("step"):
+            return step_history(request, EnergyData)
+        if rollup_resolution(request):
+            return rollup_history(request, EnergyData)
+        return sampled_history(request, EnergyData.objects.all(), EnergyDataSerializer)
 
 class OccupancyDataHistoryView(APIView):
     def get(self, request):
-        data = OccupancyData.objects.order_by('-timestamp')[::200]
-        return Response(OccupancyDataSerializer(data, many=True).data)
+        if rollup_resolution(request):
+            return rollup_history(request, OccupancyData)
+        return sampled_history(request, OccupancyData.objects.all(), OccupancyDataSerializer)
 
 class RadarDataHistoryView(APIView):
     def get(self, request):
-        data = RadarData.objects.order_by('-timestamp')[::200] 
-        serializer = RadarDataSerializer(data, many=True)
-        return Response(serializer.data)
+        if rollup_resolution(request):
+            return rollup_history(request, RadarData)
+        return sampled_history(request, RadarData.objects.all(), RadarDataSerializer)
 
 class EnergyDataHistoryViewLevel3(APIView):
     def get(self, request):
+        if rollup_resolution(request):
+            return rollup_history(request, EnergyData, sensor_id='0')
         sensor = get_object_or_404(Sensor, sensor_id='0', sensor_type='EM')
-        data = EnergyData.objects.filter(sensor=sensor).order_by('-timestamp')[::200]
-        return Response(EnergyDataSerializer(data, many=True).data)
+        return sampled_history(request, EnergyData.objects.filter(sensor=sensor), EnergyDataSerializer)
 
 class EnergyDataHistoryViewLevel4(APIView):
     def get(self, request):
+        if rollup_resolution(request):
+            return rollup_history(request, EnergyData, sensor_id='1')
         sensor = get_object_or_404(Sensor, sensor_id='1', sensor_type='EM')
-        data = EnergyData.objects.filter(sensor=sensor).order_by('-timestamp')[::200]
-        return Response(EnergyDataSerializer(data, many=True).data)
+        return sampled_history(request, EnergyData.objects.filter(sensor=sensor), EnergyDataSerializer)
 
 class Lsg01AirQualityHistoryView(APIView):
     def get(self, request):
@@ -654,7 +864,6 @@ class UnifiedAirQualityHistoryView(APIView):
 #             return Response({"status": "created", "id": record.id}, status=201)
 #         except Exception as e:
 #             return Response({"error": str(e)}, status=400)
-import traceback
 
 class RadarDataCreateView(APIView):
     permission_classes = [AllowAny]
@@ -676,7 +885,7 @@ class RadarDataCreateView(APIView):
             # Create or fetch the sensor
             sensor = get_or_create_sensor(mac, 'RD')
 
-            record = RadarData.objects.create(
+            record = RadarData(
                 sensor=sensor,
                 mac=mac,
                 sn=sn,
@@ -685,6 +894,9 @@ class RadarDataCreateView(APIView):
                 coordinates=coordinates,
                 raw_payload=request.data
             )
+            if async_ingest_enabled():
+                return queue_or_reject(record)
+            record.save()
 
             return Response({"status": "created", "id": record.id}, status=201)
 
@@ -693,6 +905,15 @@ class RadarDataCreateView(APIView):
             # traceback.print_exc()
             return Response({"error": str(e)}, status=400)
 
+class IngestStatsView(APIView):
+    """Queue depth and bulk flush latency of the asynchronous ingest writers, and relayed-frame suppression counters."""
+    def get(self, request):
+        return Response({
+            "async_ingest": async_ingest_enabled(),
+            "queues": ingest_queues.stats(),
+            "occupancy_dedup": frame_dedup.stats(),
+        })
+
 class SensorListView(APIView):
     def get(self, request):
         sensors = Sensor.objects.all()
@@ -705,6 +926,17 @@ class SensorListView(APIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class SensorLatestView(APIView):
+    """
+    Current state of the whole fleet: the newest reading of every sensor,
+    from SensorLatest. Query param: type (AQ, EM, OC or RD; optional).
+    """
+    def get(self, request):
+        latest = SensorLatest.objects.select_related("sensor").order_by("sensor__sensor_id")
+        if request.query_params.get("type"):
+            latest = latest.filter(sensor__sensor_type=request.query_params["type"])
+        return Response(SensorLatestSerializer(latest, many=True).data)
+
 class SensorDetailView(APIView):
     def get(self, request, sensor_id):
         sensor = get_object_or_404(Sensor, sensor_id=sensor_id)
@@ -914,32 +1146,34 @@ def format_recommendation(tags, location_summary, power_kw):
 @api_view(["GET"])
 def get_recommendation(request):
     try:
-        # Get latest sensor data
-        aq = AirQualityData.objects.latest("timestamp")
-        em = EnergyData.objects.latest("timestamp")
-        oc = OccupancyData.objects.latest("timestamp")
+        # Get latest sensor data (hot store, falling back to the database)
+        aq = latest_reading(AirQualityData)
+        em = latest_reading(EnergyData)
+        oc = latest_reading(OccupancyData)
+        if not (aq and em and oc):
+            return Response({"error": "No sensor data yet."}, status=500)
 
         location_summary = (
-            getattr(aq.sensor, "floor", None) or
-            getattr(em.sensor, "floor", None) or
-            getattr(oc.sensor, "floor", None) or
+            getattr(sensor_registry.get_by_pk(aq["sensor_pk"]), "floor", None) or
+            getattr(sensor_registry.get_by_pk(em["sensor_pk"]), "floor", None) or
+            getattr(sensor_registry.get_by_pk(oc["sensor_pk"]), "floor", None) or
             "an unknown location"
         )
 
-        power_kw = em.total_act_power / 1000.0 if em.total_act_power else 0
+        power_kw = em["total_act_power"] / 1000.0 if em["total_act_power"] else 0
 
         # Create model input
         row = pd.DataFrame([{
-            "co2": aq.co2,
-            "temp": aq.temp,
-            "total_act_power": em.total_act_power,
-            "total_entries": oc.total_entries,
-            "total_exits": oc.total_exits,
-            "co2_future": aq.co2 + 100,
-            "temp_future": aq.temp + 1.5,
-            "total_act_power_future": em.total_act_power + 500,
-            "total_entries_future": oc.total_entries + 10,
-            "total_exits_future": oc.total_exits + 10,
+            "co2": aq["co2"],
+            "temp": aq["temp"],
+            "total_act_power": em["total_act_power"],
+            "total_entries": oc["total_entries"],
+            "total_exits": oc["total_exits"],
+            "co2_future": aq["co2"] + 100,
+            "temp_future": aq["temp"] + 1.5,
+            "total_act_power_future": em["total_act_power"] + 500,
+            "total_entries_future": oc["total_entries"] + 10,
+            "total_exits_future": oc["total_exits"] + 10,
         }])
 
         prediction = recommendation_model.predict(row)[0]